@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+from time import perf_counter
+from typing import List, Optional
+
+from langchain_core.output_parsers import JsonOutputParser
+
+from core.chains import build_chain_registry
+from core.ollama import get_ollama_chat
+from services.chatbots import get_database_chat_template, get_readme_template
+
+
+# what every request did before the chain registry
+def build_per_request():
+    llm_chat = get_ollama_chat(temperature=0.0)
+    prompt = get_database_chat_template()
+    parser = JsonOutputParser()
+    prompt = prompt.partial(format_instructions=parser.get_format_instructions())
+    chain = prompt | llm_chat | parser
+    readme_chain = get_readme_template() | llm_chat
+    return chain, readme_chain
+
+
+def measure(function, iterations: int) -> float:
+    # microseconds per call
+    start = perf_counter()
+    for _ in range(iterations):
+        function()
+    return (perf_counter() - start) / iterations * 1e6
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare building the LLM chains per request with fetching them from the registry.")
+    parser.add_argument("--iterations", type=int, default=1000, help="calls measured for each variant")
+    args = parser.parse_args(argv)
+
+    # the registry is built once, like in the lifespan
+    registry = build_chain_registry()
+    try:
+        per_request = measure(build_per_request, args.iterations)
+        shared = measure(lambda: (registry.database_chain, registry.readme_chain), args.iterations)
+    finally:
+        await registry.aclose()
+
+    print(f"per-request chains: {per_request:,.1f} µs/request")
+    print(f"shared registry:    {shared:,.3f} µs/request")
+    print(f"saved:              {per_request - shared:,.1f} µs/request (x{per_request / shared:,.0f})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+import argparse
+import multiprocessing
+import resource
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generator import write_csv
+from etl.pipeline import DEFAULT_CHUNK_SIZE, read_chunks, write_jsonl
+from etl.transform import COLUMN_NAMES, transform_chunk
+
+COMPARED_COLUMNS = [
+    "creation_date", "purchase_date", "cal_card", "unit_price", "total_price",
+    "supplier_qualifications", "classification_codes", "location_zip", "location_lat", "location_long",
+]
+
+
+# the cells of ETL/escprs.ipynb, unchanged apart from the paths
+def notebook_transform(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=COLUMN_NAMES)
+
+    def split_location(location):
+        if pd.isnull(location):
+            return pd.Series([np.nan, np.nan, np.nan])
+        try:
+            parts = location.split('\n')
+            if len(parts) == 1:
+                return pd.Series([parts[0].strip(), np.nan, np.nan])
+            zip_code, coords = parts
+            if not coords:
+                return pd.Series([parts[0].strip(), np.nan, np.nan])
+            lat, long = coords.strip('()').split(',')
+            return pd.Series([zip_code.strip(), float(lat.strip()), float(long.strip())])
+        except Exception:
+            return pd.Series([np.nan, np.nan, np.nan])
+
+    df[['location_zip', 'location_lat', 'location_long']] = df['location'].apply(split_location)
+    df.drop(columns=['location'], inplace=True)
+
+    df['supplier_qualifications'] = df['supplier_qualifications'].apply(
+        lambda x: [qualification for qualification in str(x).split()] if x and str(x).lower() != 'nan' else []
+    )
+    df['classification_codes'] = df['classification_codes'].apply(
+        lambda x: [int(code) for code in str(x).split()] if x and str(x).lower() != 'nan' else []
+    )
+    df['cal_card'] = df['cal_card'].map({'YES': True, 'NO': False})
+    df = df.replace(['nan', 'NaN', 'NAN', 'null', 'None'], np.nan)
+
+    def clean_currency(value):
+        if pd.isnull(value):
+            return value
+        return float(value.lstrip('$'))
+
+    df['unit_price'] = df['unit_price'].apply(clean_currency)
+    df['total_price'] = df['total_price'].apply(clean_currency)
+
+    column_types = {
+        "fiscal_year": "category", "acquisition_type": "category", "supplier_code": "float64",
+        "supplier_qualifications": "object", "cal_card": "bool", "quantity": "float64",
+        "unit_price": "float64", "total_price": "float64", "classification_codes": "object",
+        "normalized_UNSPSC": "float64", "class": "float64", "family": "float64", "segment": "float64",
+        "location_lat": "float64", "location_long": "float64",
+    }
+    for column, dtype in column_types.items():
+        if column in df.columns:
+            df[column] = df[column].astype(dtype, errors='ignore')
+
+    df['creation_date'] = pd.to_datetime(df['creation_date'], format='%m/%d/%Y', errors='coerce')
+    df['purchase_date'] = pd.to_datetime(df['purchase_date'], format='%m/%d/%Y', errors='coerce')
+    return df[(df['purchase_date'].isna()) | (df['purchase_date'].dt.year.between(2003, 2015))]
+
+
+def run_notebook(csv_path: Path, output_path: Path, chunk_size: int) -> int:
+    df = notebook_transform(pd.read_csv(csv_path))
+    df.to_json(output_path, orient='records', lines=True)
+    return len(df)
+
+
+def run_etl(csv_path: Path, output_path: Path, chunk_size: int) -> int:
+    return write_jsonl(read_chunks(csv_path, chunk_size), output_path)
+
+
+def measure(target, csv_path: Path, output_path: Path, chunk_size: int, results):
+    # runs in a child process, so the peak RSS is the one of this variant only
+    started_at = perf_counter()
+    rows = target(csv_path, output_path, chunk_size)
+    elapsed = perf_counter() - started_at
+    results.put((rows, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def check_parity(csv_path: Path, rows: int):
+    sample = pd.read_csv(csv_path, nrows=rows)
+    expected = notebook_transform(sample)[COMPARED_COLUMNS]
+    actual = transform_chunk(pd.read_csv(csv_path, nrows=rows, dtype=str))[COMPARED_COLUMNS]
+    pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True), check_dtype=False)
+    print(f"parity: the first {len(actual):,} records match the notebook output")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare the chunked ETL with the notebook logic on a synthetic CSV.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows of the synthetic CSV")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="CSV rows processed at a time by the ETL")
+    parser.add_argument("--parity-rows", type=int, default=20_000, help="rows compared between both outputs")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = Path(directory) / "purchases.csv"
+        started_at = perf_counter()
+        write_csv(csv_path, args.rows)
+        print(f"generated {args.rows:,} rows in {perf_counter() - started_at:.1f}s ({csv_path.stat().st_size / 2**20:,.0f} MiB)")
+
+        check_parity(csv_path, args.parity_rows)
+
+        context = multiprocessing.get_context("spawn")
+        for name, target in [("notebook", run_notebook), ("etl", run_etl)]:
+            results = context.Queue()
+            process = context.Process(target=measure, args=(target, csv_path, Path(directory) / f"{name}.json", args.chunk_size, results))
+            process.start()
+            rows, elapsed, peak_mib = results.get()
+            process.join()
+            print(f"{name:>8}: {rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s), peak RSS {peak_mib:,.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
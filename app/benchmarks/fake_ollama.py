@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from services.fast_router import fast_route
+from services.prompts import count_tokens
+
+# the stage-1 prompt lists the functions, the readme prompt does not
+STAGE1_MARKER = "Function Number"
+QUESTION_PATTERN = re.compile(r"User Question:\s*(.*)")
+
+# the route of the questions no canned route and no fast-path rule resolves
+DEFAULT_ROUTE = {"function_number": 10, "parameters": {}}
+
+
+@dataclass
+class FakeOllamaConfig:
+    latency: float = 0.2  # seconds before the first token (model load and prompt evaluation)
+    tokens_per_second: float = 50.0  # generation speed
+    answer_tokens: int = 120  # tokens of a readme answer
+    routes: Dict[str, dict] = field(default_factory=dict)  # canned stage-1 answers by question
+
+
+def route_for(config: FakeOllamaConfig, question: str) -> dict:
+    return config.routes.get(question) or fast_route(question) or DEFAULT_ROUTE
+
+
+def answer_tokens(count: int) -> List[str]:
+    # a markdown table, so the stage-2 output looks like a real answer
+    tokens = ["| Name | Value |\n", "|---|---:|\n"]
+    row = 0
+    while len(tokens) < count:
+        row += 1
+        tokens.extend([f"| Row {row} ", f"| {row * 10} |\n"])
+    return tokens[:count]
+
+
+def create_app(config: FakeOllamaConfig) -> FastAPI:
+    """
+    A stand-in for the Ollama HTTP API (/api/chat streaming, /api/tags, /api/version).
+
+    Stage-1 prompts get the canned route of their question as JSON, readme prompts a
+    table of answer_tokens tokens, at the configured latency and token rate. The final
+    chunk carries the counts and durations Ollama reports.
+    """
+    app = FastAPI()
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-fake"}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": []}
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+        match = QUESTION_PATTERN.search(prompt)
+        question = match.group(1).strip() if match else ""
+
+        if STAGE1_MARKER in prompt:
+            tokens = [json.dumps(route_for(config, question))]
+        else:
+            tokens = answer_tokens(config.answer_tokens)
+        prompt_tokens = count_tokens(prompt)
+
+        def chunk(content: str, done: bool = False) -> str:
+            return json.dumps({
+                "model": body.get("model", ""),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "message": {"role": "assistant", "content": content},
+                "done": done,
+            })
+
+        async def stream():
+            started_at = perf_counter()
+            await asyncio.sleep(config.latency)
+            prompt_done_at = perf_counter()
+
+            for token in tokens:
+                await asyncio.sleep(1 / config.tokens_per_second)
+                yield chunk(token) + "\n"
+
+            done_at = perf_counter()
+            final = json.loads(chunk("", done=True))
+            final.update({
+                "done_reason": "stop",
+                "total_duration": int((done_at - started_at) * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int((prompt_done_at - started_at) * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int((done_at - prompt_done_at) * 1e9),
+            })
+            yield json.dumps(final) + "\n"
+
+        if body.get("stream") is False:
+            # the whole answer at once, after the same delays
+            content = ""
+            final = {}
+            async for line in stream():
+                final = json.loads(line)
+                content += final["message"]["content"]
+            final["message"]["content"] = content
+            return final
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve a fake Ollama API with a configurable latency and token rate.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="generation speed")
+    parser.add_argument("--answer-tokens", type=int, default=120, help="tokens of a readme answer")
+    parser.add_argument("--routes", type=Path, help='JSON file of canned stage-1 answers: {"question": {"function_number": ..., "parameters": ...}}')
+    args = parser.parse_args(argv)
+
+    routes = json.loads(args.routes.read_text(encoding="utf-8")) if args.routes else {}
+    config = FakeOllamaConfig(args.latency, args.tokens_per_second, args.answer_tokens, routes)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import json
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+# the realistic values come first, the next ones are numbered ("Item 7", "Supplier 12")
+ITEM_NAMES = ["Toner Cartridge", "Copy Paper", "Desk Chair", "Laptop 15in", "USB-C Cable", "Safety Gloves"]
+DEPARTMENT_NAMES = ["Department of Transportation", "Department of Justice", "Water Resources"]
+SUPPLIERS = [("Acme Corp", "95814"), ("Acme Corp", "90001"), ("Office Depot", "95814"), ("Dell", None)]
+# (UNSPSC code, commodity title), the segment, family and class are the leading digits of the code
+COMMODITIES = [(44121600, "Paper products"), (44103100, "Printer supplies"), (43211500, "Computers"),
+               (43201400, "Cables"), (46181500, "Safety apparel")]
+
+ACQUISITION_TYPES = ["IT Goods", "NON-IT Goods", "IT Services", "NON-IT Services", "IT Telecommunications"]
+ACQUISITION_METHODS = ["Informal Competitive", "Statewide Contract", "WSCA/Coop"]
+FISCAL_YEARS = ["2012-2013", "2013-2014", "2014-2015"]
+
+DAY_MS = 86_400_000
+# 2012-07-01 UTC, the first day of the extract, which spans three fiscal years
+FIRST_DAY_MS = 1341100800000
+DAYS = 1095
+
+
+@dataclass
+class Cardinality:
+    # distinct values of the generated columns
+    items: int
+    departments: int
+    suppliers: int
+    commodities: int
+    prices: int
+    # share of nulls in the optional columns (item, department, purchase date, latitude)
+    nulls: float
+
+
+# the shapes of the real extract
+EXTRACT = Cardinality(items=20_000, departments=100, suppliers=5_000, commodities=500, prices=100_000, nulls=0.05)
+# few distinct values, so every group has several purchases and the top-N queries have ties and nulls
+SMALL = Cardinality(items=len(ITEM_NAMES), departments=len(DEPARTMENT_NAMES), suppliers=len(SUPPLIERS),
+                    commodities=len(COMMODITIES), prices=4, nulls=0.15)
+
+
+def numbered(values: list, prefix: str, count: int) -> list:
+    return values[:count] + [f"{prefix} {number}" for number in range(len(values) + 1, count + 1)]
+
+
+def commodities(count: int) -> List[Tuple[int, str]]:
+    extra = [(10_000_000 + number * 111_111 % 90_000_000, f"Commodity {number}") for number in range(len(COMMODITIES) + 1, count + 1)]
+    return COMMODITIES[:count] + extra
+
+
+def generate_purchases(rows: int, cardinality: Cardinality = EXTRACT, seed: int = 0) -> Iterator[dict]:
+    """
+    Generate synthetic purchases in the format of the ETL output (purchases.json lines).
+
+    Args:
+        rows (int): The number of purchases.
+        cardinality (Cardinality): The distinct values of the columns, EXTRACT or SMALL (the tests).
+        seed (int): The random seed, the same seed generates the same purchases.
+
+    Yields:
+        dict: The purchase records.
+    """
+    rng = random.Random(seed)
+    items = numbered(ITEM_NAMES, "Item", cardinality.items)
+    departments = numbered(DEPARTMENT_NAMES, "Department", cardinality.departments)
+    suppliers = SUPPLIERS[:cardinality.suppliers] + [
+        (f"Supplier {number}", str(90001 + number % 6161)) for number in range(len(SUPPLIERS) + 1, cardinality.suppliers + 1)
+    ]
+    codes = commodities(cardinality.commodities)
+    prices = [round(1 + 4999 * step / cardinality.prices, 2) for step in range(cardinality.prices)]
+
+    def nullable(value):
+        return None if rng.random() < cardinality.nulls else value
+
+    for number in range(rows):
+        code, title = rng.choice(codes)
+        supplier = rng.randrange(len(suppliers))
+        supplier_name, supplier_zip_code = suppliers[supplier]
+        item_name = nullable(rng.choice(items))
+        quantity = rng.randint(1, 100)
+        unit_price = rng.choice(prices)
+        # some purchase times are not midnight, the day queries cover the whole day
+        purchase_date = FIRST_DAY_MS + rng.randrange(DAYS) * DAY_MS + rng.choice([0, 3_600_000])
+        yield {
+            "creation_date": FIRST_DAY_MS + rng.randrange(DAYS) * DAY_MS,
+            "purchase_date": nullable(purchase_date),
+            "fiscal_year": rng.choice(FISCAL_YEARS),
+            "lpa_number": None,
+            "purchase_order_number": f"PO{number}",
+            "requisition_number": None,
+            "acquisition_type": rng.choice(ACQUISITION_TYPES),
+            "sub_acquisition_type": None,
+            "acquisition_method": rng.choice(ACQUISITION_METHODS),
+            "sub_acquisition_method": None,
+            "department_name": nullable(rng.choice(departments)),
+            "supplier_code": float(supplier + 1),
+            "supplier_name": supplier_name,
+            "supplier_qualifications": rng.choice([[], ["CA-SB"], ["CA-MB", "CA-SB"]]),
+            "supplier_zip_code": supplier_zip_code,
+            "cal_card": rng.random() < 0.1,
+            "item_name": item_name,
+            "item_description": f"Description of {item_name}" if item_name else None,
+            "quantity": float(quantity),
+            "unit_price": unit_price,
+            "total_price": round(unit_price * quantity, 2),
+            "classification_codes": [code],
+            "normalized_UNSPSC": float(code),
+            "commodity_title": title,
+            "class": float(code // 100),
+            "class_title": f"Class {code // 100}",
+            "family": float(code // 10_000),
+            "family_title": f"Family {code // 10_000}",
+            "segment": float(code // 1_000_000),
+            "segment_title": f"Segment {code // 1_000_000}",
+            "location_zip": str(rng.randint(90001, 96161)),
+            "location_lat": nullable(round(rng.uniform(32.5, 42.0), 6)),
+            "location_long": round(rng.uniform(-124.4, -114.1), 6),
+        }
+
+
+def write_purchases(path: Path, rows: int, cardinality: Cardinality = EXTRACT, seed: int = 0):
+    """
+    Write a synthetic seed file (JSON lines, in the format of the ETL output).
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        for record in generate_purchases(rows, cardinality, seed):
+            file.write(json.dumps(record) + "\n")
+
+
+def write_csv(path: Path, rows: int, cardinality: Cardinality = EXTRACT, seed: int = 0):
+    """
+    Write the synthetic purchases as a purchase order CSV with the shapes of the real extract
+    (text dates and prices, several classification codes, malformed locations, years out of range).
+    """
+    # pandas is only needed by the ETL benchmark (requirements-etl.txt)
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(generate_purchases(rows, cardinality, seed))
+
+    def dates(values: pd.Series) -> pd.Series:
+        return pd.to_datetime(values, unit="ms").dt.strftime("%m/%d/%Y")
+
+    def integers(values: pd.Series) -> pd.Series:
+        return values.map(lambda value: None if pd.isna(value) else str(int(value)))
+
+    purchase_date = pd.to_datetime(df["purchase_date"], unit="ms")
+    # data-entry errors, dropped by the ETL
+    purchase_date = purchase_date.mask(rng.random(rows) < 0.02, purchase_date - pd.DateOffset(years=12))
+
+    codes = df["classification_codes"].map(lambda values: " ".join(map(str, values)))
+    codes = codes.mask(rng.random(rows) < 0.3, codes + " " + codes.str[:6] + "00")
+
+    location = df["location_zip"] + "\n(" + df["location_lat"].astype(str) + ", " + df["location_long"].astype(str) + ")"
+    location = location.mask(df["location_lat"].isna(), df["location_zip"])
+    location = location.mask(rng.random(rows) < 0.02, df["location_zip"] + "\n(bad, value)")
+
+    pd.DataFrame({
+        "Creation Date": dates(df["creation_date"]),
+        "Purchase Date": purchase_date.dt.strftime("%m/%d/%Y"),
+        "Fiscal Year": df["fiscal_year"],
+        "LPA Number": df["lpa_number"],
+        "Purchase Order Number": df["purchase_order_number"],
+        "Requisition Number": df["requisition_number"],
+        "Acquisition Type": df["acquisition_type"],
+        "Sub-Acquisition Type": df["sub_acquisition_type"],
+        "Acquisition Method": df["acquisition_method"],
+        "Sub-Acquisition Method": df["sub_acquisition_method"],
+        "Department Name": df["department_name"],
+        "Supplier Code": integers(df["supplier_code"]),
+        "Supplier Name": df["supplier_name"],
+        "Supplier Qualifications": df["supplier_qualifications"].map(lambda values: " ".join(values) or None),
+        "Supplier Zip Code": df["supplier_zip_code"],
+        "CalCard": df["cal_card"].map({True: "YES", False: "NO"}),
+        "Item Name": df["item_name"],
+        "Item Description": df["item_description"],
+        "Quantity": integers(df["quantity"]),
+        "Unit Price": df["unit_price"].map("${:.2f}".format),
+        "Total Price": df["total_price"].map("${:.2f}".format),
+        "Classification Codes": codes,
+        "Normalized UNSPSC": integers(df["normalized_UNSPSC"]),
+        "Commodity Title": df["commodity_title"],
+        "Class": integers(df["class"]),
+        "Class Title": df["class_title"],
+        "Family": integers(df["family"]),
+        "Family Title": df["family_title"],
+        "Segment": integers(df["segment"]),
+        "Segment Title": df["segment_title"],
+        "Location": location,
+    }).to_csv(path, index=False)
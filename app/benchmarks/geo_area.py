@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+from time import perf_counter
+from typing import List, Optional, Tuple
+
+from core.database import init_database
+from schemas.documents import Purchase
+from seeds.migrations import apply_migrations
+from services.geo import box_polygon
+
+RANGE_INDEX = "location_lat_location_long_index"
+GEO_INDEX = "location_2dsphere_index"
+
+
+def box_queries(center: Tuple[float, float], half_size: float) -> Tuple[dict, dict]:
+    # the area query before and after the 2dsphere index, for a square box around the center
+    lat, long = center
+    top_left, bottom_right = (lat + half_size, long - half_size), (lat - half_size, long + half_size)
+    range_query = {
+        "location_lat": {"$lte": top_left[0], "$gte": bottom_right[0]},
+        "location_long": {"$gte": top_left[1], "$lte": bottom_right[1]},
+    }
+    geo_query = {**range_query, "location": {"$geoWithin": {"$geometry": box_polygon(top_left, bottom_right)}}}
+    return range_query, geo_query
+
+
+async def measure(collection, query: dict, index: str, repeat: int) -> Tuple[int, float, dict]:
+    """
+    Count the matches of a query with an index and read its execution statistics.
+
+    Returns:
+        Tuple[int, float, dict]: The count, the milliseconds per count and the executionStats of explain.
+    """
+    count = await collection.count_documents(query, hint=index)
+    started_at = perf_counter()
+    for _ in range(repeat):
+        await collection.count_documents(query, hint=index)
+    elapsed = (perf_counter() - started_at) / repeat * 1000
+
+    explain = await collection.find(query).hint(index).explain()
+    return count, elapsed, explain["executionStats"]
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare the area count with the lat/long B-tree index and with the 2dsphere index.")
+    parser.add_argument("--center", type=float, nargs=2, default=[37.0, -120.0], metavar=("LAT", "LONG"), help="center of the boxes")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.05, 0.25, 1.0, 2.5, 5.0], help="half sizes of the boxes in degrees")
+    parser.add_argument("--repeat", type=int, default=5, help="measured counts per box and index")
+    args = parser.parse_args(argv)
+
+    client = await init_database()
+    try:
+        # the seeded collection needs the location field and its index
+        await apply_migrations()
+        collection = Purchase.get_motor_collection()
+        print(f"{await collection.estimated_document_count():,} purchases")
+        print(f"{'box':>8} {'matches':>9} | {'B-tree ms':>9} {'keys':>9} {'docs':>9} | {'2dsphere ms':>11} {'keys':>9} {'docs':>9}")
+
+        for half_size in args.sizes:
+            range_query, geo_query = box_queries(tuple(args.center), half_size)
+            count, range_ms, range_stats = await measure(collection, range_query, RANGE_INDEX, args.repeat)
+            geo_count, geo_ms, geo_stats = await measure(collection, geo_query, GEO_INDEX, args.repeat)
+            assert count == geo_count, f"the 2dsphere query counted {geo_count} instead of {count}"
+
+            print(
+                f"{2 * half_size:>7g}° {count:>9,} | "
+                f"{range_ms:>9.1f} {range_stats['totalKeysExamined']:>9,} {range_stats['totalDocsExamined']:>9,} | "
+                f"{geo_ms:>11.1f} {geo_stats['totalKeysExamined']:>9,} {geo_stats['totalDocsExamined']:>9,}"
+            )
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import random
+import string
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.memory_repository import MemoryPurchaseRepository
+from services.search import ItemSearchIndex
+
+# common words of the generated item names, descriptions and commodity titles
+WORDS = (
+    "toner cartridge paper copy letter legal ream binder folder envelope label pen pencil marker "
+    "desk chair table cabinet shelf monitor laptop desktop keyboard mouse cable adapter battery "
+    "printer scanner server switch router license software support maintenance service repair "
+    "glove mask vest boot helmet uniform fuel oil filter tire brake lamp bulb fixture valve pump "
+    "black blue red white large small heavy duty standard premium recycled wireless portable"
+).split()
+
+
+def generate_item_terms(names: int, seed: int = 0, brands: int = 5000) -> Dict[str, List[str]]:
+    """
+    Make up item names with a description and a commodity title each, like the procurement data:
+    a brand or model word (from a large vocabulary) and a few common words.
+    """
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(brands)]
+
+    item_terms: Dict[str, List[str]] = {}
+    while len(item_terms) < names:
+        words = [rng.choice(vocabulary)] + rng.sample(WORDS, rng.randint(1, 3))
+        name = " ".join(word.capitalize() if rng.random() < 0.5 else word.upper() for word in words)
+        if rng.random() < 0.5:
+            name += f" {rng.randint(1, 999)}{rng.choice(string.ascii_uppercase)}"
+        description = f"{' '.join(words)}, {rng.choice(WORDS)} {rng.choice(WORDS)} ({rng.randint(1, 100)} per box)"
+        item_terms[name] = [description, f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)}"]
+    return item_terms
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    # the variations an LLM writes: another casing, no punctuation, a dropped or swapped letter
+    variant = rng.choice([name.lower(), name.upper(), name.title(), name.replace("-", " ")])
+    if len(variant) > 4 and rng.random() < 0.5:
+        index = rng.randrange(1, len(variant) - 1)
+        variant = variant[:index] + variant[index + 1:] if rng.random() < 0.5 else variant[:index - 1] + variant[index] + variant[index - 1] + variant[index + 1:]
+    return variant
+
+
+async def load_item_terms(data_path: Optional[Path], names: int, seed: int) -> Dict[str, List[str]]:
+    if data_path is None:
+        return generate_item_terms(names, seed)
+    return await MemoryPurchaseRepository(data_path=data_path).item_terms()
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure the build time, memory and lookup latency of the item search index.")
+    parser.add_argument("--data", type=Path, help="index the items of a seed file instead of generated ones")
+    parser.add_argument("--names", type=int, default=100_000, help="generated item names (without --data)")
+    parser.add_argument("--queries", type=int, default=2000, help="misspelled names looked up")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the names and queries")
+    args = parser.parse_args(argv)
+
+    item_terms = await load_item_terms(args.data, args.names, args.seed)
+
+    started_at = perf_counter()
+    index = ItemSearchIndex(item_terms)
+    build_seconds = perf_counter() - started_at
+    stats = index.stats()
+    print(
+        f"{stats['names']:,} names, {stats['terms']:,} terms, {stats['trigrams']:,} trigrams: "
+        f"built in {build_seconds:.2f}s, {stats['memory_bytes'] / 2**20:.1f} MiB"
+    )
+
+    rng = random.Random(args.seed)
+    queries = [(name, misspell(name, rng)) for name in rng.choices(index.names, k=args.queries)]
+
+    timings = []
+    found = 0
+    for name, query in queries:
+        started_at = perf_counter()
+        matched = index.resolve(query)
+        timings.append((perf_counter() - started_at) * 1000)
+        found += name in matched
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    print(f"{len(queries):,} lookups: p50 {p50:.3f} ms, p95 {p95:.3f} ms, p99 {p99:.3f} ms, {found / len(queries):.1%} resolved to the original name")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import itertools
+import json
+import subprocess
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+from core.config import settings
+
+# one question per query function, the fake Ollama routes them with the fast-path rules
+QUESTIONS = [
+    "How many purchases were made between 2013-01-01 and 2013-06-30?",
+    "What are the top spending items in 2013?",
+    "How many purchases have the acquisition type IT Goods?",
+    "What is the total quantity of Item 1?",
+    "Which items were purchased on 2013-03-04?",
+    "What are the family codes of the segment code 43?",
+    "What are the top normalized UNSPSC codes?",
+    "What is the top item by total price in the fiscal year 2013-2014?",
+    "What are the top departments?",
+    "Who are the top suppliers?",
+]
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values: List[float], rank: int) -> float:
+    # nearest rank, values sorted
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(rank / 100 * len(values)) - 1))]
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    stages = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, _, duration = entry.partition(";dur=")
+        if duration:
+            stages[name] = float(duration)
+    return stages
+
+
+class ScenarioResult:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+
+    def add_timing(self, server_timing: Optional[str]):
+        for stage, milliseconds in parse_server_timing(server_timing or "").items():
+            self.stages[stage].append(milliseconds)
+
+    def summary(self, seconds: float) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": len(latencies) + sum(self.errors.values()),
+            "errors": dict(self.errors),
+            **{f"p{rank}_ms": round(percentile(latencies, rank) * 1000, 2) for rank in PERCENTILES},
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "throughput_rps": round(len(latencies) / seconds, 2) if seconds else 0.0,
+            "seconds": round(seconds, 3),
+            # mean Server-Timing breakdown of the successful requests
+            "stages_ms": {stage: round(sum(values) / len(values), 2) for stage, values in self.stages.items()},
+        }
+
+
+async def run_http(client: httpx.AsyncClient, path: str, params: dict, requests: int, concurrency: int) -> dict:
+    result = ScenarioResult()
+    questions = itertools.cycle(QUESTIONS)
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started_at = perf_counter()
+            try:
+                response = await client.post(path, params={"question": next(questions), **params})
+            except httpx.HTTPError as e:
+                result.errors[type(e).__name__] += 1
+                continue
+            if response.status_code != 200:
+                result.errors[str(response.status_code)] += 1
+                continue
+            result.latencies.append(perf_counter() - started_at)
+            result.add_timing(response.headers.get("Server-Timing"))
+
+    started_at = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return result.summary(perf_counter() - started_at)
+
+
+async def run_websockets(url: str, sessions: int, turns: int) -> dict:
+    result = ScenarioResult()
+
+    async def session(offset: int):
+        try:
+            async with websockets.connect(url) as websocket:
+                for turn in range(turns):
+                    started_at = perf_counter()
+                    await websocket.send(json.dumps({"question": QUESTIONS[(offset + turn) % len(QUESTIONS)]}))
+                    message = json.loads(await websocket.recv())
+                    if message.get("type") == "error":
+                        result.errors[str(message.get("status_code", "error"))] += 1
+                        continue
+                    result.latencies.append(perf_counter() - started_at)
+                    result.add_timing(message.get("server_timing"))
+        except (OSError, websockets.WebSocketException) as e:
+            result.errors[type(e).__name__] += 1
+
+    started_at = perf_counter()
+    await asyncio.gather(*(session(offset) for offset in range(sessions)))
+    return result.summary(perf_counter() - started_at)
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(scenarios: Dict[str, dict], previous: Optional[Dict[str, dict]] = None):
+    print(f"{'scenario':<8} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for name, summary in scenarios.items():
+        print(
+            f"{name:<8} {summary['requests']:>8} {sum(summary['errors'].values()):>6} "
+            f"{summary['p50_ms']:>9.1f} {summary['p95_ms']:>9.1f} {summary['p99_ms']:>9.1f} {summary['throughput_rps']:>8.1f}"
+        )
+        if previous and name in previous:
+            # relative change against the previous run, latency up or throughput down is a regression
+            changes = []
+            for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+                before, after = previous[name].get(key), summary[key]
+                if before:
+                    changes.append(f"{key} {(after - before) / before * 100:+.1f}%")
+            print(f"{'':<8} vs previous: {', '.join(changes)}")
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load the chat endpoints and report latency percentiles and throughput.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of the API")
+    parser.add_argument("--scenarios", nargs="+", choices=("stage1", "stage2", "ask"), default=["stage1", "stage2", "ask"])
+    parser.add_argument("--requests", type=int, default=200, help="requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=settings.LLM_MAX_CONCURRENCY * 2, help="concurrent HTTP requests")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent /chats/ask websocket sessions")
+    parser.add_argument("--turns", type=int, default=5, help="questions per websocket session")
+    parser.add_argument("--mode", choices=("table", "narrative"), default="narrative", help="stage-2 answer mode")
+    parser.add_argument("--output", type=Path, default=Path("benchmarks/results"), help="directory of the JSON results")
+    parser.add_argument("--compare", type=Path, help="a previous results file to compare with")
+    args = parser.parse_args(argv)
+
+    scenarios: Dict[str, dict] = {}
+    async with httpx.AsyncClient(base_url=args.url, timeout=settings.OLLAMA_TIMEOUT) as client:
+        if "stage1" in args.scenarios:
+            scenarios["stage1"] = await run_http(client, "/chats/stage1", {}, args.requests, args.concurrency)
+        if "stage2" in args.scenarios:
+            scenarios["stage2"] = await run_http(client, "/chats/stage2", {"mode": args.mode}, args.requests, args.concurrency)
+    if "ask" in args.scenarios:
+        websocket_url = args.url.replace("http", "ws", 1) + "/chats/ask"
+        scenarios["ask"] = await run_websockets(websocket_url, args.sessions, args.turns)
+
+    previous = json.loads(args.compare.read_text(encoding="utf-8"))["scenarios"] if args.compare else None
+    print_results(scenarios, previous)
+
+    commit = current_commit()
+    created_at = datetime.now()
+    results = {
+        "commit": commit,
+        "created_at": created_at.isoformat(timespec="seconds"),
+        "url": args.url,
+        "arguments": {key: str(value) for key, value in vars(args).items()},
+        "scenarios": scenarios,
+    }
+    args.output.mkdir(parents=True, exist_ok=True)
+    path = args.output / f"load-{commit}-{created_at:%Y%m%d-%H%M%S}.json"
+    path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"Results written to {path}.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import List, Optional, Tuple
+
+from benchmarks.generator import write_purchases
+from core.config import settings
+from core.database import init_database
+from schemas.documents import Purchase
+from seeds.purchases import seed_data
+from services.index_advisor import PlanSummary, QueryRecorder, collect_plan, representative_parameters
+from services.mongo_repository import MongoPurchaseRepository
+from services.repository import use_repository
+
+# rows of the Large Purchases by the State of California extract
+EXTRACT_ROWS = 346_018
+
+# forces a collection scan that reads the whole documents, like the pipelines before the covering indexes
+COLLECTION_SCAN = {"$natural": 1}
+
+
+async def run_command(database, command: dict, repeat: int) -> Tuple[float, PlanSummary]:
+    """
+    Time a recorded command and read its plan.
+
+    Returns:
+        Tuple[float, PlanSummary]: The milliseconds per run and the explained plan.
+    """
+    started_at = perf_counter()
+    for _ in range(repeat):
+        await database.command(command)
+    elapsed = (perf_counter() - started_at) / repeat * 1000
+
+    summary = PlanSummary()
+    collect_plan(await database.command({"explain": command, "verbosity": "executionStats"}), summary)
+    return elapsed, summary
+
+
+async def measure_scale(recorder: QueryRecorder, rows: int, repeat: int):
+    from services.queries import function_map
+
+    database = Purchase.get_motor_collection().database
+    document = await Purchase.get_motor_collection().find_one(
+        {"purchase_date": {"$ne": None}, "item_name": {"$ne": None}, "segment": {"$ne": None}}
+    ) or {}
+    parameters = representative_parameters(document)
+
+    print(f"{rows:,} purchases")
+    print(f"  {'function':<38} {'covered ms':>10} {'examined':>9} | {'scan ms':>9} {'examined':>9} | {'speedup':>7}")
+    for number, function in function_map.items():
+        recorder.commands.clear()
+        await function(**parameters.get(number, {}))
+
+        for command in list(recorder.commands):
+            covered_ms, covered = await run_command(database, command, repeat)
+            scan_ms, scan = await run_command(database, {**command, "hint": COLLECTION_SCAN}, repeat)
+            print(
+                f"  {function.__name__:<38} {covered_ms:>10.1f} {covered.docs_examined:>9,} | "
+                f"{scan_ms:>9.1f} {scan.docs_examined:>9,} | {scan_ms / covered_ms if covered_ms else 0:>6.1f}x"
+            )
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Time the query pipelines on their covering indexes and with a collection scan, as the data grows.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10], help="dataset sizes as multiples of the real extract")
+    parser.add_argument("--repeat", type=int, default=3, help="measured runs per pipeline")
+    parser.add_argument("--database", default=f"{settings.MONGODB_DATABASE}_benchmark", help="scratch database, dropped at the end")
+    args = parser.parse_args(argv)
+
+    settings.MONGODB_DATABASE = args.database
+
+    recorder = QueryRecorder({Purchase.Settings.name})
+    client = await init_database(event_listeners=[recorder])
+    try:
+        for scale in args.scales:
+            rows = int(EXTRACT_ROWS * scale)
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / "purchases.json"
+                write_purchases(path, rows)
+                await seed_data(reset=True, data_path=path)
+            # the live pipelines of the MongoDB repository are measured, not the rollups
+            with use_repository(MongoPurchaseRepository(rollups=False)):
+                await measure_scale(recorder, rows, args.repeat)
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import math
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Any, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from benchmarks.generator import write_purchases
+from core.config import settings
+from etl.pipeline import PARQUET_SCHEMA
+from services.memory_repository import MemoryPurchaseRepository, load_purchases
+from services.repository import After, PurchaseRepository, create_repository
+
+# (operation, arguments): every read operation, with parameters that match the synthetic seed file
+CALLS: List[Tuple[str, tuple]] = [
+    ("count_in_area", ((38.0, -123.0), (34.0, -118.0))),
+    ("count_within_radius", ((37.0, -120.0), 150.0)),
+    ("count_in_polygon", ([(38.0, -123.0), (39.0, -118.0), (34.0, -116.0), (33.0, -121.0)],)),
+    ("count_in_date_range", (datetime(2013, 1, 1), datetime(2013, 6, 30))),
+    ("top_spending_items", (2013, 10)),
+    ("count_by_acquisition_type", ("IT Goods",)),
+    ("total_quantity_by_items", (["Copy Paper", "Item 10"],)),
+    ("item_terms", ()),
+    ("items_purchased_between", (datetime(2013, 3, 4), datetime(2013, 3, 5))),
+    ("family_codes_by_segment", (44,)),
+    # a page after a cursor
+    ("items_purchased_between", (datetime(2013, 1, 1), datetime(2014, 1, 1), After("Item 20"), 5)),
+    ("family_codes_by_segment", (44, After(4410), 3)),
+    ("top_unspsc", (10,)),
+    ("top_items_by_fiscal_year", ("2013-2014", 5)),
+    ("top_departments", (10,)),
+    ("top_suppliers", (5,)),
+]
+
+
+def same_result(expected: Any, actual: Any) -> bool:
+    # sums may differ in the last bits with the summation order
+    if isinstance(expected, float) or isinstance(actual, float):
+        return isinstance(actual, (int, float)) and math.isclose(expected, actual, rel_tol=1e-9)
+    if isinstance(expected, dict):
+        return isinstance(actual, dict) and expected.keys() == actual.keys() and all(same_result(expected[key], actual[key]) for key in expected)
+    if isinstance(expected, list):
+        return isinstance(actual, list) and len(expected) == len(actual) and all(map(same_result, expected, actual))
+    return expected == actual
+
+
+async def compare(reference: PurchaseRepository, repository: PurchaseRepository, repeat: int) -> int:
+    """
+    Run every operation on both repositories, print the timings and the mismatches.
+
+    Returns:
+        int: The number of operations whose results differ.
+    """
+    mismatches = 0
+    for operation, arguments in CALLS:
+        expected = await getattr(reference, operation)(*arguments)
+
+        # the first call loads the data, it is not measured
+        actual = await getattr(repository, operation)(*arguments)
+        started_at = perf_counter()
+        for _ in range(repeat):
+            await getattr(repository, operation)(*arguments)
+        elapsed = (perf_counter() - started_at) / repeat * 1000
+
+        same = same_result(expected, actual)
+        mismatches += not same
+        print(f"  {operation:<26} {elapsed:>9.2f} ms  {'ok' if same else 'MISMATCH'}")
+        if not same:
+            print(f"    {reference.name}: {str(expected)[:200]}")
+            print(f"    {repository.name}: {str(actual)[:200]}")
+    return mismatches
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check that the repositories return the same results as the in-memory one, and time them.")
+    parser.add_argument("--rows", type=int, default=50_000, help="lines of the synthetic seed file")
+    parser.add_argument("--data", type=Path, help="use this seed file (JSON lines) instead of a synthetic one")
+    parser.add_argument("--repeat", type=int, default=5, help="measured calls per operation")
+    parser.add_argument("--mongo", action="store_true", help="also compare MongoDB (it has to be seeded from the same file)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        data_path = args.data
+        if data_path is None:
+            data_path = Path(directory) / "purchases.json"
+            write_purchases(data_path, args.rows)
+
+        purchases = load_purchases(data_path)
+        print(f"{len(purchases):,} purchases")
+
+        # the columnar snapshot is written from the same documents
+        snapshot_path = Path(directory) / "purchases.parquet"
+        pq.write_table(pa.Table.from_pylist(purchases, schema=PARQUET_SCHEMA), snapshot_path)
+        settings.COLUMNAR_SNAPSHOT_PATH = str(snapshot_path)
+
+        reference = MemoryPurchaseRepository(purchases)
+        repositories = [reference, create_repository("columnar")]
+
+        client = None
+        if args.mongo:
+            from core.database import init_database
+            client = await init_database()
+            repositories.append(create_repository("mongo"))
+
+        mismatches = 0
+        try:
+            for repository in repositories:
+                print(f"{repository.name}:")
+                mismatches += await compare(reference, repository, args.repeat)
+        finally:
+            if client is not None:
+                client.close()
+
+    print("all repositories agree" if not mismatches else f"{mismatches} mismatches")
+    return mismatches
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if asyncio.run(main()) else 0)
@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import List, Optional
+
+from benchmarks.generator import write_purchases
+from seeds.purchases import parse_file
+from seeds.workers import parse_range
+
+
+async def parse_with_pool(path: Path, batch_size: int, workers: int) -> int:
+    rows = 0
+    # the documents are dropped: this measures the CPU-bound part the workers take off the event loop
+    async for documents, _, _, _ in parse_file(path, 0, batch_size, workers):
+        rows += len(documents)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Measure how seed parsing and validation scale with the worker processes.")
+    parser.add_argument("--rows", type=int, default=200_000, help="lines of the synthetic seed file")
+    parser.add_argument("--batch-size", type=int, default=1000, help="lines per byte range")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1))), help="worker counts to measure")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "purchases.json"
+        write_purchases(path, args.rows)
+        print(f"{args.rows:,} lines ({path.stat().st_size / 2**20:,.0f} MiB), {cores} CPU cores")
+
+        started_at = perf_counter()
+        documents, _, _, _ = parse_range(path, 0, path.stat().st_size)
+        serial = perf_counter() - started_at
+        print(f"  in-process: {len(documents) / serial:>10,.0f} rows/s")
+        del documents
+
+        for workers in args.workers:
+            started_at = perf_counter()
+            rows = asyncio.run(parse_with_pool(path, args.batch_size, workers))
+            elapsed = perf_counter() - started_at
+            print(f"  {workers:>2} workers: {rows / elapsed:>10,.0f} rows/s (x{serial / elapsed:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import json
+from pathlib import Path
+from time import perf_counter
+from typing import List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic import ValidationError
+
+from benchmarks.pipelines import EXTRACT_ROWS
+from benchmarks.generator import write_purchases
+from etl.pipeline import PARQUET_SCHEMA
+from seeds.workers import PurchaseRecord
+from services.memory_repository import naive_utc
+
+# the sizes of the load tests, in multiples of the extract
+SCALES = (1, 10, 100)
+
+
+def write_parquet_snapshot(seed_path: Path, snapshot_path: Path, chunk_rows: int = 100_000) -> int:
+    """
+    Convert a seed file into a snapshot of the columnar engine, one chunk of lines at a time.
+    """
+    rows = 0
+    with open(seed_path, "rb") as file, pq.ParquetWriter(snapshot_path, PARQUET_SCHEMA) as writer:
+        documents = []
+        for line in file:
+            try:
+                documents.append(naive_utc(PurchaseRecord.model_validate(json.loads(line)).model_dump(by_alias=True)))
+            except (ValueError, ValidationError):
+                continue
+            if len(documents) == chunk_rows:
+                writer.write_table(pa.Table.from_pylist(documents, schema=PARQUET_SCHEMA))
+                rows += len(documents)
+                documents = []
+        if documents:
+            writer.write_table(pa.Table.from_pylist(documents, schema=PARQUET_SCHEMA))
+            rows += len(documents)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate synthetic purchases at a multiple of the extract size.")
+    parser.add_argument("--scale", type=int, choices=SCALES, default=1, help="multiple of the extract rows")
+    parser.add_argument("--rows", type=int, help="exact number of rows (overrides --scale)")
+    parser.add_argument("--output", type=Path, required=True, help="seed file to write (JSON lines)")
+    parser.add_argument("--parquet", type=Path, help="also write a snapshot of the columnar engine")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, the same seed writes the same rows")
+    args = parser.parse_args(argv)
+
+    rows = args.rows or EXTRACT_ROWS * args.scale
+    started_at = perf_counter()
+    write_purchases(args.output, rows, seed=args.seed)
+    print(f"Wrote {rows:,} purchases to {args.output} in {perf_counter() - started_at:.1f}s.")
+
+    if args.parquet:
+        started_at = perf_counter()
+        written = write_parquet_snapshot(args.output, args.parquet)
+        print(f"Wrote {written:,} purchases to {args.parquet} in {perf_counter() - started_at:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
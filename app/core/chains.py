@@ -0,0 +1,98 @@
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, AsyncIterator, Dict
+
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import Runnable
+from langchain_ollama import ChatOllama
+
+from services.chatbots import get_database_chat_template, get_readme_template
+from services.prompts import build_readme_prompt
+
+from .config import settings
+from .metrics import record_stage, timed
+from .ollama import OllamaMetricsCallback, OllamaTransport, get_ollama_chat
+from .scheduler import STAGE1_PRIORITY, STAGE2_PRIORITY, LLMScheduler
+
+# the Ollama timings of each stage go to the /metrics histograms
+STAGE1_METRICS = OllamaMetricsCallback("stage1")
+STAGE2_METRICS = OllamaMetricsCallback("stage2")
+
+
+@dataclass
+class ChainRegistry:
+    """
+    The LLM client and chains, built once at startup and shared by every request.
+
+    The ChatOllama instance sends its calls through one pooled keep-alive transport to Ollama,
+    owned by the registry, and every LLM call waits for a worker of the scheduler.
+    """
+
+    llm_chat: ChatOllama
+    database_chain: Runnable  # database prompt | LLM | JSON parser
+    readme_template: Runnable  # readme prompt
+    readme_chain: Runnable  # readme prompt | LLM, with num_ctx=LLM_MODEL_CTX
+    scheduler: LLMScheduler
+    transport: OllamaTransport
+    # the readme chains of the larger context sizes, they share the HTTP client of llm_chat
+    readme_chains: Dict[int, Runnable] = field(default_factory=dict)
+
+    def readme_chain_for(self, num_ctx: int) -> Runnable:
+        if num_ctx == self.llm_chat.num_ctx:
+            return self.readme_chain
+        if num_ctx not in self.readme_chains:
+            self.readme_chains[num_ctx] = self.readme_template | self.llm_chat.model_copy(update={"num_ctx": num_ctx})
+        return self.readme_chains[num_ctx]
+
+    # Stage 1: the function number and parameters of a question
+    async def invoke_database(self, question: str, client: str = "anonymous") -> Any:
+        queued_at = perf_counter()
+        async with self.scheduler.slot(STAGE1_PRIORITY, client):
+            record_stage("stage1_queue", perf_counter() - queued_at)
+            with timed("stage1_llm"):
+                return await self.database_chain.ainvoke({'question': question}, config={"callbacks": [STAGE1_METRICS]})
+
+    # Stage 2: the readme-style answer, chunk by chunk (the worker is held until the stream ends)
+    async def stream_readme(self, question: str, database_response: Any, client: str = "anonymous") -> AsyncIterator[str]:
+        # the result is compacted to fit the context, and num_ctx follows the prompt size
+        prompt = build_readme_prompt(question, database_response)
+        chain = self.readme_chain_for(prompt.num_ctx)
+        usage = {}
+
+        queued_at = perf_counter()
+        async with self.scheduler.slot(STAGE2_PRIORITY, client):
+            started_at = perf_counter()
+            record_stage("stage2_queue", started_at - queued_at)
+            with timed("stage2_llm"):
+                async for chunk in chain.astream({'question': question, 'response': prompt.response}, config={"callbacks": [STAGE2_METRICS]}):
+                    # Ollama reports the token counts on the last chunk
+                    usage = chunk.usage_metadata or usage
+                    if chunk.content:
+                        yield chunk.content
+
+        print(
+            f"Readme answer: {usage.get('input_tokens', '?')} prompt tokens (estimated {prompt.prompt_tokens}), "
+            f"{usage.get('output_tokens', '?')} generated, num_ctx {prompt.num_ctx}, "
+            f"{prompt.max_rows} rows per list, {perf_counter() - started_at:.2f}s."
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def build_chain_registry() -> ChainRegistry:
+    # Initialize the chat model and parser
+    transport = OllamaTransport()
+    llm_chat = get_ollama_chat(temperature=0.0, transport=transport)
+    parser = JsonOutputParser()
+    prompt = get_database_chat_template().partial(format_instructions=parser.get_format_instructions())
+    readme_template = get_readme_template()
+
+    return ChainRegistry(
+        llm_chat=llm_chat,
+        database_chain=prompt | llm_chat | parser,
+        readme_template=readme_template,
+        readme_chain=readme_template | llm_chat,
+        scheduler=LLMScheduler(workers=settings.LLM_MAX_CONCURRENCY, max_queue=settings.LLM_MAX_QUEUE),
+        transport=transport,
+    )
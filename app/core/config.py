@@ -1,6 +1,7 @@
 import os
 from functools import lru_cache
 from pathlib import Path
+from typing import List, Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -20,9 +21,82 @@ class Settings(BaseSettings):
     LLM_MODEL: str = "gemma2:2b" 
     LLM_MODEL_CTX: int = 2048
     LLM_MODEL_PREDICT: int = -1
+    # largest num_ctx of a readme answer, a request uses the smallest size (LLM_MODEL_CTX doubled) its prompt fits in
+    LLM_MODEL_CTX_MAX: int = 8192
+    # database results placed in the readme prompt: max rows of every list (the rest is summarized) and tokens kept for the answer
+    PROMPT_RESULT_ROWS: int = 20
+    PROMPT_ANSWER_TOKENS: int = 1024
 
     OLLAMA_HOST: str  # This should match the service name in Docker Compose or the hostname of your Ollama service
     OLLAMA_PORT: int 
+    # seconds to wait for an Ollama response (a generation can be slow) and for a connection
+    OLLAMA_TIMEOUT: float = 300.0
+    OLLAMA_CONNECT_TIMEOUT: float = 5.0
+    # pooled keep-alive connections to Ollama and seconds an idle connection is kept open
+    OLLAMA_MAX_CONNECTIONS: int = 10
+    OLLAMA_KEEPALIVE_EXPIRY: float = 30.0
+    # LLM calls running at the same time (scheduler workers), the others wait in the queue
+    LLM_MAX_CONCURRENCY: int = 4
+    # LLM calls allowed to wait for a worker, the next ones are rejected with 429 (busy)
+    LLM_MAX_QUEUE: int = 32
+
+    # number of purchases validated and written per insert_many call while seeding
+    SEED_BATCH_SIZE: int = 1000
+    # background: serve right away and seed in a task, blocking: seed before serving, off: never seed on startup
+    SEED_MODE: Literal["background", "blocking", "off"] = "background"
+    # processes parsing and validating the seed file (0: one per CPU core) and concurrent insert_many calls
+    SEED_WORKERS: int = 0
+    SEED_WRITERS: int = 2
+    # a failed seed is retried after SEED_RETRY_DELAY seconds, doubled after every failure up to SEED_RETRY_MAX_DELAY,
+    # and given up after SEED_MAX_ATTEMPTS attempts (0: retry forever), then only a restart seeds again
+    SEED_RETRY_DELAY: float = 5.0
+    SEED_RETRY_MAX_DELAY: float = 300.0
+    SEED_MAX_ATTEMPTS: int = 5
+
+    # serve the top-N queries from the pre-computed rollup collections when they are fresh
+    ROLLUPS_ENABLED: bool = True
+    # seconds between two checks of the rollup data versions
+    ROLLUP_CHECK_INTERVAL: int = 30
+    # store the department, acquisition method, supplier and UNSPSC title strings as integer codes into lookup
+    # collections once the data is seeded (python -m seeds.compact applies or reverts it by hand)
+    COMPACT_SCHEMA: bool = False
+
+    # invoke_function result cache: max entries (0 disables it) and seconds an entry lives
+    RESULT_CACHE_SIZE: int = 256
+    RESULT_CACHE_TTL: int = 600
+    # seconds between two reads of the seed data version, a new version clears the caches
+    DATA_VERSION_CHECK_INTERVAL: int = 30
+
+    # stage-1 intent cache: max questions (0 disables it) and the minimum confidence of a reusable route
+    INTENT_CACHE_SIZE: int = 1024
+    INTENT_CACHE_MIN_CONFIDENCE: float = 0.9
+    # embedding model for paraphrase lookups (empty: exact matches only) and the cosine similarity threshold
+    INTENT_CACHE_EMBEDDING_MODEL: str = ""
+    INTENT_CACHE_SIMILARITY: float = 0.95
+
+    # routing stages tried in order before the stage-1 LLM call (fast_path, intent_cache)
+    ROUTE_STAGES: List[Literal["fast_path", "intent_cache"]] = ["fast_path", "intent_cache"]
+
+    # items per page of the list functions (get_items_by_purchase_date, get_family_codes_by_segment_code) and the max limit
+    PAGE_SIZE: int = 500
+    PAGE_SIZE_MAX: int = 5000
+
+    # /chats/batch: max questions per request, questions classified at the same time and distinct queries run at the same time
+    BATCH_MAX_QUESTIONS: int = 500
+    BATCH_LLM_CONCURRENCY: int = 4
+    BATCH_QUERY_CONCURRENCY: int = 16
+
+    # item names resolved by get_total_quantity_by_item_name: min trigram similarity (0 to 1) of a fuzzy match
+    SEARCH_MIN_SIMILARITY: float = 0.5
+
+    # default stage-2 answer mode, table: render the results server-side, narrative: format them with the LLM
+    ANSWER_MODE: Literal["table", "narrative"] = "table"
+
+    # engine answering the query functions, mongo: aggregations in MongoDB, columnar: in-process over a Parquet/Arrow snapshot,
+    # memory: pure Python over the seed file (tests and benchmarks)
+    QUERY_ENGINE: Literal["mongo", "columnar", "memory"] = "mongo"
+    # snapshot of the columnar engine (python -m etl.pipeline --parquet), relative to the app folder
+    COLUMNAR_SNAPSHOT_PATH: str = "seeds/data/purchases.parquet"
 
 
     # Dynamically set the environment file based on FASTAPI_ENV: this will override the upper env
@@ -0,0 +1,17 @@
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from schemas.documents import Purchase
+
+from .config import settings
+
+
+# open the MongoDB connection and register the document models with beanie
+async def init_database(**client_kwargs) -> AsyncIOMotorClient:
+    client = AsyncIOMotorClient(settings.MONGO_URL, **client_kwargs)
+    database = client.get_database(settings.MONGODB_DATABASE)
+
+    # Initialize beanie with the Purchase document class
+    await init_beanie(database=database, document_models=[Purchase])
+
+    return client
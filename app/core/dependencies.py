@@ -1,6 +1,10 @@
 from typing import Annotated
 
-from fastapi import Depends, Header, HTTPException
+from fastapi import Depends, Header, HTTPException, WebSocketException, status
+from starlette.requests import HTTPConnection
+
+from .chains import ChainRegistry
+from .readiness import readiness
 
 
 async def get_token_header(x_token: Annotated[str | None, Header()] = None):
@@ -13,6 +17,39 @@ async def get_token_header(x_token: Annotated[str | None, Header()] = None):
     return True
 
 
+# reject requests quickly while the purchases collection is still being seeded
+async def require_ready(connection: HTTPConnection):
+    if readiness.is_ready:
+        return
+
+    if connection.scope["type"] == "websocket":
+        # 1013: try again later, a close reason is limited to 123 bytes so only the status is sent
+        raise WebSocketException(code=status.WS_1013_TRY_AGAIN_LATER, reason=readiness.status)
+
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=readiness.to_dict(),
+        headers={"Retry-After": "5"},
+    )
+
+
+# the chain registry built once in the lifespan
+async def get_chains(connection: HTTPConnection) -> ChainRegistry:
+    return connection.app.state.chains
+
+
+# the key the LLM scheduler uses to share its workers fairly between clients
+async def get_client_id(connection: HTTPConnection) -> str:
+    if connection.client is None:
+        return "anonymous"
+
+    if connection.scope["type"] == "websocket":
+        # every websocket session is its own client
+        return f"{connection.client.host}:{connection.client.port}"
+
+    return connection.client.host
+
+
 
 # dependencies = [Depends(get_token_header)]
 dependencies = []
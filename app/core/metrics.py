@@ -0,0 +1,193 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# seconds, from a cached query to a long generation
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# seconds a call waits for an LLM worker, most are admitted at once
+QUEUE_WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """
+    A Prometheus metric kept in process memory, with one series per combination of label values.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        METRICS.append(self)
+
+    def key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def labels(self, key: Tuple[str, ...]) -> List[str]:
+        return [f'{name}="{escape_label(value)}"' for name, value in zip(self.labelnames, key)]
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self.key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self.values.items()):
+            labels = self.labels(key)
+            lines.append(f"{self.name}{{{','.join(labels)}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str):
+        self.values[self.key(labels)] = value
+
+
+@dataclass
+class HistogramSeries:
+    counts: List[int]  # observations per bucket, the last one is +Inf
+    sum: float = 0.0
+    count: int = 0
+
+
+class Histogram(Metric):
+    """
+    A Prometheus histogram kept in process memory.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], HistogramSeries] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self.key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = HistogramSeries(counts=[0] * (len(self.buckets) + 1))
+
+        # the first bucket with an upper bound >= value
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started_at = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started_at, **labels)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, series in sorted(self.series.items()):
+            labels = self.labels(key)
+            cumulative = 0
+            for bound, count in zip([*map(str, self.buckets), "+Inf"], series.counts):
+                cumulative += count
+                bucket_labels = ",".join([*labels, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {series.sum}")
+            lines.append(f"{self.name}_count{suffix} {series.count}")
+        return lines
+
+
+# every metric of the process, in the order of the /metrics output
+METRICS: List[Metric] = []
+
+request_seconds = Histogram(
+    "escprs_request_duration_seconds", "Time to the response start of HTTP requests and to the end of websocket turns.", ["path"]
+)
+stage_seconds = Histogram(
+    "escprs_stage_duration_seconds", "Time spent in each stage of a question (LLM queue and call, database).", ["stage"]
+)
+database_seconds = Histogram(
+    "escprs_database_duration_seconds", "Time of invoke_function per query function, cached results included.", ["function"]
+)
+llm_phase_seconds = Histogram(
+    "escprs_llm_phase_duration_seconds", "Model load, prompt evaluation and generation time reported by Ollama.", ["stage", "phase"]
+)
+llm_tokens = Histogram(
+    "escprs_llm_tokens", "Prompt and generated tokens reported by Ollama.", ["stage", "phase"], TOKEN_BUCKETS
+)
+llm_tokens_per_second = Histogram(
+    "escprs_llm_tokens_per_second", "Prompt evaluation and generation speed reported by Ollama.", ["stage", "phase"], TOKENS_PER_SECOND_BUCKETS
+)
+
+llm_workers = Gauge("escprs_llm_workers", "LLM calls the scheduler runs at the same time.")
+llm_active_calls = Gauge("escprs_llm_active_calls", "LLM calls holding a worker.")
+llm_queue_depth = Gauge("escprs_llm_queue_depth", "LLM calls waiting for a worker.", ["priority"])
+llm_scheduled_calls = Counter(
+    "escprs_llm_scheduled_calls_total", "LLM calls by scheduler outcome (admitted, rejected with a 429, cancelled).", ["outcome"]
+)
+llm_queue_wait_seconds = Histogram(
+    "escprs_llm_queue_wait_seconds", "Time admitted LLM calls waited for a worker.", ["priority"], QUEUE_WAIT_BUCKETS
+)
+
+
+def render_metrics() -> str:
+    # the Prometheus text exposition format
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+@dataclass
+class RequestTimings:
+    # seconds per stage of one request or websocket turn, summed when a stage runs several times (batches)
+    stages: Dict[str, float] = field(default_factory=dict)
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        # the Server-Timing header, durations in milliseconds
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+# the timings of the request being handled, set by the middleware and the websocket handler
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+
+def record_stage(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage=stage)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    started_at = perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, perf_counter() - started_at)
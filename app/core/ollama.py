@@ -1,16 +1,99 @@
 # from langchain_community.chat_models import ChatOllama
-from langchain_ollama import ChatOllama
+from typing import Any, Optional
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_ollama import ChatOllama, OllamaEmbeddings
 
 from .config import settings
+from .metrics import llm_phase_seconds, llm_tokens, llm_tokens_per_second
+
+
+class OllamaTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    The keep-alive connection pools to Ollama, used by the sync and async clients of a model.
+
+    The ollama clients build their own httpx clients from client_kwargs, so the connections are
+    owned by this transport and closed with it.
+    """
+
+    def __init__(self):
+        limits = httpx.Limits(
+            max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY,
+        )
+        self.sync_transport = httpx.HTTPTransport(limits=limits)
+        self.async_transport = httpx.AsyncHTTPTransport(limits=limits)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self.sync_transport.handle_request(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.async_transport.handle_async_request(request)
+
+    def close(self):
+        self.sync_transport.close()
+
+    async def aclose(self):
+        self.sync_transport.close()
+        await self.async_transport.aclose()
+
 
+# httpx settings of the Ollama clients: keep-alive connection pool and timeouts
+def get_ollama_client_kwargs(transport: Optional[OllamaTransport] = None) -> dict:
+    return {
+        "timeout": httpx.Timeout(settings.OLLAMA_TIMEOUT, connect=settings.OLLAMA_CONNECT_TIMEOUT),
+        "transport": transport or OllamaTransport(),
+    }
 
-# support await for chat
-def get_ollama_chat(temperature: float = 0.7):
+
+# support await for chat, the caller that passes the transport closes it
+def get_ollama_chat(temperature: float = 0.7, transport: Optional[OllamaTransport] = None):
     chat_ollama = ChatOllama(
         model=settings.LLM_MODEL,
         base_url=settings.OLLAMA_BASE_URL,
         num_ctx=settings.LLM_MODEL_CTX,
         num_predict=settings.LLM_MODEL_PREDICT,
-        temperature=temperature
+        temperature=temperature,
+        client_kwargs=get_ollama_client_kwargs(transport),
     )
     return chat_ollama
+
+
+# embeddings used to match paraphrased questions
+def get_ollama_embeddings(model: str):
+    ollama_embeddings = OllamaEmbeddings(
+        model=model,
+        base_url=settings.OLLAMA_BASE_URL,
+        client_kwargs=get_ollama_client_kwargs(),
+    )
+    return ollama_embeddings
+
+
+class OllamaMetricsCallback(AsyncCallbackHandler):
+    """
+    Export the timings Ollama reports at the end of a generation (durations in nanoseconds).
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    async def on_llm_end(self, response: LLMResult, **kwargs: Any):
+        for generations in response.generations:
+            for generation in generations:
+                info = generation.generation_info or {}
+                if info.get("load_duration"):
+                    llm_phase_seconds.observe(info["load_duration"] / 1e9, stage=self.stage, phase="load")
+
+                for phase, count_key, duration_key in (
+                    ("prompt_eval", "prompt_eval_count", "prompt_eval_duration"),
+                    ("generation", "eval_count", "eval_duration"),
+                ):
+                    count, duration = info.get(count_key), info.get(duration_key)
+                    if count is None or not duration:
+                        continue
+                    llm_tokens.observe(count, stage=self.stage, phase=phase)
+                    llm_phase_seconds.observe(duration / 1e9, stage=self.stage, phase=phase)
+                    llm_tokens_per_second.observe(count / (duration / 1e9), stage=self.stage, phase=phase)
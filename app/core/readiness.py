@@ -0,0 +1,28 @@
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+
+@dataclass
+class Readiness:
+    status: str = "starting"  # starting | seeding | retrying | preparing | ready | failed
+    rows: int = 0  # rows seeded so far
+    rows_per_second: float = 0.0
+    error: Optional[str] = None
+    attempts: int = 0  # failed seeding attempts
+    retry_at: Optional[str] = None  # when the next attempt starts (ISO 8601) while retrying
+
+    @property
+    def is_ready(self) -> bool:
+        return self.status == "ready"
+
+    @property
+    def restart_required(self) -> bool:
+        # the seeding attempts are exhausted, only a restart seeds again
+        return self.status == "failed"
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "restart_required": self.restart_required}
+
+
+# one readiness state per process, shared by the seeding task and the request handlers
+readiness = Readiness()
@@ -0,0 +1,171 @@
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from time import monotonic
+from typing import Deque, Dict
+
+from core.metrics import llm_active_calls, llm_queue_depth, llm_queue_wait_seconds, llm_scheduled_calls, llm_workers
+
+# lower runs first: a stage-1 classification unblocks a whole question, a stage-2 answer is only formatting
+STAGE1_PRIORITY = 0
+STAGE2_PRIORITY = 1
+
+# seconds a rejected client is told to wait before retrying
+RETRY_AFTER = 5
+
+
+class LLMQueueFull(Exception):
+    """
+    Raised when every LLM worker is busy and the queue is full.
+    """
+
+    def __init__(self, retry_after: int = RETRY_AFTER):
+        super().__init__("The LLM is busy, please retry later")
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """
+    Admission control in front of Ollama.
+
+    At most `workers` LLM calls run at the same time. The others wait in a priority queue,
+    and the clients waiting at the same priority are served round-robin so one websocket
+    session cannot monopolize the workers. Calls are rejected with LLMQueueFull once
+    `max_queue` calls are waiting, and a cancelled call leaves the queue (or frees its worker).
+    The queue depth, the busy workers, the outcomes and the waits are exported on /metrics.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(workers, 1)
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+
+        # priority -> client -> waiting calls, the clients are rotated after each grant
+        self._queues: Dict[int, "OrderedDict[str, Deque[asyncio.Future]]"] = {}
+
+        self.admitted = 0
+        self.rejected = 0
+        self.cancelled = 0
+        # seconds the latest admitted calls waited for a worker
+        self._waits: Deque[float] = deque(maxlen=1000)
+        llm_workers.set(self.workers)
+
+    @asynccontextmanager
+    async def slot(self, priority: int, client: str = "anonymous"):
+        await self.acquire(priority, client)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: int, client: str = "anonymous"):
+        """
+        Wait for a free worker.
+
+        Args:
+            priority (int): STAGE1_PRIORITY or STAGE2_PRIORITY, lower runs first.
+            client (str): The client key used to share the workers fairly.
+
+        Raises:
+            LLMQueueFull: When every worker is busy and the queue is full.
+        """
+        if self.active < self.workers and not self.queued:
+            self.active += 1
+            self._admit(priority, 0.0)
+            return
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            llm_scheduled_calls.inc(outcome="rejected")
+            raise LLMQueueFull()
+
+        enqueued_at = monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(priority, OrderedDict()).setdefault(client, deque()).append(future)
+        self.queued += 1
+        self._report()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            llm_scheduled_calls.inc(outcome="cancelled")
+            if future.done() and not future.cancelled():
+                # the worker was granted while the caller was being cancelled
+                self.release()
+            else:
+                self._remove(priority, client, future)
+                self._report()
+            raise
+
+        self._admit(priority, monotonic() - enqueued_at)
+
+    def release(self):
+        self.active -= 1
+        while self.active < self.workers:
+            future = self._pop_next()
+            if future is None:
+                break
+            self.active += 1
+            future.set_result(None)
+        self._report()
+
+    def _admit(self, priority: int, wait: float):
+        self.admitted += 1
+        self._waits.append(wait)
+        llm_scheduled_calls.inc(outcome="admitted")
+        llm_queue_wait_seconds.observe(wait, priority=str(priority))
+        self._report()
+
+    def _report(self):
+        # the gauges of /metrics, every priority is reported so an emptied queue goes back to 0
+        llm_active_calls.set(self.active)
+        for priority, clients in self._queues.items():
+            llm_queue_depth.set(sum(len(waiters) for waiters in clients.values()), priority=str(priority))
+
+    def _pop_next(self):
+        for priority in sorted(self._queues):
+            clients = self._queues[priority]
+            if not clients:
+                continue
+
+            client, waiters = next(iter(clients.items()))
+            future = waiters.popleft()
+            # round-robin: the client moves behind the others waiting at this priority
+            del clients[client]
+            if waiters:
+                clients[client] = waiters
+            self.queued -= 1
+            return future
+        return None
+
+    def _remove(self, priority: int, client: str, future: asyncio.Future):
+        waiters = self._queues.get(priority, {}).get(client)
+        if waiters is None or future not in waiters:
+            return
+        waiters.remove(future)
+        if not waiters:
+            del self._queues[priority][client]
+        self.queued -= 1
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "queued_by_priority": {
+                priority: sum(len(waiters) for waiters in clients.values())
+                for priority, clients in sorted(self._queues.items())
+            },
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p95": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)], 4) if waits else 0.0,
+                "max": round(waits[-1], 4) if waits else 0.0,
+            },
+        }
@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic import ValidationError
+
+from .transform import transform_chunk
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+# the columnar snapshot read by services/columnar.py, codes are nullable integers like in MongoDB
+PARQUET_SCHEMA = pa.schema([
+    ("creation_date", pa.timestamp("ms")),
+    ("purchase_date", pa.timestamp("ms")),
+    ("fiscal_year", pa.string()),
+    ("lpa_number", pa.string()),
+    ("purchase_order_number", pa.string()),
+    ("requisition_number", pa.string()),
+    ("acquisition_type", pa.string()),
+    ("sub_acquisition_type", pa.string()),
+    ("acquisition_method", pa.string()),
+    ("sub_acquisition_method", pa.string()),
+    ("department_name", pa.string()),
+    ("supplier_code", pa.int64()),
+    ("supplier_name", pa.string()),
+    ("supplier_qualifications", pa.list_(pa.string())),
+    ("supplier_zip_code", pa.string()),
+    ("cal_card", pa.bool_()),
+    ("item_name", pa.string()),
+    ("item_description", pa.string()),
+    ("quantity", pa.float64()),
+    ("unit_price", pa.float64()),
+    ("total_price", pa.float64()),
+    ("classification_codes", pa.list_(pa.int64())),
+    ("normalized_UNSPSC", pa.int64()),
+    ("commodity_title", pa.string()),
+    ("class", pa.int64()),
+    ("class_title", pa.string()),
+    ("family", pa.int64()),
+    ("family_title", pa.string()),
+    ("segment", pa.int64()),
+    ("segment_title", pa.string()),
+    ("location_zip", pa.string()),
+    ("location_lat", pa.float64()),
+    ("location_long", pa.float64()),
+])
+
+
+def read_chunks(csv_path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Read and clean the purchases CSV chunk by chunk, so memory stays bounded by the chunk size.
+
+    Every column is read as text: the types are parsed explicitly by transform_chunk, instead
+    of being inferred differently from one chunk to the next.
+
+    Yields:
+        pd.DataFrame: The cleaned records of each chunk, indexed by their CSV row number.
+    """
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size, dtype=str):
+        yield transform_chunk(chunk)
+
+
+def write_jsonl(chunks: Iterator[pd.DataFrame], output_path: Path) -> int:
+    """
+    Stream the cleaned chunks to a JSON lines file (the seeds/purchases.py input).
+
+    Returns:
+        int: The number of written records.
+    """
+    started_at = perf_counter()
+    rows = 0
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as file:
+        for chunk in chunks:
+            # dates as epoch milliseconds and NaN as null, like the original notebook export
+            file.write(chunk.to_json(orient="records", lines=True))
+            rows += len(chunk)
+            print(f"ETL: {rows} rows written ({rows / (perf_counter() - started_at):.0f} rows/s).")
+
+    return rows
+
+
+def write_parquet(chunks: Iterator[pd.DataFrame], output_path: Path) -> int:
+    """
+    Stream the cleaned chunks to a Parquet file, one row group per chunk (the columnar query engine snapshot).
+
+    Returns:
+        int: The number of written records.
+    """
+    started_at = perf_counter()
+    rows = 0
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with pq.ParquetWriter(output_path, PARQUET_SCHEMA) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=PARQUET_SCHEMA, preserve_index=False))
+            rows += len(chunk)
+            print(f"ETL: {rows} rows written ({rows / (perf_counter() - started_at):.0f} rows/s).")
+
+    return rows
+
+
+async def write_mongo(chunks: Iterator[pd.DataFrame], compact: bool = False) -> int:
+    """
+    Validate the cleaned chunks as Purchase documents and bulk-write them to MongoDB.
+
+    The collection and its seed checkpoint are reset first, so the purchases of a previous seed
+    or ETL run (ids from other offsets, compact fields) are replaced instead of mixed in. The
+    documents are encoded and inserted like the seeder's, with the ids of their CSV row numbers.
+    With compact, the lookup collections are built from the written purchases and their strings
+    are replaced by the codes (seeds/compact.py).
+
+    Returns:
+        int: The number of inserted documents.
+    """
+    # the settings (and the MongoDB credentials) are only needed by this sink
+    from core.database import init_database
+    from schemas.documents import LABEL_INDEXES, Purchase
+    from seeds.compact import compact_purchases
+    from seeds.purchases import insert_documents, reset_purchases, save_checkpoint
+    from seeds.workers import encode_purchase
+
+    client = await init_database()
+    started_at = perf_counter()
+    rows = skipped = 0
+
+    try:
+        await reset_purchases()
+        await Purchase.get_motor_collection().create_indexes(LABEL_INDEXES)
+
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+
+            records = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+            documents: List[bytes] = []
+            for row_number, record in zip(chunk.index, records):
+                try:
+                    documents.append(encode_purchase(int(row_number), record))
+                except ValidationError:
+                    skipped += 1
+
+            rows += await insert_documents(documents)
+            print(f"ETL: {rows} documents inserted, {skipped} skipped ({rows / (perf_counter() - started_at):.0f} rows/s).")
+
+        # a completed checkpoint with a new data version, so the app does not re-seed and refreshes its derived data
+        await save_checkpoint(0, rows, completed=True)
+        if compact:
+            await compact_purchases()
+    finally:
+        client.close()
+
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Clean the purchase order CSV into purchases.json or MongoDB.")
+    parser.add_argument("csv", type=Path, help="the PURCHASE ORDER DATA EXTRACT CSV")
+    parser.add_argument("--output", type=Path, default=Path("seeds/data/purchases.json"), help="JSON lines file to write")
+    parser.add_argument("--mongo", action="store_true", help="bulk-write to the purchases collection instead of the JSON lines file")
+    parser.add_argument("--compact", action="store_true", help="with --mongo, store the low-cardinality strings as codes into lookup collections")
+    parser.add_argument("--parquet", type=Path, help="write a Parquet snapshot for QUERY_ENGINE=columnar instead of the JSON lines file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="CSV rows processed at a time")
+    args = parser.parse_args(argv)
+
+    chunks = read_chunks(args.csv, args.chunk_size)
+    if args.mongo:
+        asyncio.run(write_mongo(chunks, compact=args.compact))
+    elif args.parquet:
+        write_parquet(chunks, args.parquet)
+    else:
+        write_jsonl(chunks, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+# CSV column -> purchases.json field
+COLUMN_NAMES = {
+    "Creation Date": "creation_date",
+    "Purchase Date": "purchase_date",
+    "Fiscal Year": "fiscal_year",
+    "LPA Number": "lpa_number",
+    "Purchase Order Number": "purchase_order_number",
+    "Requisition Number": "requisition_number",
+    "Acquisition Type": "acquisition_type",
+    "Sub-Acquisition Type": "sub_acquisition_type",
+    "Acquisition Method": "acquisition_method",
+    "Sub-Acquisition Method": "sub_acquisition_method",
+    "Department Name": "department_name",
+    "Supplier Code": "supplier_code",
+    "Supplier Name": "supplier_name",
+    "Supplier Qualifications": "supplier_qualifications",
+    "Supplier Zip Code": "supplier_zip_code",
+    "CalCard": "cal_card",
+    "Item Name": "item_name",
+    "Item Description": "item_description",
+    "Quantity": "quantity",
+    "Unit Price": "unit_price",
+    "Total Price": "total_price",
+    "Classification Codes": "classification_codes",
+    "Normalized UNSPSC": "normalized_UNSPSC",
+    "Commodity Title": "commodity_title",
+    "Class": "class",
+    "Class Title": "class_title",
+    "Family": "family",
+    "Family Title": "family_title",
+    "Segment": "segment",
+    "Segment Title": "segment_title",
+    "Location": "location",
+}
+
+# float not int for the codes cuz some of the values are null
+NUMERIC_COLUMNS = ["supplier_code", "quantity", "normalized_UNSPSC", "class", "family", "segment"]
+CURRENCY_COLUMNS = ["unit_price", "total_price"]
+DATE_COLUMNS = ["creation_date", "purchase_date"]
+LIST_COLUMNS = ["supplier_qualifications", "classification_codes"]
+
+# text values that mean null
+NULL_TOKENS = ["nan", "NaN", "NAN", "null", "None"]
+
+# "zip" or "zip\n(lat, long)", any other shape is invalid
+LOCATION_PATTERN = r"^([^\n]*)(?:\n(?:\(*([^,\n]*),([^,\n]*?)\)*)?)?$"
+
+# purchases outside these years are data-entry errors
+MIN_PURCHASE_YEAR = 2003
+MAX_PURCHASE_YEAR = 2015
+
+
+def split_location(location: pd.Series) -> pd.DataFrame:
+    """
+    Split the location column into zip code, latitude and longitude.
+
+    A location with unparsable coordinates is null for all three values.
+    """
+    parts = location.str.extract(LOCATION_PATTERN)
+    zip_code = parts[0].str.strip()
+    lat = pd.to_numeric(parts[1].str.strip(), errors="coerce")
+    long = pd.to_numeric(parts[2].str.strip(), errors="coerce")
+
+    invalid = parts[1].notna() & (lat.isna() | long.isna())
+    zip_code = zip_code.mask(invalid)
+    lat = lat.mask(invalid)
+    long = long.mask(invalid)
+
+    return pd.DataFrame({"location_zip": zip_code, "location_lat": lat, "location_long": long}, index=location.index)
+
+
+def split_words(values: pd.Series) -> pd.Series:
+    # null and 'nan' become empty lists
+    lists = values.mask(values.str.lower().eq("nan")).str.split()
+    missing = lists.isna()
+    lists[missing] = pd.Series([[] for _ in range(missing.sum())], index=lists.index[missing], dtype=object)
+    return lists
+
+
+def split_codes(values: pd.Series) -> pd.Series:
+    # one row per code, parsed at once, then cut back into one list of integers per purchase
+    tokens = split_words(values).explode()
+    codes = pd.to_numeric(tokens, errors="coerce")
+    valid = codes.notna()
+    counts = valid.groupby(level=0, sort=False).sum().to_numpy()
+    arrays = np.split(codes[valid].to_numpy(dtype=np.int64), np.cumsum(counts)[:-1])
+    return pd.Series([array.tolist() for array in arrays], index=values.index, dtype=object)
+
+
+def parse_currency(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values.str.lstrip("$").str.replace(",", "", regex=False), errors="coerce")
+
+
+def transform_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Clean one chunk of the purchases CSV, read with every column as text.
+
+    Args:
+        df (pd.DataFrame): The raw chunk with the CSV column names.
+
+    Returns:
+        pd.DataFrame: The purchases.json records of the chunk.
+    """
+    df = df.rename(columns=COLUMN_NAMES)
+
+    location = split_location(df.pop("location"))
+    df = pd.concat([df, location], axis=1)
+
+    df["supplier_qualifications"] = split_words(df["supplier_qualifications"])
+    df["classification_codes"] = split_codes(df["classification_codes"])
+
+    # Replace multiple variations of 'nan', 'null', etc., with NaN (null) values
+    text_columns = [column for column in df.columns if df[column].dtype == object and column not in LIST_COLUMNS]
+    for column in text_columns:
+        df[column] = df[column].mask(df[column].isin(NULL_TOKENS))
+
+    df["cal_card"] = df["cal_card"].eq("YES")
+
+    for column in CURRENCY_COLUMNS:
+        df[column] = parse_currency(df[column])
+    for column in NUMERIC_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+    for column in DATE_COLUMNS:
+        df[column] = pd.to_datetime(df[column], format="%m/%d/%Y", errors="coerce")
+
+    # keep the purchases without a date
+    purchase_year = df["purchase_date"].dt.year
+    return df[purchase_year.isna() | purchase_year.between(MIN_PURCHASE_YEAR, MAX_PURCHASE_YEAR)]
@@ -1,39 +1,57 @@
+import asyncio
 from contextlib import asynccontextmanager
+from time import perf_counter
 
-from beanie import init_beanie
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import ORJSONResponse, RedirectResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
-from motor.motor_asyncio import AsyncIOMotorClient
 
+from core.chains import build_chain_registry
 from core.config import settings
-from core.dependencies import dependencies
-from routers import chats
-from schemas.documents import Purchase
-from seeds.purchases import seed_data
+from core.database import init_database
+from core.dependencies import dependencies, require_ready
+from core.metrics import RequestTimings, current_timings, render_metrics, request_seconds
+from core.readiness import readiness
+from routers import chats, status
+from seeds.startup import ensure_seeded
 
 
 # method for start the MongoDb Connection
 async def startup_db_client(app):
-    app.mongodb_client = AsyncIOMotorClient(settings.MONGO_URL)
+    app.mongodb_client = await init_database()
     app.mongodb = app.mongodb_client.get_database(settings.MONGODB_DATABASE)
 
-    # Initialize beanie with the Purchase document class
-    await init_beanie(database=app.mongodb, document_models=[Purchase])
-
-    # Check if the collection is empty, then seed it
-    collection = app.mongodb["purchases"]
-    count = await collection.count_documents({})
-    
-    # Seed the data if the collection is empty
-    if count == 0:
-        await seed_data() 
-
     print("MongoDB connected.")
 
+# method for seeding the purchases collection based on the SEED_MODE setting
+async def startup_seed(app):
+    app.seed_task = None
+
+    if settings.SEED_MODE == "background":
+        # serve requests right away, /chats/* answers 503 until the seed completes
+        app.seed_task = asyncio.create_task(ensure_seeded())
+        # the failure is already reported by ensure_seeded and kept in the readiness state
+        app.seed_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    elif settings.SEED_MODE == "blocking":
+        await ensure_seeded()
+    else:
+        # seeding runs outside the API process (python -m seeds.purchases)
+        readiness.status = "ready"
+
+# method for building the LLM client and chains once, shared by every request
+async def startup_chains(app):
+    app.state.chains = build_chain_registry()
+
+# method to close the pooled LLM connections
+async def shutdown_chains(app):
+    await app.state.chains.aclose()
+
 # method to close the database connection
 async def shutdown_db_client(app):
+    if app.seed_task and not app.seed_task.done():
+        app.seed_task.cancel()
+
     app.mongodb_client.close()
     print("Database disconnected.")
 
@@ -44,7 +62,10 @@ async def shutdown_db_client(app):
 async def lifespan(app: FastAPI):
     # Start the database connection
     await startup_db_client(app)
+    await startup_seed(app)
+    await startup_chains(app)
     yield
+    await shutdown_chains(app)
     # Close the database connection
     await shutdown_db_client(app)
 
@@ -97,11 +118,22 @@ app.mount("/static", StaticFiles(directory="static"), name="static") # the stati
 
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
-    from time import time
-    start_time = time()
-    response = await call_next(request)
-    process_time = time() - start_time
+    # the stages of the request add their time to these timings
+    timings = RequestTimings()
+    token = current_timings.set(timings)
+    start_time = perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        current_timings.reset(token)
+    # streaming responses are measured to their first byte, the stages still running are not in the header
+    process_time = perf_counter() - start_time
     response.headers["X-Process-Time"] = str(process_time)
+    response.headers["Server-Timing"] = timings.server_timing(total=process_time)
+
+    # the route template keeps the label values few (no path parameters)
+    route = request.scope.get("route")
+    request_seconds.observe(process_time, path=getattr(route, "path", "unmatched"))
     return response
 
 
@@ -110,9 +142,21 @@ app.include_router(
     chats.router,
     prefix="/chats",
     tags=["chats"],
-    dependencies=[],
+    dependencies=[Depends(require_ready)],
 )
 
+app.include_router(
+    status.router,
+    prefix="/status",
+    tags=["status"],
+)
+
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus histograms of the request, stage, database and LLM timings
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/")
@@ -1,57 +1,94 @@
+import asyncio
 import json
+from time import perf_counter
+from typing import AsyncIterator, Literal, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from langchain_core.output_parsers import JsonOutputParser
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
 
-from core.ollama import get_ollama_chat
-from services.chatbots import get_database_chat_template, get_readme_template
-from services.queries import invoke_function
+from core.chains import ChainRegistry
+from core.config import settings
+from core.dependencies import get_chains, get_client_id
+from core.metrics import RequestTimings, current_timings, request_seconds
+from core.scheduler import LLMQueueFull
+from schemas.chats import BatchRequest, FunctionCall
+from services.batch import answer_batch
+from services.queries import PAGINATED_FUNCTIONS, invoke_function, stream_items
+from services.renderers import render_answer
+from services.routing import classify_question, reject_route
 
 router = APIRouter()
 
+# table: render the results server-side, narrative: let the LLM write the answer
+AnswerMode = Literal["table", "narrative"]
 
-@router.post("/stage1")
-async def stage1(question: str):
-    # Initialize the chat model and parser
-    llm_chat = get_ollama_chat(temperature=0.0)
-    prompt = get_database_chat_template()
-    parser = JsonOutputParser()
-    prompt = prompt.partial(format_instructions=parser.get_format_instructions())
 
-    # Create the chain for processing the question
-    chain = prompt | llm_chat | parser
+# the error event of a question rejected by the LLM scheduler
+def busy_error(e: LLMQueueFull) -> dict:
+    return {"error": str(e), "status_code": status.HTTP_429_TOO_MANY_REQUESTS, "retry_after": e.retry_after}
+
 
+# Run both stages for a question and yield (event, data) pairs as soon as each part is available
+async def answer_events(
+    chains: ChainRegistry,
+    question: str,
+    mode: Optional[AnswerMode] = None,
+    client: str = "anonymous",
+) -> AsyncIterator[Tuple[str, dict]]:
     try:
-        # Get the function response, which should be an integer
-        response = await chain.ainvoke({'question': question})
+        response, route_source = await classify_question(chains, question, client)
+    except LLMQueueFull as e:
+        yield "error", busy_error(e)
+        return
     except Exception as e:
-        # Log and raise an HTTP exception if there is an issue in the chain
-        raise HTTPException(status_code=500, detail=f"Error invoking database chain: {str(e)}")
+        yield "error", {"error": f"Error invoking database chain: {str(e)}"}
+        return
 
     try:
         # Call the function with the response from the previous chain
         database_response = await invoke_function(response)
     except Exception as e:
-        # Log and raise an HTTP exception if there is an issue with invoking the function
-        raise HTTPException(status_code=500, detail=f"Error invoking function with response: {str(e)}")
+        reject_route(question)
+        yield "error", {"error": f"Error invoking function with response: {str(e)}"}
+        return
 
-    return {'response': response, 'database_response': database_response}
+    # the raw results are sent before the (slow) formatting starts
+    yield "database", {"response": response, "database_response": database_response, "route_source": route_source}
 
+    yield "start", {}
 
-@router.post("/stage2")
-async def stage2(question: str):
-    # Initialize the chat model and parser
-    llm_chat = get_ollama_chat(temperature=0.0)
-    prompt = get_database_chat_template()
-    parser = JsonOutputParser()
-    prompt = prompt.partial(format_instructions=parser.get_format_instructions())
+    # the deterministic renderer answers without a second LLM call
+    if (mode or settings.ANSWER_MODE) == "table":
+        answer = render_answer(response, database_response)
+        if answer is not None:
+            yield "delta", {"content": answer}
+            yield "end", {"answer": answer, "route_source": route_source}
+            return
+
+    # Stream the formatted readme-style response token by token
+    answer = ""
+    try:
+        async for content in chains.stream_readme(question, database_response, client):
+            answer += content
+            yield "delta", {"content": content}
+    except LLMQueueFull as e:
+        yield "error", busy_error(e)
+        return
+    except Exception as e:
+        yield "error", {"error": f"Error generating readme-style response: {str(e)}"}
+        return
+
+    yield "end", {"answer": answer, "route_source": route_source}
 
-    # Create the chain for processing the question
-    chain = prompt | llm_chat | parser
 
+@router.post("/stage1")
+async def stage1(question: str, chains: ChainRegistry = Depends(get_chains), client: str = Depends(get_client_id)):
     try:
         # Get the function response, which should be an integer
-        response = await chain.ainvoke({'question': question})
+        response, route_source = await classify_question(chains, question, client)
+    except LLMQueueFull as e:
+        # too many questions are waiting for the LLM
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         # Log and raise an HTTP exception if there is an issue in the chain
         raise HTTPException(status_code=500, detail=f"Error invoking database chain: {str(e)}")
@@ -60,79 +97,169 @@ async def stage2(question: str):
         # Call the function with the response from the previous chain
         database_response = await invoke_function(response)
     except Exception as e:
+        reject_route(question)
         # Log and raise an HTTP exception if there is an issue with invoking the function
         raise HTTPException(status_code=500, detail=f"Error invoking function with response: {str(e)}")
 
-    # Generate a README-style response based on the database response
-    readme_prompt = get_readme_template()
-    readme_chain = readme_prompt | llm_chat
+    return {'response': response, 'database_response': database_response, 'route_source': route_source}
+
+
+@router.post("/batch")
+async def batch(
+    request: BatchRequest,
+    stream: bool = False,
+    chains: ChainRegistry = Depends(get_chains),
+    client: str = Depends(get_client_id),
+):
+    if len(request.questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch holds at most {settings.BATCH_MAX_QUESTIONS} questions.",
+        )
+
+    if stream:
+        # NDJSON: one result per line as soon as it is ready, the index gives its position in the request
+        async def result_lines():
+            async for item in answer_batch(chains, request.questions, client):
+                yield json.dumps(item, default=str) + "\n"
+
+        return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+    # the results are returned in the order of the questions, a failed question does not fail the batch
+    results = [None] * len(request.questions)
+    async for item in answer_batch(chains, request.questions, client):
+        results[item["index"]] = item
+    return {"results": results}
+
+
+@router.post("/items")
+async def items(call: FunctionCall, stream: bool = False):
+    # the pages of a list function: pass the next_cursor of a page in the parameters to get the next one
+    if call.function_number not in PAGINATED_FUNCTIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"The function {call.function_number} does not return pages.")
+
+    if stream:
+        # NDJSON: every item on its own line, read from the database one page at a time
+        async def item_lines():
+            try:
+                async for item in stream_items(call.model_dump()):
+                    yield json.dumps(item, default=str) + "\n"
+            except Exception as e:
+                yield json.dumps({"error": f"Error invoking function with response: {str(e)}"}) + "\n"
+
+        return StreamingResponse(item_lines(), media_type="application/x-ndjson")
 
     try:
-        # Get the formatted readme-style response
-        readme_response = await readme_chain.ainvoke({'question': question, 'response': database_response})
-        answer = readme_response.content
+        return await invoke_function(call.model_dump())
+    except ValueError as e:
+        # a malformed or foreign cursor
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        # Log and raise an HTTP exception if there is an issue generating the readme response
-        raise HTTPException(status_code=500, detail=f"Error generating readme-style response: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error invoking function with response: {str(e)}")
+
+
+@router.post("/stage2")
+async def stage2(
+    question: str,
+    mode: Optional[AnswerMode] = None,
+    chains: ChainRegistry = Depends(get_chains),
+    client: str = Depends(get_client_id),
+):
+    async for event, data in answer_events(chains, question, mode, client):
+        if event == "error" and "retry_after" in data:
+            # too many questions are waiting for the LLM
+            raise HTTPException(status_code=data["status_code"], detail=data["error"], headers={"Retry-After": str(data["retry_after"])})
+        if event == "error":
+            # Log and raise an HTTP exception if there is an issue in one of the stages
+            raise HTTPException(status_code=500, detail=data["error"])
+        if event == "end":
+            # Return the final answer
+            return data
+
 
-    # Return the final answer
-    return {"answer": answer}
+@router.post("/stage2/stream")
+async def stage2_stream(
+    question: str,
+    mode: Optional[AnswerMode] = None,
+    chains: ChainRegistry = Depends(get_chains),
+    client: str = Depends(get_client_id),
+):
+    # Server-Sent Events: database, start, delta..., end (or error)
+    async def event_stream():
+        # the Server-Timing header is sent before the answer, the end event has the full breakdown
+        timings = current_timings.get() or RequestTimings()
+        async for event, data in answer_events(chains, question, mode, client):
+            if event == "end":
+                data = {**data, "server_timing": timings.server_timing()}
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 
 
 @router.websocket("/ask")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    chains: ChainRegistry = Depends(get_chains),
+    client: str = Depends(get_client_id),
+):
     # Accept the WebSocket connection
     await websocket.accept()
 
-    llm_chat = get_ollama_chat(temperature=0.0)
-    prompt = get_database_chat_template()
-    parser = JsonOutputParser()
-    prompt = prompt.partial(format_instructions=parser.get_format_instructions())
-    chain = prompt | llm_chat | parser
+    async def send_answer(question: str, stream: bool, mode: Optional[AnswerMode]):
+        # every turn is timed like an HTTP request, the end frame carries its Server-Timing breakdown
+        timings = RequestTimings()
+        current_timings.set(timings)
+        start_time = perf_counter()
+
+        async for event, data in answer_events(chains, question, mode, client):
+            if event == "end":
+                data = {**data, "server_timing": timings.server_timing(total=perf_counter() - start_time)}
+
+            if stream:
+                await websocket.send_text(json.dumps({"type": event, **data}, default=str))
+            elif event == "error":
+                await websocket.send_text(json.dumps({"type": event, **data}))
+            elif event == "end":
+                # Send the answer back to the client
+                await websocket.send_text(json.dumps({"answer": data["answer"], "route_source": data["route_source"], "server_timing": data["server_timing"]}))
+
+        request_seconds.observe(perf_counter() - start_time, path=websocket.url.path)
+
+    # the next message is awaited while answering, so a disconnect cancels the queued or running LLM call
+    receive = asyncio.ensure_future(websocket.receive_text())
 
     # Handle receiving questions and sending answers via WebSocket
     try:
         while True:
             # Receive a message from the WebSocket client
-            message = await websocket.receive_text()
+            message = await receive
+            receive = asyncio.ensure_future(websocket.receive_text())
             message = json.loads(message)
             question = message.get("question")
 
-            if not question:
-                await websocket.send_text(json.dumps({"error": "No question provided"}))
-                continue
-
-            # Get the response from the chain processing
-            try:
-                response = await chain.ainvoke({'question': question})
-            except Exception as e:
-                await websocket.send_text(json.dumps({"error": f"Error invoking database chain: {str(e)}"}))
-                continue
+            # {"stream": true} sends typed frames (database, start, delta, end, error) instead of one answer
+            stream = bool(message.get("stream"))
+            mode = message.get("mode") if message.get("mode") in ("table", "narrative") else None
 
-            try:
-                # Call the function with the response from the previous chain
-                database_response = await invoke_function(response)
-            except Exception as e:
-                await websocket.send_text(json.dumps({"error": f"Error invoking function with response: {str(e)}"}))
+            if not question:
+                await websocket.send_text(json.dumps({"type": "error", "error": "No question provided"}))
                 continue
 
-            # Generate a README-style response based on the database response
-            readme_prompt = get_readme_template()
-            readme_chain = readme_prompt | llm_chat
+            answer = asyncio.ensure_future(send_answer(question, stream, mode))
+            await asyncio.wait({answer, receive}, return_when=asyncio.FIRST_COMPLETED)
 
-            try:
-                # Get the formatted readme-style response
-                readme_response = await readme_chain.ainvoke({'question': question, 'response': database_response})
-                answer = readme_response.content
-            except Exception as e:
-                await websocket.send_text(json.dumps({"error": f"Error generating readme-style response: {str(e)}"}))
-                continue
+            if not answer.done() and receive.done() and isinstance(receive.exception(), WebSocketDisconnect):
+                # the client left mid-generation, free its place in the LLM scheduler
+                answer.cancel()
+                await asyncio.gather(answer, return_exceptions=True)
+                raise receive.exception()
 
-            # Send the answer back to the client
-            response = json.dumps({"answer": answer})
-            await websocket.send_text(response)
+            # a question sent while answering is handled once the answer is sent
+            await answer
 
     except WebSocketDisconnect:
         # Handle client disconnection
-        pass
\ No newline at end of file
+        pass
+    finally:
+        receive.cancel()
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import ORJSONResponse
+
+from core.chains import ChainRegistry
+from core.dependencies import get_chains
+from core.readiness import readiness
+from services.intent_cache import intent_cache
+from services.queries import result_cache
+from services.routing import route_counts
+from services.search import item_search_stats
+
+router = APIRouter()
+
+
+@router.get("/ready")
+async def ready():
+    # 503 until the purchases collection is seeded, with the seeding progress
+    if not readiness.is_ready:
+        return ORJSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=readiness.to_dict())
+
+    return readiness.to_dict()
+
+
+@router.get("/cache")
+async def cache():
+    # hit/miss counters of the invoke_function result cache
+    return result_cache.stats()
+
+
+@router.get("/intent-cache")
+async def intent_cache_stats():
+    # hit/miss counters of the stage-1 intent cache
+    return intent_cache.stats()
+
+
+@router.get("/item-search")
+async def item_search():
+    # size and memory footprint of the item search index
+    return item_search_stats()
+
+
+@router.get("/routing")
+async def routing_stats():
+    # how many questions each routing path (fast_path, intent_cache, llm) served
+    return dict(route_counts)
+
+
+@router.get("/llm")
+async def llm_stats(chains: ChainRegistry = Depends(get_chains)):
+    # LLM scheduler: busy workers, queue depth, rejections and queue wait times
+    return chains.scheduler.stats()
@@ -0,0 +1,12 @@
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field
+
+
+class BatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, title="Questions")
+
+
+class FunctionCall(BaseModel):
+    function_number: int = Field(..., title="Function Number")
+    parameters: Dict[str, Any] = Field(default_factory=dict, title="Parameters")
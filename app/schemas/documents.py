@@ -1,10 +1,10 @@
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 import pymongo
 from beanie import Document
-from pydantic import Field
+from pydantic import BaseModel, Field, model_validator
 
 
 # Define an Enum for Fiscal Year
@@ -22,6 +22,40 @@ class AcquisitionTypeEnum(str, Enum):
     IT_Telecommunications = "IT Telecommunications"
 
 
+# A GeoJSON point, the coordinates are [longitude, latitude]
+class GeoPoint(BaseModel):
+    type: Literal["Point"] = "Point"
+    coordinates: List[float]
+
+
+def geo_point(lat: Optional[float], long: Optional[float]) -> Optional[GeoPoint]:
+    # the 2dsphere index rejects coordinates outside the valid ranges
+    if lat is None or long is None or not (-90 <= lat <= 90 and -180 <= long <= 180):
+        return None
+    return GeoPoint(coordinates=[long, lat])
+
+
+# The keys of the indexes the query pipelines hint: each one holds every field its pipeline reads,
+# so the pipeline is answered from the index without fetching the documents (a covered query)
+PURCHASE_DATE_ITEMS_INDEX = [("purchase_date", pymongo.ASCENDING), ("item_name", pymongo.ASCENDING), ("total_price", pymongo.ASCENDING)]
+FISCAL_YEAR_ITEMS_INDEX = [("fiscal_year", pymongo.ASCENDING), ("item_name", pymongo.ASCENDING), ("total_price", pymongo.ASCENDING)]
+ITEM_QUANTITY_INDEX = [("item_name", pymongo.ASCENDING), ("quantity", pymongo.ASCENDING)]
+# the stored field names: segment_code and family_code are aliases of segment and family
+SEGMENT_FAMILY_INDEX = [("segment", pymongo.ASCENDING), ("family", pymongo.ASCENDING)]
+SUPPLIER_INDEX = [("supplier_name", pymongo.ASCENDING), ("supplier_zip_code", pymongo.ASCENDING)]
+DEPARTMENT_INDEX = [("department_name", pymongo.ASCENDING)]
+UNSPSC_INDEX = [("normalized_UNSPSC", pymongo.ASCENDING)]
+# the indexes of the strings the compact schema replaces, created by the seed and dropped by the compaction:
+# not in Purchase.Settings, init_beanie would rebuild them over the missing fields of a compact collection
+LABEL_INDEXES = [
+    pymongo.IndexModel(SUPPLIER_INDEX, name="supplier_name_supplier_zip_code_index"),
+    pymongo.IndexModel(DEPARTMENT_INDEX),
+]
+# the codes of the compact schema (python -m seeds.compact), created with it
+DEPARTMENT_ID_INDEX = [("department_id", pymongo.ASCENDING)]
+SUPPLIER_ID_INDEX = [("supplier_id", pymongo.ASCENDING)]
+
+
 class Purchase(Document):
     creation_date: datetime = Field(..., title="Creation Date")
     purchase_date: Optional[datetime] = Field(None, title="Purchase Date")
@@ -31,9 +65,9 @@ class Purchase(Document):
     requisition_number: Optional[str] = Field(None, title="Requisition Number")
     acquisition_type: AcquisitionTypeEnum = Field(..., title="Acquisition Type")
     sub_acquisition_type: Optional[str] = Field(None, title="Sub-Acquisition Type")
-    acquisition_method: str = Field(..., title="Acquisition Method")
+    acquisition_method: Optional[str] = Field(None, title="Acquisition Method") # None on the compact schema
     sub_acquisition_method: Optional[str] = Field(None, title="Sub-Acquisition Method")
-    department_name: str = Field(..., title="Department Name")
+    department_name: Optional[str] = Field(None, title="Department Name") # None on the compact schema
     supplier_code: Optional[int] = Field(None, title="Supplier Code")
     supplier_name: Optional[str] = Field(None, title="Supplier Name")
     supplier_qualifications: Optional[List[str]] = Field(None, title="Supplier Qualifications")
@@ -56,6 +90,13 @@ class Purchase(Document):
     location_zip: Optional[str] = Field(None, title="Location Zip Code")
     location_lat: Optional[float] = Field(None, title="Location Latitude")
     location_long: Optional[float] = Field(None, title="Location Longitude")
+    location: Optional[GeoPoint] = Field(None, title="Location") # derived from location_lat and location_long
+
+    @model_validator(mode="after")
+    def set_location(self):
+        if self.location is None:
+            self.location = geo_point(self.location_lat, self.location_long)
+        return self
 
     class Settings:
         name = "purchases"
@@ -63,17 +104,15 @@ class Purchase(Document):
         cache_expiration_time = timedelta(seconds=30)
         cache_capacity = 5
         indexes = [
-            'fiscal_year',
             'acquisition_type',
-            'item_name',
-            'purchase_date',
-            'segment_code',
-            pymongo.IndexModel(
-                [("supplier_name", pymongo.ASCENDING), ("supplier_zip_code", pymongo.ASCENDING)],
-                name="supplier_name_supplier_zip_code_index",
-            ),
+            pymongo.IndexModel(PURCHASE_DATE_ITEMS_INDEX, name="purchase_date_item_name_total_price_index"),
+            pymongo.IndexModel(FISCAL_YEAR_ITEMS_INDEX, name="fiscal_year_item_name_total_price_index"),
+            pymongo.IndexModel(ITEM_QUANTITY_INDEX, name="item_name_quantity_index"),
+            pymongo.IndexModel(SEGMENT_FAMILY_INDEX, name="segment_family_index"),
+            pymongo.IndexModel(UNSPSC_INDEX),
             pymongo.IndexModel(
                 [("location_lat", pymongo.ASCENDING), ("location_long", pymongo.ASCENDING)],
                 name="location_lat_location_long_index",
             ),
+            pymongo.IndexModel([("location", pymongo.GEOSPHERE)], name="location_2dsphere_index"),
         ]
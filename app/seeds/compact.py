@@ -0,0 +1,332 @@
+import argparse
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from time import monotonic, perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import pymongo
+from pymongo import UpdateOne
+
+from core.config import settings
+from core.database import init_database
+from schemas.documents import DEPARTMENT_ID_INDEX, LABEL_INDEXES, SUPPLIER_ID_INDEX, Purchase
+
+from .purchases import get_data_version, get_seeds_collection
+
+# the id of the document that records the compacted data version inside the seeds collection
+COMPACT_ID = "compact"
+
+# purchases updated per bulk_write call
+BATCH_SIZE = 1000
+
+
+@dataclass
+class Dictionary:
+    name: str  # the lookup collection, {"_id": code, **fields}
+    code: str  # the purchase field holding the code
+    fields: List[str]  # the purchase fields the code replaces
+
+
+DEPARTMENTS = Dictionary("lookup_departments", "department_id", ["department_name"])
+ACQUISITION_METHODS = Dictionary("lookup_acquisition_methods", "acquisition_method_id", ["acquisition_method"])
+SUPPLIERS = Dictionary("lookup_suppliers", "supplier_id", ["supplier_name", "supplier_zip_code"])
+# the UNSPSC codes stay on the purchases (the queries filter and group by them), only their titles move
+UNSPSC_TITLES = Dictionary("lookup_unspsc", "unspsc_id", ["segment_title", "family_title", "class_title", "commodity_title"])
+
+DICTIONARIES: List[Dictionary] = [DEPARTMENTS, ACQUISITION_METHODS, SUPPLIERS, UNSPSC_TITLES]
+
+# the codes the query pipelines group by
+CODE_INDEXES = [
+    pymongo.IndexModel(DEPARTMENT_ID_INDEX, name="department_id_index"),
+    pymongo.IndexModel(SUPPLIER_ID_INDEX, name="supplier_id_index"),
+]
+
+
+@dataclass
+class CompactState:
+    compact: bool = False
+    checked_at: float = float("-inf")
+
+
+# in-process copy of the compact marker, re-read every DATA_VERSION_CHECK_INTERVAL seconds
+_state = CompactState()
+
+
+def get_database():
+    return Purchase.get_motor_collection().database
+
+
+async def is_compact() -> bool:
+    """
+    Check if the purchases of the current data version store the codes instead of the strings.
+    """
+    if monotonic() - _state.checked_at > settings.DATA_VERSION_CHECK_INTERVAL:
+        marker = await get_seeds_collection().find_one({"_id": COMPACT_ID})
+        data_version = await get_data_version()
+        # a re-seed writes the strings again under a new data version
+        _state.compact = bool(marker and data_version and marker.get("data_version") == data_version)
+        _state.checked_at = monotonic()
+
+    return _state.compact
+
+
+def join_labels(dictionary: Dictionary, code_field: str = "_id") -> List[Dict]:
+    """
+    The stages adding the fields of a dictionary to every row, from the code in code_field.
+    """
+    return [
+        {"$lookup": {"from": dictionary.name, "localField": code_field, "foreignField": "_id", "as": "labels"}},
+        {"$set": {name: {"$arrayElemAt": [f"$labels.{name}", 0]} for name in dictionary.fields}},
+        {"$project": {"labels": 0}},
+    ]
+
+
+def sort_key(values: Tuple) -> Tuple:
+    # nulls first like MongoDB, so the codes sort like the values they encode
+    return tuple((0,) if value is None else (1, value) for value in values)
+
+
+async def build_dictionary(dictionary: Dictionary) -> Dict[Tuple, int]:
+    """
+    Number the distinct values of the dictionary fields in sort order and write the lookup collection.
+
+    Returns:
+        Dict[Tuple, int]: The code of every distinct tuple of field values.
+    """
+    pipeline = [{"$group": {"_id": {name: f"${name}" for name in dictionary.fields}}}]
+    rows = await Purchase.get_motor_collection().aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+    # a missing field and a null are the same value
+    values = sorted({tuple(row["_id"].get(name) for name in dictionary.fields) for row in rows}, key=sort_key)
+    codes = {value: code for code, value in enumerate(values)}
+
+    collection = get_database()[dictionary.name]
+    await collection.delete_many({})
+    if values:
+        await collection.insert_many([{"_id": code, **dict(zip(dictionary.fields, value))} for value, code in codes.items()])
+    return codes
+
+
+async def load_dictionary(dictionary: Dictionary) -> Dict[int, Dict[str, Any]]:
+    return {
+        document.pop("_id"): document
+        async for document in get_database()[dictionary.name].find({})
+    }
+
+
+async def bulk_update(updates: List[UpdateOne]) -> int:
+    if not updates:
+        return 0
+    result = await Purchase.get_motor_collection().bulk_write(updates, ordered=False)
+    return result.modified_count
+
+
+async def set_fields(fields_of) -> int:
+    """
+    Set the fields returned by fields_of(document) on every purchase, BATCH_SIZE documents per bulk_write.
+    """
+    projection = {name: 1 for dictionary in DICTIONARIES for name in dictionary.fields + [dictionary.code]}
+    updates: List[UpdateOne] = []
+    updated = 0
+
+    async for document in Purchase.get_motor_collection().find({}, projection):
+        updates.append(UpdateOne({"_id": document["_id"]}, {"$set": fields_of(document)}))
+        if len(updates) == BATCH_SIZE:
+            updated += await bulk_update(updates)
+            updates = []
+
+    return updated + await bulk_update(updates)
+
+
+async def drop_indexes(indexes: List[pymongo.IndexModel]):
+    # an interrupted run may have dropped some of them already
+    collection = Purchase.get_motor_collection()
+    existing = await collection.index_information()
+    for index in indexes:
+        if index.document["name"] in existing:
+            await collection.drop_index(index.document["name"])
+
+
+async def wait_for_readers(wait: bool):
+    # the other workers read the marker every DATA_VERSION_CHECK_INTERVAL seconds, until then they read the old fields
+    _state.checked_at = float("-inf")
+    if wait:
+        print(f"Waiting {settings.DATA_VERSION_CHECK_INTERVAL}s for the other workers to read the compact marker...")
+        await asyncio.sleep(settings.DATA_VERSION_CHECK_INTERVAL)
+
+
+async def compact_purchases(wait: bool = True) -> int:
+    """
+    Replace the dictionary fields of the purchases with integer codes into the lookup collections.
+
+    The codes are written next to the strings first and the marker is recorded, so the readers
+    switch to the codes before the strings are removed. An interrupted run can be started again.
+
+    Args:
+        wait (bool): Wait DATA_VERSION_CHECK_INTERVAL seconds between the marker and the removal
+            of the strings (workers serving requests read the marker on that interval).
+
+    Returns:
+        int: The number of updated purchases.
+    """
+    data_version = await get_data_version()
+    if data_version is None:
+        print("Compaction skipped: the purchases collection is not seeded.")
+        return 0
+
+    started_at = perf_counter()
+    codes = {dictionary.name: await build_dictionary(dictionary) for dictionary in DICTIONARIES}
+
+    def code_fields(document: dict) -> dict:
+        return {
+            dictionary.code: codes[dictionary.name][tuple(document.get(name) for name in dictionary.fields)]
+            for dictionary in DICTIONARIES
+        }
+
+    updated = await set_fields(code_fields)
+    await Purchase.get_motor_collection().create_indexes(CODE_INDEXES)
+
+    await get_seeds_collection().update_one(
+        {"_id": COMPACT_ID},
+        {"$set": {"data_version": data_version, "compacted_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    await wait_for_readers(wait)
+
+    await Purchase.get_motor_collection().update_many(
+        {}, {"$unset": {name: "" for dictionary in DICTIONARIES for name in dictionary.fields}}
+    )
+    # the indexes of the removed strings would only hold nulls
+    await drop_indexes(LABEL_INDEXES)
+    print(f"Purchases compacted: {updated} documents updated in {perf_counter() - started_at:.1f}s.")
+    return updated
+
+
+async def expand_purchases(wait: bool = True) -> int:
+    """
+    Write the dictionary fields back from the lookup collections and remove the codes.
+
+    Returns:
+        int: The number of updated purchases.
+    """
+    started_at = perf_counter()
+    labels = {dictionary.name: await load_dictionary(dictionary) for dictionary in DICTIONARIES}
+
+    def label_fields(document: dict) -> dict:
+        fields = {}
+        for dictionary in DICTIONARIES:
+            if dictionary.code in document:
+                fields.update(labels[dictionary.name][document[dictionary.code]])
+        return fields
+
+    updated = await set_fields(label_fields)
+    # the string pipelines hint these indexes, they exist before the readers switch back
+    await Purchase.get_motor_collection().create_indexes(LABEL_INDEXES)
+
+    await get_seeds_collection().delete_one({"_id": COMPACT_ID})
+    await wait_for_readers(wait)
+
+    await Purchase.get_motor_collection().update_many({}, {"$unset": {dictionary.code: "" for dictionary in DICTIONARIES}})
+    await drop_indexes(CODE_INDEXES)
+    for dictionary in DICTIONARIES:
+        await get_database()[dictionary.name].drop()
+
+    print(f"Purchases expanded: {updated} documents updated in {perf_counter() - started_at:.1f}s.")
+    return updated
+
+
+async def collection_sizes() -> Dict[str, Dict[str, int]]:
+    # data and index bytes of the purchases and the lookup collections
+    sizes = {}
+    existing = set(await get_database().list_collection_names())
+    for name in [Purchase.Settings.name] + [dictionary.name for dictionary in DICTIONARIES]:
+        if name not in existing:
+            continue
+        stats = await get_database().command({"collStats": name})
+        sizes[name] = {
+            "documents": stats.get("count", 0),
+            "average_document": stats.get("avgObjSize", 0),
+            "data": stats.get("size", 0),
+            "storage": stats.get("storageSize", 0),
+            "indexes": stats.get("totalIndexSize", 0),
+        }
+    return sizes
+
+
+async def time_queries(repeat: int) -> Dict[str, float]:
+    """
+    Time the repository reads of the dictionary fields on the live pipelines (the rollups are skipped).
+
+    Returns:
+        Dict[str, float]: The milliseconds per call of every read.
+    """
+    from services.mongo_repository import MongoPurchaseRepository
+
+    repository = MongoPurchaseRepository(rollups=False)
+    calls = {
+        "top_departments": lambda: repository.top_departments(10),
+        "top_suppliers": lambda: repository.top_suppliers(5),
+        "item_terms": repository.item_terms,
+    }
+
+    timings = {}
+    for name, call in calls.items():
+        await call()
+        started_at = perf_counter()
+        for _ in range(repeat):
+            await call()
+        timings[name] = (perf_counter() - started_at) / repeat * 1000
+    return timings
+
+
+def print_report(before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]], timings_before: Dict[str, float], timings_after: Dict[str, float]):
+    def delta(old: float, new: float) -> str:
+        return f"{(new - old) / old:+.1%}" if old else "n/a"
+
+    print(f"{'collection':<28} {'documents':>10} {'avg doc B':>10} {'data MiB':>10} {'storage MiB':>12} {'index MiB':>10}")
+    for name, sizes in after.items():
+        old = before.get(name, {})
+        print(
+            f"{name:<28} {sizes['documents']:>10,} {sizes['average_document']:>10,} {sizes['data'] / 2**20:>10.1f} "
+            f"{sizes['storage'] / 2**20:>12.1f} {sizes['indexes'] / 2**20:>10.1f}"
+        )
+        if old.get("documents"):
+            print(
+                f"{'  before':<28} {old['documents']:>10,} {old['average_document']:>10,} {old['data'] / 2**20:>10.1f} "
+                f"{old['storage'] / 2**20:>12.1f} {old['indexes'] / 2**20:>10.1f}"
+                f"  (data {delta(old['data'], sizes['data'])}, indexes {delta(old['indexes'], sizes['indexes'])})"
+            )
+
+    print(f"{'query':<28} {'before ms':>10} {'after ms':>10} {'delta':>8}")
+    for name, old in timings_before.items():
+        new = timings_after[name]
+        print(f"{name:<28} {old:>10.1f} {new:>10.1f} {delta(old, new):>8}")
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Store the low-cardinality purchase strings as integer codes into lookup collections.")
+    parser.add_argument("--revert", action="store_true", help="write the strings back and remove the codes")
+    parser.add_argument("--no-wait", action="store_true", help="do not wait for the other workers (no API is running)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed calls per query for the report")
+    args = parser.parse_args(argv)
+
+    client = await init_database()
+    try:
+        compact = await is_compact()
+        if compact != args.revert:
+            print("Nothing to do: the purchases are " + ("compact." if compact else "not compact."))
+            return
+
+        sizes_before, timings_before = await collection_sizes(), await time_queries(args.repeat)
+        if args.revert:
+            await expand_purchases(wait=not args.no_wait)
+        else:
+            await compact_purchases(wait=not args.no_wait)
+        print_report(sizes_before, await collection_sizes(), timings_before, await time_queries(args.repeat))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from core.config import settings
+from core.database import init_database
+from schemas.documents import Purchase
+
+from .purchases import get_seeds_collection
+
+# the id of the document that lists the applied migrations inside the seeds collection
+MIGRATIONS_ID = "migrations"
+
+
+async def backfill_locations() -> int:
+    """
+    Add the GeoJSON location to the purchases seeded before it existed.
+
+    Returns:
+        int: The number of updated documents.
+    """
+    # the 2dsphere index is created by init_beanie from the Purchase settings
+    # the same coordinate ranges as schemas.documents.geo_point
+    result = await Purchase.get_motor_collection().update_many(
+        {
+            "location": {"$exists": False},
+            "location_lat": {"$gte": -90, "$lte": 90},
+            "location_long": {"$gte": -180, "$lte": 180},
+        },
+        [{"$set": {"location": {"type": "Point", "coordinates": ["$location_long", "$location_lat"]}}}],
+    )
+    return result.modified_count
+
+
+# Every migration is applied once per database, in order
+MIGRATIONS: Dict[str, Callable[[], Awaitable[int]]] = {
+    "location": backfill_locations,
+}
+
+
+@dataclass
+class MigrationState:
+    applied: Set[str] = field(default_factory=set)
+    checked_at: float = float("-inf")
+
+
+# in-process copy of the applied migrations, re-read every DATA_VERSION_CHECK_INTERVAL seconds
+_state = MigrationState()
+
+
+async def get_applied_migrations() -> Set[str]:
+    document = await get_seeds_collection().find_one({"_id": MIGRATIONS_ID})
+    return set((document or {}).get("applied", []))
+
+
+async def is_applied(name: str) -> bool:
+    # a migration is never reverted, so only the pending ones are checked again
+    if name not in _state.applied and monotonic() - _state.checked_at > settings.DATA_VERSION_CHECK_INTERVAL:
+        _state.applied = await get_applied_migrations()
+        _state.checked_at = monotonic()
+
+    return name in _state.applied
+
+
+async def apply_migrations(force: bool = False) -> List[str]:
+    """
+    Apply the migrations that are not recorded yet (or all of them with force).
+
+    Returns:
+        List[str]: The names of the applied migrations.
+    """
+    applied = set() if force else await get_applied_migrations()
+    names = [name for name in MIGRATIONS if name not in applied]
+
+    for name in names:
+        count = await MIGRATIONS[name]()
+        await get_seeds_collection().update_one({"_id": MIGRATIONS_ID}, {"$addToSet": {"applied": name}}, upsert=True)
+        print(f"Migration {name} applied: {count} documents updated.")
+
+    _state.checked_at = float("-inf")
+    return names
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Apply the pending migrations of the purchases collection.")
+    parser.add_argument("--force", action="store_true", help="apply every migration again, even the recorded ones")
+    args = parser.parse_args(argv)
+
+    client = await init_database()
+    try:
+        names = await apply_migrations(force=args.force)
+        print(f"Applied migrations: {', '.join(names) or 'none (all applied)'}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,27 +1,283 @@
-import json
+import argparse
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import BulkWriteError
 
 from core.config import settings
-from schemas.documents import Purchase
+from core.database import init_database
+from schemas.documents import LABEL_INDEXES, Purchase
+
+from .workers import parse_range, split_ranges
+
+# the id of the checkpoint document inside the seeds collection
+SEED_ID = "purchases"
+
+# bump when the seed file or the Purchase schema changes, so existing databases are re-seeded
+SEED_VERSION = 1
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+@dataclass
+class SeedProgress:
+    rows: int = 0  # documents written to the collection
+    skipped: int = 0  # lines that failed validation
+    offset: int = 0  # byte offset of the next line to read
+    started_at: float = field(default_factory=perf_counter)
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = perf_counter() - self.started_at
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+
+def get_data_path() -> Path:
+    return settings.ROOT_PATH / "seeds" / "data" / "purchases.json"
+
+
+# collection that keeps the seeding checkpoint of each seeded collection
+def get_seeds_collection():
+    return Purchase.get_motor_collection().database["seeds"]
+
+
+def get_worker_count(workers: Optional[int] = None) -> int:
+    # 0 means one worker process per CPU core
+    workers = settings.SEED_WORKERS if workers is None else workers
+    return workers or os.cpu_count() or 1
+
+
+async def parse_file(
+    data_path: Path,
+    start_offset: int,
+    batch_size: int,
+    workers: int,
+) -> AsyncIterator[Tuple[List[bytes], int, int, int]]:
+    """
+    Parse and validate the seed file from a byte offset in a pool of worker processes.
+
+    The file is sharded into byte ranges of about batch_size lines. At most two ranges per
+    worker are in flight, so the parsed documents waiting to be written stay bounded.
+
+    Args:
+        data_path (Path): The JSON lines file to read.
+        start_offset (int): The byte offset to resume from.
+        batch_size (int): The number of lines per range.
+        workers (int): The number of worker processes.
+
+    Yields:
+        Tuple[List[bytes], int, int, int]: The BSON documents of a range, the number of skipped
+        lines and the (start, end) offsets of the range, in completion order.
+    """
+    loop = asyncio.get_running_loop()
+    # spawn: forking a process that runs an event loop and the MongoDB client threads is unsafe
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    pending: Set[asyncio.Future] = set()
+
+    try:
+        for start, end in split_ranges(data_path, start_offset, batch_size):
+            if len(pending) >= workers * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(loop.run_in_executor(pool, parse_range, data_path, start, end))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def insert_documents(documents: List[bytes]) -> int:
+    """
+    Insert BSON documents encoded by the worker processes with a single unordered insert_many call.
+
+    Returns:
+        int: The number of newly inserted documents (replayed documents are ignored).
+    """
+    if not documents:
+        return 0
+
+    try:
+        result = await Purchase.get_motor_collection().insert_many(
+            [RawBSONDocument(document) for document in documents],
+            ordered=False,
+        )
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        return count_inserted(e)
+
+
+def count_inserted(e: BulkWriteError) -> int:
+    # documents already written before an interruption raise duplicate key errors
+    errors = [error for error in e.details["writeErrors"] if error["code"] != DUPLICATE_KEY_ERROR]
+    if errors:
+        raise e
+    return e.details["nInserted"]
+
+
+async def get_checkpoint() -> Optional[dict]:
+    return await get_seeds_collection().find_one({"_id": SEED_ID})
+
+
+def is_seeded(checkpoint: Optional[dict]) -> bool:
+    return bool(checkpoint and checkpoint.get("completed") and checkpoint.get("version") == SEED_VERSION)
+
+
+async def save_checkpoint(offset: int, rows: int, completed: bool = False):
+    checkpoint = {
+        "offset": offset,
+        "rows": rows,
+        "completed": completed,
+        "version": SEED_VERSION,
+        "updated_at": datetime.now(timezone.utc),
+    }
+    if completed:
+        # a new data version on every completed seed lets derived data (rollups, caches) detect changes
+        checkpoint["data_version"] = str(ObjectId())
+
+    await get_seeds_collection().update_one({"_id": SEED_ID}, {"$set": checkpoint}, upsert=True)
+
+
+async def get_data_version() -> Optional[str]:
+    checkpoint = await get_checkpoint()
+    return checkpoint.get("data_version") if is_seeded(checkpoint) else None
+
+
+async def reset_purchases():
+    # remove the purchases and the checkpoint, the next completed seed records a new data version
+    await Purchase.get_motor_collection().delete_many({})
+    await get_seeds_collection().delete_one({"_id": SEED_ID})
 
 
 # Method to seed the collection if it's empty
-async def seed_data():
-
-    data_path = settings.ROOT_PATH / "seeds" / "data" / "purchases.json"
-  
-    print("Seeding data...")
-    
-    # Open the JSON file and read the data
-    with open(data_path, "r") as file:
-        # Iterate over each line in the JSON file
-        for line in file:
-            # Convert each line into a dictionary
-            data = json.loads(line)
-            
-            # Create a Purchase document for the current line
-            purchase = Purchase(**data)
-            
-            # Insert the document into the collection
-            await purchase.insert()
-
-    print("Data seeded.")
\ No newline at end of file
+async def seed_data(
+    batch_size: Optional[int] = None,
+    reset: bool = False,
+    on_progress: Optional[Callable[[SeedProgress], Awaitable[None]]] = None,
+    workers: Optional[int] = None,
+    writers: Optional[int] = None,
+    data_path: Optional[Path] = None,
+) -> SeedProgress:
+    """
+    Stream the seed file into the purchases collection with bulk inserts.
+
+    Worker processes parse and validate byte ranges of the file, and writer tasks drain the
+    parsed ranges into MongoDB, so the event loop never runs the CPU-bound part. The position
+    in the file is checkpointed after every batch, so an interrupted seed resumes where it
+    stopped instead of starting again.
+
+    Args:
+        batch_size (Optional[int]): The number of documents per insert_many call (default is settings.SEED_BATCH_SIZE).
+        reset (bool): Drop the collection and the checkpoint before seeding.
+        on_progress (Optional[Callable[[SeedProgress], Awaitable[None]]]): Awaited after every written batch.
+        workers (Optional[int]): The number of parsing processes (default is settings.SEED_WORKERS).
+        writers (Optional[int]): The number of concurrent insert_many calls (default is settings.SEED_WRITERS).
+        data_path (Optional[Path]): The JSON lines file to seed from (default is seeds/data/purchases.json).
+
+    Returns:
+        SeedProgress: The totals of the run.
+    """
+    batch_size = batch_size or settings.SEED_BATCH_SIZE
+    data_path = data_path or get_data_path()
+
+    checkpoint = await get_checkpoint() or {}
+    if checkpoint and checkpoint.get("version") != SEED_VERSION:
+        print("Seed version changed, re-seeding data...")
+        reset = True
+
+    if reset:
+        await reset_purchases()
+        checkpoint = {}
+
+    if is_seeded(checkpoint):
+        print("Data already seeded.")
+        return SeedProgress(offset=checkpoint["offset"])
+
+    # the string indexes are dropped by a compaction (seeds/compact.py), the seed writes the strings again
+    await Purchase.get_motor_collection().create_indexes(LABEL_INDEXES)
+
+    # rows written by previous (interrupted) runs
+    seeded_rows = checkpoint.get("rows", 0)
+    progress = SeedProgress(offset=checkpoint.get("offset", 0))
+
+    workers = get_worker_count(workers)
+    writers = max(writers or settings.SEED_WRITERS, 1)
+    print(f"Seeding data from offset {progress.offset} with {workers} workers and {writers} writers...")
+
+    # parsed ranges waiting to be written, bounded so the workers cannot run far ahead of MongoDB
+    queue: asyncio.Queue = asyncio.Queue(maxsize=writers * 2)
+    # written ranges past the checkpoint offset (start -> end), ranges complete out of order
+    written: Dict[int, int] = {}
+    checkpoint_lock = asyncio.Lock()
+
+    async def read():
+        async for item in parse_file(data_path, progress.offset, batch_size, workers):
+            await queue.put(item)
+        for _ in range(writers):
+            await queue.put(None)
+
+    async def write():
+        while (item := await queue.get()) is not None:
+            documents, skipped, start, end = item
+            rows = await insert_documents(documents)
+
+            async with checkpoint_lock:
+                progress.rows += rows
+                progress.skipped += skipped
+                written[start] = end
+                # the checkpoint only moves past ranges that are all written
+                while progress.offset in written:
+                    progress.offset = written.pop(progress.offset)
+                await save_checkpoint(progress.offset, seeded_rows + progress.rows)
+
+            print(f"Seeded {progress.rows} rows ({progress.rows_per_second:.0f} rows/sec, {progress.skipped} skipped)")
+
+            if on_progress:
+                await on_progress(progress)
+
+    tasks = [asyncio.create_task(read())] + [asyncio.create_task(write()) for _ in range(writers)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    await save_checkpoint(progress.offset, seeded_rows + progress.rows, completed=True)
+
+    print(f"Data seeded: {progress.rows} rows in {perf_counter() - progress.started_at:.1f}s ({progress.rows_per_second:.0f} rows/sec).")
+    return progress
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Seed the purchases collection from seeds/data/purchases.json.")
+    parser.add_argument("--batch-size", type=int, default=settings.SEED_BATCH_SIZE, help="documents per insert_many call")
+    parser.add_argument("--reset", action="store_true", help="drop the collection and the checkpoint before seeding")
+    parser.add_argument("--workers", type=int, default=settings.SEED_WORKERS, help="parsing processes (0: one per CPU core)")
+    parser.add_argument("--writers", type=int, default=settings.SEED_WRITERS, help="concurrent insert_many calls")
+    parser.add_argument("--data", type=Path, help="seed from this file instead (e.g. python -m benchmarks.synthetic)")
+    args = parser.parse_args(argv)
+
+    client = await init_database()
+    try:
+        await seed_data(batch_size=args.batch_size, reset=args.reset, workers=args.workers, writers=args.writers, data_path=args.data)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
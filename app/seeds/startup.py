@@ -0,0 +1,233 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+from core.config import settings
+from core.readiness import readiness
+from schemas.documents import Purchase
+from services.data_version import refresh_data_version
+from services.rollups import build_rollups, get_stale_rollups
+from services.search import get_item_search
+
+from .compact import compact_purchases, is_compact
+from .migrations import MIGRATIONS, apply_migrations, get_applied_migrations
+from .purchases import SeedProgress, get_checkpoint, get_seeds_collection, is_seeded, save_checkpoint, seed_data
+
+# the id of the lease document that lets a single worker seed at a time
+LOCK_ID = "purchases_lock"
+LOCK_LEASE = timedelta(seconds=60)
+
+# seconds between two checkpoint reads while another worker is seeding
+POLL_INTERVAL = 2
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SeedLeaseLost(RuntimeError):
+    """
+    The seeding lease expired and another worker took it over while this one was seeding.
+    """
+
+
+async def acquire_seed_lock() -> bool:
+    """
+    Take (or renew) the seeding lease. An expired lease can be taken over by any worker.
+
+    Returns:
+        bool: True if this process holds the lease.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await get_seeds_collection().update_one(
+            {"_id": LOCK_ID, "$or": [{"owner": OWNER}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": OWNER, "expires_at": now + LOCK_LEASE}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # the lease exists and belongs to another live worker
+        return False
+
+
+async def release_seed_lock():
+    await get_seeds_collection().delete_one({"_id": LOCK_ID, "owner": OWNER})
+
+
+async def report_progress(progress: SeedProgress):
+    readiness.rows = progress.rows
+    readiness.rows_per_second = round(progress.rows_per_second, 1)
+
+    # keep the lease alive while batches are being written, a lost lease stops the seed
+    if not await acquire_seed_lock():
+        raise SeedLeaseLost("Another worker took over the seeding lease.")
+
+
+def mark_ready(checkpoint: dict):
+    readiness.status = "ready"
+    readiness.rows = checkpoint.get("rows", 0)
+    readiness.error = None
+    readiness.retry_at = None
+
+
+async def run_migrations():
+    # apply the pending migrations (backfills of new fields), one worker at a time
+    if set(MIGRATIONS) <= await get_applied_migrations():
+        return
+
+    if await acquire_seed_lock():
+        try:
+            await apply_migrations()
+        finally:
+            await release_seed_lock()
+
+
+async def run_compaction():
+    # compact the purchases of a new data version, one worker at a time
+    if not settings.COMPACT_SCHEMA or await is_compact():
+        return
+
+    if await acquire_seed_lock():
+        try:
+            await compact_purchases()
+        finally:
+            await release_seed_lock()
+
+
+async def refresh_rollups():
+    # build the rollups of the current data version, one worker at a time
+    if not settings.ROLLUPS_ENABLED or not await get_stale_rollups():
+        return
+
+    if await acquire_seed_lock():
+        try:
+            await build_rollups()
+        finally:
+            await release_seed_lock()
+
+
+async def ensure_seeded():
+    """
+    Make sure the purchases collection is seeded and keep the readiness state up to date.
+
+    Warm restarts only read the seed marker (the completed checkpoint). On a cold database one
+    worker takes the seeding lease and seeds, the others poll the checkpoint until it completes.
+    Once the data is seeded, pending migrations are applied, the purchases are compacted (with
+    COMPACT_SCHEMA) and stale rollups are rebuilt, then the app is marked ready (the queries
+    never see a half-migrated collection) and the item search index is built.
+    """
+    checkpoint = await wait_for_seed()
+    readiness.status = "preparing"
+
+    # a (re-)seed produced a new data version, drop the cached results of the old one
+    await refresh_data_version()
+
+    try:
+        await run_migrations()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Applying the migrations failed: {e}")
+
+    try:
+        await run_compaction()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Compacting the purchases failed: {e}")
+
+    try:
+        await refresh_rollups()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Building the rollups failed: {e}")
+
+    mark_ready(checkpoint)
+
+    # the first quantity question does not wait for the index, it is rebuilt when the data version changes
+    try:
+        await get_item_search()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Building the item search index failed: {e}")
+
+
+async def follow_seed() -> dict:
+    """
+    Seed the purchases, or follow the checkpoint of the worker seeding them, until the seed completes.
+
+    Returns:
+        dict: The completed checkpoint.
+    """
+    checkpoint = await get_checkpoint()
+    if is_seeded(checkpoint):
+        return checkpoint
+
+    collection = Purchase.get_motor_collection()
+    count = await collection.estimated_document_count()
+
+    # the collection was seeded before checkpoints existed
+    if checkpoint is None and count > 0:
+        await save_checkpoint(0, count, completed=True)
+        return await get_checkpoint()
+
+    readiness.status = "seeding"
+    while True:
+        checkpoint = await get_checkpoint()
+        if is_seeded(checkpoint):
+            return checkpoint
+
+        if await acquire_seed_lock():
+            try:
+                # Seed the data if the collection is empty, or resume an interrupted seed
+                await seed_data(reset=await collection.estimated_document_count() == 0, on_progress=report_progress)
+            except SeedLeaseLost as e:
+                # the other worker resumes from the checkpoint, the replayed batches are not duplicated
+                print(f"Seeding stopped: {e}")
+            finally:
+                await release_seed_lock()
+            continue
+
+        # another worker is seeding, follow its checkpoint
+        readiness.rows = (checkpoint or {}).get("rows", 0)
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+def retry_delay(attempts: int) -> float:
+    return min(settings.SEED_RETRY_DELAY * 2 ** (attempts - 1), settings.SEED_RETRY_MAX_DELAY)
+
+
+async def wait_for_seed() -> dict:
+    """
+    Seed the purchases or follow the worker seeding them, retrying the failures with a backoff.
+
+    An interrupted seed resumes from its checkpoint. After SEED_MAX_ATTEMPTS failures the
+    readiness state stays "failed" (restart_required) until the app is restarted.
+
+    Returns:
+        dict: The completed checkpoint.
+    """
+    while True:
+        try:
+            return await follow_seed()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            readiness.attempts += 1
+            readiness.error = str(e)
+
+            if settings.SEED_MAX_ATTEMPTS and readiness.attempts >= settings.SEED_MAX_ATTEMPTS:
+                readiness.status = "failed"
+                readiness.retry_at = None
+                print(f"Seeding failed after {readiness.attempts} attempts, restart the app to seed again: {e}")
+                raise
+
+            delay = retry_delay(readiness.attempts)
+            readiness.status = "retrying"
+            readiness.retry_at = (datetime.now(timezone.utc) + timedelta(seconds=delay)).isoformat()
+            print(f"Seeding failed (attempt {readiness.attempts}), retrying in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
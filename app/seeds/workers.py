@@ -0,0 +1,105 @@
+import json
+from pathlib import Path
+from typing import List, Tuple
+
+import bson
+from bson import ObjectId
+from pydantic import ConfigDict, ValidationError, create_model, model_validator
+
+from schemas.documents import Purchase
+
+# The Purchase fields as a plain pydantic model: the Beanie Document can only be built once
+# init_beanie ran, which needs a database connection in every worker process.
+PurchaseRecord = create_model(
+    "PurchaseRecord",
+    __config__=ConfigDict(populate_by_name=True, use_enum_values=True),
+    # the GeoJSON location is derived from the coordinates like in Purchase
+    __validators__={"set_location": model_validator(mode="after")(Purchase.set_location)},
+    **{
+        name: (field.annotation, field)
+        for name, field in Purchase.model_fields.items()
+        if name not in ("id", "revision_id")
+    },
+)
+
+
+def document_id(offset: int) -> ObjectId:
+    """
+    Build a deterministic ObjectId from the byte offset of a line in the seed file.
+
+    A batch that is replayed after an interruption collides with the documents it already
+    wrote instead of duplicating them.
+    """
+    return ObjectId(offset.to_bytes(12, "big"))
+
+
+def encode_purchase(offset: int, data: dict) -> bytes:
+    """
+    Validate a purchase and encode it as a BSON document, with the id of its offset in the source.
+
+    Raises:
+        ValidationError: The purchase does not match the Purchase schema.
+    """
+    record = PurchaseRecord.model_validate(data)
+    return bson.encode({"_id": document_id(offset), **record.model_dump(by_alias=True)})
+
+
+def split_ranges(data_path: Path, start_offset: int, batch_size: int) -> List[Tuple[int, int]]:
+    """
+    Shard the seed file into byte ranges of about batch_size lines, aligned on line starts.
+
+    Returns:
+        List[Tuple[int, int]]: The (start, end) byte offsets of every range, in file order.
+    """
+    size = data_path.stat().st_size
+    ranges = []
+
+    with open(data_path, "rb") as file:
+        # the range size comes from the average line length around the start offset
+        file.seek(start_offset)
+        sample = file.readlines(1 << 16)
+        line_length = sum(len(line) for line in sample) / len(sample) if sample else 1
+        range_size = max(int(line_length * batch_size), 1)
+
+        start = start_offset
+        while start < size:
+            file.seek(min(start + range_size, size))
+            # move to the start of the next line
+            file.readline()
+            end = file.tell()
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def parse_range(data_path: Path, start: int, end: int) -> Tuple[List[bytes], int, int, int]:
+    """
+    Parse and validate the lines of a byte range into BSON documents (runs in a worker process).
+
+    Returns:
+        Tuple[List[bytes], int, int, int]: The encoded documents, the number of skipped lines
+        and the (start, end) offsets of the range.
+    """
+    documents: List[bytes] = []
+    skipped = 0
+
+    with open(data_path, "rb") as file:
+        file.seek(start)
+        offset = start
+        while offset < end:
+            line = file.readline()
+            if not line:
+                break
+            line_offset = offset
+            offset += len(line)
+
+            if not line.strip():
+                continue
+
+            try:
+                documents.append(encode_purchase(line_offset, json.loads(line)))
+            except (ValueError, ValidationError):
+                skipped += 1
+
+    return documents, skipped, start, end
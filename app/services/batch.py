@@ -0,0 +1,80 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from core.chains import ChainRegistry
+from core.config import settings
+from core.scheduler import LLMQueueFull
+from services.cache import make_cache_key
+from services.queries import invoke_function
+from services.routing import classify_question, reject_route
+
+
+async def answer_batch(chains: ChainRegistry, questions: List[str], client: str = "anonymous") -> AsyncIterator[Dict[str, Any]]:
+    """
+    Classify and run many questions concurrently.
+
+    Identical questions are classified once and identical resolved calls (same function number
+    and normalized parameters) are run once. At most BATCH_LLM_CONCURRENCY questions are in
+    stage 1 at a time, so a batch cannot fill the LLM queue by itself, and at most
+    BATCH_QUERY_CONCURRENCY distinct queries run at a time.
+
+    Args:
+        chains (ChainRegistry): The shared chains.
+        questions (List[str]): The questions, in input order.
+        client (str): The client key of the LLM scheduler.
+
+    Yields:
+        Dict[str, Any]: One result per question as soon as it is ready (not in input order): its
+        index and question, then the stage-1 fields (response, database_response, route_source)
+        or an error (error, status_code and retry_after when the LLM was busy).
+    """
+    llm_slots = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY)
+    query_slots = asyncio.Semaphore(settings.BATCH_QUERY_CONCURRENCY)
+    classifications: Dict[str, asyncio.Task] = {}
+    calls: Dict[str, asyncio.Task] = {}
+
+    async def classify(question: str) -> Tuple[Any, str]:
+        async with llm_slots:
+            return await classify_question(chains, question, client)
+
+    async def execute(response: Any) -> Any:
+        async with query_slots:
+            return await invoke_function(response)
+
+    async def answer(index: int, question: str) -> Dict[str, Any]:
+        item: Dict[str, Any] = {"index": index, "question": question}
+
+        if question not in classifications:
+            classifications[question] = asyncio.ensure_future(classify(question))
+        try:
+            response, route_source = await asyncio.shield(classifications[question])
+        except LLMQueueFull as e:
+            return {**item, "error": str(e), "status_code": 429, "retry_after": e.retry_after}
+        except Exception as e:
+            return {**item, "error": f"Error invoking database chain: {str(e)}", "status_code": 500}
+
+        # routes that are not function calls are keyed as they are, invoke_function answers them with a message
+        if isinstance(response, dict):
+            key = make_cache_key(response.get("function_number"), response.get("parameters"))
+        else:
+            key = make_cache_key(None, {"response": response})
+        if key not in calls:
+            calls[key] = asyncio.ensure_future(execute(response))
+        try:
+            database_response = await asyncio.shield(calls[key])
+        except Exception as e:
+            reject_route(question)
+            return {**item, "error": f"Error invoking function with response: {str(e)}", "status_code": 500}
+
+        return {**item, "response": response, "database_response": database_response, "route_source": route_source}
+
+    tasks = [asyncio.ensure_future(answer(index, question)) for index, question in enumerate(questions)]
+    try:
+        for result in asyncio.as_completed(tasks):
+            yield await result
+    finally:
+        # the client went away: stop the questions and the shared calls that are still running
+        pending = [task for task in [*tasks, *classifications.values(), *calls.values()] if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, *classifications.values(), *calls.values(), return_exceptions=True)
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import re
+from collections import OrderedDict
+from datetime import date, datetime
+from enum import Enum
+from functools import partial
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# dates the query functions accept (strptime "%Y-%m-%d" also takes unpadded months and days)
+DATE_PATTERN = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+
+
+def canonicalize(value: Any) -> Any:
+    """
+    Normalize a function parameter so equivalent calls produce the same cache key.
+
+    Tuples and lists are unified, enums are replaced by their values and dates are
+    written as zero-padded 'YYYY-MM-DD' strings.
+    """
+    if isinstance(value, Enum):
+        return canonicalize(value.value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str):
+        match = DATE_PATTERN.match(value)
+        if match:
+            year, month, day = (int(part) for part in match.groups())
+            return f"{year:04d}-{month:02d}-{day:02d}"
+        return value
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): canonicalize(item) for key, item in value.items()}
+    return value
+
+
+def make_cache_key(function_number: Any, parameters: Optional[Dict]) -> str:
+    return json.dumps(
+        [function_number, canonicalize(parameters or {})],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+
+
+class AsyncResultCache:
+    """
+    An in-process LRU + TTL cache for coroutine results.
+
+    Concurrent misses on the same key share a single computation (single-flight), and
+    failures are never cached. The cache is cleared when the data version changes.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._version: Optional[str] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # misses that waited on an in-flight computation
+        self.evictions = 0
+
+    def invalidate(self, version: Optional[str] = None):
+        self._entries.clear()
+        self._version = version
+
+    def _get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if expires_at < monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _set(self, key: Hashable, value: Any):
+        self._entries[key] = (monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        version: Optional[str] = None,
+    ) -> Any:
+        """
+        Get a cached result, or compute it once for all the concurrent callers.
+
+        Args:
+            key (Hashable): The normalized call key.
+            compute (Callable[[], Awaitable[Any]]): Produces the result on a miss.
+            version (Optional[str]): The current data version, a new version clears the cache.
+
+        Returns:
+            Any: The cached or computed result. It is shared between callers and must not be mutated.
+        """
+        if version != self._version:
+            self.invalidate(version)
+
+        if self.maxsize <= 0:
+            return await compute()
+
+        found, value = self._get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            # the computation runs in its own task, so a cancelled caller does not cancel it for the others
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._on_done, key, version))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, version: Optional[str], task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+        # failures are not cached (exception() also marks them as retrieved)
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        # a result computed against an older data version is dropped
+        if version == self._version:
+            self._set(key, task.result())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "data_version": self._version,
+        }
@@ -0,0 +1,212 @@
+import asyncio
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from core.config import settings
+from services.dates import year_range
+from services.geo import distance_km, inside_polygon
+from services.repository import After, PurchaseRepository, keyset_page
+
+
+@dataclass
+class SnapshotState:
+    table: Optional[pa.Table] = None
+    version: Optional[str] = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # the version of the file on disk, re-read every DATA_VERSION_CHECK_INTERVAL seconds
+    file_version: Optional[str] = None
+    checked_at: float = float("-inf")
+
+
+# the loaded snapshot, reloaded when the file is replaced
+_state = SnapshotState()
+
+
+def get_snapshot_path() -> Path:
+    path = Path(settings.COLUMNAR_SNAPSHOT_PATH)
+    return path if path.is_absolute() else settings.ROOT_PATH / path
+
+
+def snapshot_version() -> str:
+    # a new snapshot file means new data, which also clears the result cache; like the MongoDB
+    # data version it is only re-checked on an interval, not stat-ed on every query
+    if monotonic() - _state.checked_at > settings.DATA_VERSION_CHECK_INTERVAL:
+        stat = os.stat(get_snapshot_path())
+        _state.file_version = f"{stat.st_mtime_ns}-{stat.st_size}"
+        _state.checked_at = monotonic()
+    return _state.file_version
+
+
+def load_snapshot(path: Path) -> pa.Table:
+    if path.suffix in (".arrow", ".feather"):
+        # Arrow IPC files are memory-mapped, the columns are read from the page cache without a copy
+        return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    return pq.read_table(path, memory_map=True)
+
+
+async def get_table() -> pa.Table:
+    version = snapshot_version()
+    if _state.version != version:
+        async with _state.lock:
+            if _state.version != version:
+                _state.table = await asyncio.to_thread(load_snapshot, get_snapshot_path())
+                _state.version = version
+                print(f"Columnar snapshot loaded: {_state.table.num_rows} rows ({_state.table.nbytes / 2**20:.0f} MiB).")
+    return _state.table
+
+
+def top_groups(table: pa.Table, keys: List[str], aggregation: Tuple, column: str, limit: int) -> List[dict]:
+    """
+    Group the table, aggregate and keep the largest groups.
+
+    Returns:
+        List[dict]: The group keys and the aggregate (named column) of the top groups, largest first
+        and ties by key (nulls first, like MongoDB).
+    """
+    grouped = table.group_by(keys).aggregate([aggregation])
+    aggregate = next(name for name in grouped.column_names if name not in keys)
+    sorting = [(aggregate, "descending")] + [(key, "ascending") for key in keys]
+    top = grouped.sort_by(sorting, null_placement="at_start").slice(0, limit)
+    return [{**{key: row[key] for key in keys}, column: row[aggregate]} for row in top.to_pylist()]
+
+
+def coordinates(table: pa.Table) -> Tuple[np.ndarray, np.ndarray]:
+    # the rows with a location, the same coordinate ranges as schemas.documents.geo_point
+    located = table.filter(
+        (pc.field("location_lat") >= -90) & (pc.field("location_lat") <= 90)
+        & (pc.field("location_long") >= -180) & (pc.field("location_long") <= 180)
+    )
+    return located.column("location_lat").to_numpy(), located.column("location_long").to_numpy()
+
+
+def distinct(values: pa.ChunkedArray) -> list:
+    unique = pc.unique(values)
+    return unique.take(pc.array_sort_indices(unique, null_placement="at_start")).to_pylist()
+
+
+# sums of groups without values are 0 like $sum, not null
+SUM = pc.ScalarAggregateOptions(min_count=0)
+
+
+class ColumnarPurchaseRepository(PurchaseRepository):
+    """
+    The purchases of the Parquet/Arrow snapshot, queried in-process with the Arrow kernels.
+
+    Every query runs in a thread (the kernels release the GIL).
+    """
+
+    name = "columnar"
+
+    async def _run(self, function, *args):
+        table = await get_table()
+        return await asyncio.to_thread(function, table, *args)
+
+    async def count_in_area(self, top_left: Tuple[float, float], bottom_right: Tuple[float, float]) -> int:
+        def count(table: pa.Table) -> int:
+            left_lat, left_long = top_left
+            right_lat, right_long = bottom_right
+            return table.filter(
+                (pc.field("location_lat") <= left_lat)
+                & (pc.field("location_lat") >= right_lat)
+                & (pc.field("location_long") >= left_long)
+                & (pc.field("location_long") <= right_long)
+            ).num_rows
+        return await self._run(count)
+
+    async def count_within_radius(self, center: Tuple[float, float], radius_km: float) -> int:
+        def count(table: pa.Table) -> int:
+            return int(np.count_nonzero(distance_km(*coordinates(table), center) <= radius_km))
+        return await self._run(count)
+
+    async def count_in_polygon(self, points: List[Tuple[float, float]]) -> int:
+        def count(table: pa.Table) -> int:
+            return int(np.count_nonzero(inside_polygon(*coordinates(table), points)))
+        return await self._run(count)
+
+    async def count_in_date_range(self, start: datetime, end: datetime) -> int:
+        def count(table: pa.Table) -> int:
+            return table.filter((pc.field("purchase_date") >= start) & (pc.field("purchase_date") < end)).num_rows
+        return await self._run(count)
+
+    async def top_spending_items(self, year: int, limit: int) -> List[Dict]:
+        start, end = year_range(year)
+
+        def top(table: pa.Table) -> List[Dict]:
+            purchases = table.filter(
+                (pc.field("purchase_date") >= start) & (pc.field("purchase_date") < end)
+            )
+            return top_groups(purchases, ["item_name"], ("total_price", "sum", SUM), "total_spending", limit)
+        return await self._run(top)
+
+    async def count_by_acquisition_type(self, acquisition_type: str) -> int:
+        def count(table: pa.Table) -> int:
+            return table.filter(pc.field("acquisition_type") == acquisition_type).num_rows
+        return await self._run(count)
+
+    async def total_quantity_by_items(self, item_names: List[str]) -> float:
+        def total(table: pa.Table) -> float:
+            quantities = table.filter(pc.field("item_name").isin(item_names)).column("quantity")
+            return pc.sum(quantities, options=SUM).as_py() or 0.0
+        return await self._run(total)
+
+    async def item_terms(self) -> Dict[str, List[str]]:
+        def terms(table: pa.Table) -> Dict[str, List[str]]:
+            grouped = table.filter(pc.field("item_name").is_valid()).group_by("item_name").aggregate(
+                [("item_description", "distinct"), ("commodity_title", "distinct")]
+            )
+            return {
+                name: sorted(value for value in descriptions + titles if value)
+                for name, descriptions, titles in zip(
+                    grouped.column("item_name").to_pylist(),
+                    grouped.column("item_description_distinct").to_pylist(),
+                    grouped.column("commodity_title_distinct").to_pylist(),
+                )
+            }
+        return await self._run(terms)
+
+    async def items_purchased_between(
+        self, start: datetime, end: datetime, after: Optional[After] = None, limit: Optional[int] = None
+    ) -> List[str]:
+        def items(table: pa.Table) -> List[str]:
+            purchases = table.filter((pc.field("purchase_date") >= start) & (pc.field("purchase_date") < end))
+            return keyset_page(distinct(purchases.column("item_name")), after, limit)
+        return await self._run(items)
+
+    async def family_codes_by_segment(self, segment_code: int, after: Optional[After] = None, limit: Optional[int] = None) -> List[int]:
+        def codes(table: pa.Table) -> List[int]:
+            return keyset_page(distinct(table.filter(pc.field("segment") == segment_code).column("family")), after, limit)
+        return await self._run(codes)
+
+    async def top_unspsc(self, limit: int) -> List[Dict]:
+        def top(table: pa.Table) -> List[Dict]:
+            rows = top_groups(table, ["normalized_UNSPSC"], ([], "count_all"), "Count", limit)
+            return [{"UNSPSC": row["normalized_UNSPSC"], "Count": row["Count"]} for row in rows]
+        return await self._run(top)
+
+    async def top_items_by_fiscal_year(self, fiscal_year: str, limit: int) -> List[Dict]:
+        def top(table: pa.Table) -> List[Dict]:
+            purchases = table.filter(pc.field("fiscal_year") == fiscal_year)
+            return top_groups(purchases, ["item_name"], ("total_price", "sum", SUM), "total_price", limit)
+        return await self._run(top)
+
+    async def top_departments(self, limit: int) -> List[Dict]:
+        def top(table: pa.Table) -> List[Dict]:
+            return top_groups(table, ["department_name"], ([], "count_all"), "order_count", limit)
+        return await self._run(top)
+
+    async def top_suppliers(self, limit: int) -> List[Dict]:
+        def top(table: pa.Table) -> List[Dict]:
+            return top_groups(table, ["supplier_name", "supplier_zip_code"], ([], "count_all"), "purchase_count", limit)
+        return await self._run(top)
+
+    async def data_version(self) -> Optional[str]:
+        return snapshot_version()
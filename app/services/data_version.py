@@ -0,0 +1,30 @@
+from dataclasses import dataclass
+from time import monotonic
+from typing import Optional
+
+from core.config import settings
+from seeds.purchases import get_data_version
+
+
+@dataclass
+class DataVersionState:
+    value: Optional[str] = None
+    checked_at: float = float("-inf")
+
+
+# in-process copy of the seed marker's data version, re-read every DATA_VERSION_CHECK_INTERVAL seconds
+_state = DataVersionState()
+
+
+async def current_data_version() -> Optional[str]:
+    if monotonic() - _state.checked_at > settings.DATA_VERSION_CHECK_INTERVAL:
+        _state.value = await get_data_version()
+        _state.checked_at = monotonic()
+
+    return _state.value
+
+
+async def refresh_data_version() -> Optional[str]:
+    # called after this process (re-)seeded the data, so caches see the new version right away
+    _state.checked_at = float("-inf")
+    return await current_data_version()
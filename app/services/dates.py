@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+# dates the query functions accept, strptime also takes unpadded months and days
+DATE_FORMAT = "%Y-%m-%d"
+
+
+class DateRange(NamedTuple):
+    # half-open: start <= purchase_date < end, both at midnight, so one index range covers whole days
+    start: datetime
+    end: datetime
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def day_range(date: str) -> DateRange:
+    # the whole day, its last second included
+    start = parse_date(date)
+    return DateRange(start, start + timedelta(days=1))
+
+
+def days_range(start_date: str, end_date: str) -> DateRange:
+    # from the start of start_date to the end of end_date, both days included
+    return DateRange(parse_date(start_date), parse_date(end_date) + timedelta(days=1))
+
+
+def year_range(year: int) -> DateRange:
+    return DateRange(datetime(year, 1, 1), datetime(year + 1, 1, 1))
+
+
+def is_midnight(value: datetime) -> bool:
+    return value == datetime(value.year, value.month, value.day)
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
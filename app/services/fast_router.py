@@ -0,0 +1,326 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from schemas.documents import AcquisitionTypeEnum, FiscalYearEnum
+
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})[-/](\d{1,2})[-/](\d{1,2})\b")
+US_DATE_PATTERN = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+YEAR_PATTERN = re.compile(r"\b(20\d{2}|19\d{2})\b")
+FISCAL_YEAR_PATTERN = re.compile(r"\b(20\d{2})\s*[-/]\s*(20\d{2})\b")
+COORDINATE_PATTERN = re.compile(r"(?<![\d.])(-?\d{1,3}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)(?![\d.])")
+DISTANCE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(km|kilometers?|kilometres?|mi|miles?)\b")
+INTEGER_PATTERN = re.compile(r"\b(\d+)\b")
+# the quotes have to be outside words, so the apostrophes of "what's" and "department's" do not quote
+QUOTED_PATTERN = re.compile(r"(?<!\w)[\"'`“‘]([^\"'`”’]+)[\"'`”’](?!\w)")
+DEPARTMENT_NAME_PATTERN = re.compile(r"\bdepartment of\b|\b(?:by|for|from|at) the [\w&'-]+(?: [\w&'-]+)? department\b")
+SUPPLIER_NAME_PATTERN = re.compile(r"\bsupplier (?:named|called)\b|\b(?:by|from) (?:the )?supplier\b|\b(?:supplied|sold) by\b")
+
+# the kinds of filters and limits a question can state, searched in order: every match is
+# removed before the next kind, so the year of a date is not also a year and a year not a number
+QUALIFIER_PATTERNS: List[Tuple[str, re.Pattern]] = [
+    ("name", QUOTED_PATTERN),
+    ("department", DEPARTMENT_NAME_PATTERN),
+    ("supplier", SUPPLIER_NAME_PATTERN),
+    ("date", ISO_DATE_PATTERN),
+    ("date", US_DATE_PATTERN),
+    ("fiscal_year", FISCAL_YEAR_PATTERN),
+    ("coordinates", COORDINATE_PATTERN),
+    ("distance", DISTANCE_PATTERN),
+    ("year", YEAR_PATTERN),
+    ("number", INTEGER_PATTERN),
+]
+
+COUNT_WORDS = ("how many", "count", "number of", "total number")
+TOP_WORDS = ("top", "most", "highest", "largest", "biggest", "best", "leading")
+
+
+@lru_cache(maxsize=None)
+def words_pattern(words: Tuple[str, ...]) -> re.Pattern:
+    # the words have to start a word, so "count" does not match "account"
+    return re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + ")")
+
+
+def has_any(text: str, words: Tuple[str, ...]) -> bool:
+    return words_pattern(words).search(text) is not None
+
+
+def find_dates(text: str) -> List[str]:
+    """
+    Find the dates of a question, in order, as 'YYYY-MM-DD' strings.
+    """
+    found = []
+    for match in ISO_DATE_PATTERN.finditer(text):
+        found.append((match.start(), match.group(1), match.group(2), match.group(3)))
+    for match in US_DATE_PATTERN.finditer(text):
+        found.append((match.start(), match.group(3), match.group(1), match.group(2)))
+
+    dates = []
+    for _, year, month, day in sorted(found):
+        try:
+            dates.append(datetime(int(year), int(month), int(day)).strftime("%Y-%m-%d"))
+        except ValueError:
+            continue
+    return dates
+
+
+def find_fiscal_year(text: str) -> Optional[FiscalYearEnum]:
+    for start, end in FISCAL_YEAR_PATTERN.findall(text):
+        try:
+            return FiscalYearEnum(f"{start}-{end}")
+        except ValueError:
+            continue
+    return None
+
+
+def find_acquisition_type(text: str) -> Optional[AcquisitionTypeEnum]:
+    # the longest names first, so "non-it goods" does not match as "it goods"
+    for acquisition_type in sorted(AcquisitionTypeEnum, key=lambda item: len(item.value), reverse=True):
+        if acquisition_type.value.casefold() in text:
+            return acquisition_type
+    return None
+
+
+def find_coordinates(text: str) -> List[Tuple[float, float]]:
+    coordinates = [(float(lat), float(long)) for lat, long in COORDINATE_PATTERN.findall(text)]
+    return [(lat, long) for lat, long in coordinates if -90 <= lat <= 90 and -180 <= long <= 180]
+
+
+def find_qualifiers(text: str) -> Dict[str, List[str]]:
+    """
+    Find the filters and limits of a question: quoted names, department and supplier names,
+    dates, fiscal years, coordinates, distances, years and other numbers.
+
+    Returns:
+        Dict[str, List[str]]: The matched texts of every kind found in the question.
+    """
+    qualifiers: Dict[str, List[str]] = {}
+    for kind, pattern in QUALIFIER_PATTERNS:
+        matches = [match.group(0) for match in pattern.finditer(text)]
+        if matches:
+            qualifiers.setdefault(kind, []).extend(matches)
+            text = pattern.sub(" ", text)
+
+    # "fiscal year 2013" without the range still filters on a fiscal year
+    if "fiscal" in text:
+        qualifiers.setdefault("fiscal_year", [])
+    return qualifiers
+
+
+def uses_only(qualifiers: Dict[str, List[str]], *kinds: str) -> bool:
+    # a question with a filter or a limit the rule does not pass on is left to the LLM, the route would drop it
+    return set(qualifiers) <= set(kinds) and len(qualifiers.get("number", [])) <= 1
+
+
+def find_limit(qualifiers: Dict[str, List[str]]) -> Optional[int]:
+    # the N of "top N", None when the question has no number
+    numbers = qualifiers.get("number")
+    return int(numbers[0]) if numbers else None
+
+
+def has_limit(qualifiers: Dict[str, List[str]], limit: int) -> bool:
+    # the functions with a fixed number of rows only answer a question asking for that number (or none)
+    return find_limit(qualifiers) in (None, limit)
+
+
+# Every rule maps a question to a route, or None when it does not apply
+def route_geographic_area(question: str) -> Optional[dict]:
+    text = question.casefold()
+    if not has_any(text, ("area", "region", "box", "rectangle", "within", "between coordinates")):
+        return None
+    if "polygon" in text:
+        return None
+
+    coordinates = find_coordinates(text)
+    if len(coordinates) != 2 or not uses_only(find_qualifiers(text), "coordinates"):
+        return None
+
+    (lat1, long1), (lat2, long2) = coordinates
+    return {
+        "function_number": 1,
+        "parameters": {
+            "top_left": [max(lat1, lat2), min(long1, long2)],
+            "bottom_right": [min(lat1, lat2), max(long1, long2)],
+        },
+    }
+
+
+def route_date_range(question: str) -> Optional[dict]:
+    text = question.casefold()
+    dates = find_dates(text)
+    if len(dates) != 2 or not has_any(text, COUNT_WORDS) or not uses_only(find_qualifiers(text), "date"):
+        return None
+
+    start_date, end_date = sorted(dates)
+    return {"function_number": 2, "parameters": {"start_date": start_date, "end_date": end_date}}
+
+
+def route_top_spending_items(question: str) -> Optional[dict]:
+    text = question.casefold()
+    if not (has_any(text, ("spending", "spent", "spend")) and "item" in text and has_any(text, TOP_WORDS)):
+        return None
+    qualifiers = find_qualifiers(text)
+    if not uses_only(qualifiers, "year", "number"):
+        return None
+
+    years = set(qualifiers.get("year", []))
+    limit = find_limit(qualifiers)
+    if len(years) != 1 or limit == 0:
+        return None
+
+    parameters = {"year": int(years.pop())}
+    if limit is not None:
+        parameters["limit"] = limit
+    return {"function_number": 3, "parameters": parameters}
+
+
+def route_acquisition_type(question: str) -> Optional[dict]:
+    text = question.casefold()
+    acquisition_type = find_acquisition_type(text)
+    if acquisition_type is None or not has_any(text, COUNT_WORDS) or not uses_only(find_qualifiers(text)):
+        return None
+
+    return {"function_number": 4, "parameters": {"acquisition_type": acquisition_type.value}}
+
+
+def route_quantity_by_item(question: str) -> Optional[dict]:
+    text = question.casefold()
+    if "quantit" not in text:
+        return None
+
+    # the item name has to be quoted, free text is left to the LLM
+    names = QUOTED_PATTERN.findall(question)
+    if len(names) != 1 or not uses_only(find_qualifiers(text), "name"):
+        return None
+
+    return {"function_number": 5, "parameters": {"item_name": names[0].strip()}}
+
+
+def route_items_by_date(question: str) -> Optional[dict]:
+    text = question.casefold()
+    dates = find_dates(text)
+    if len(dates) != 1 or "item" not in text or not has_any(text, ("purchased", "bought", "ordered", "on")):
+        return None
+    if has_any(text, COUNT_WORDS) or "quantit" in text or not uses_only(find_qualifiers(text), "date"):
+        return None
+
+    return {"function_number": 6, "parameters": {"date": dates[0]}}
+
+
+def route_family_codes(question: str) -> Optional[dict]:
+    text = question.casefold()
+    if "family" not in text or "segment" not in text:
+        return None
+
+    codes = INTEGER_PATTERN.findall(text)
+    if len(codes) != 1 or not uses_only(find_qualifiers(text), "number"):
+        return None
+
+    return {"function_number": 7, "parameters": {"segment_code": int(codes[0])}}
+
+
+def route_top_unspsc(question: str) -> Optional[dict]:
+    text = question.casefold()
+    if "unspsc" not in text or not has_any(text, TOP_WORDS + ("common", "frequent", "popular")):
+        return None
+    qualifiers = find_qualifiers(text)
+    if not uses_only(qualifiers, "number") or not has_limit(qualifiers, 10):
+        return None
+
+    return {"function_number": 8, "parameters": {}}
+
+
+def route_top_item_by_fiscal_year(question: str) -> Optional[dict]:
+    text = question.casefold()
+    fiscal_year = find_fiscal_year(text)
+    if fiscal_year is None or "item" not in text or not has_any(text, TOP_WORDS + ("price",)):
+        return None
+    qualifiers = find_qualifiers(text)
+    if not uses_only(qualifiers, "fiscal_year", "number") or len(qualifiers["fiscal_year"]) != 1 or not has_limit(qualifiers, 5):
+        return None
+
+    return {"function_number": 9, "parameters": {"fiscal_year": fiscal_year.value}}
+
+
+def route_top_departments(question: str) -> Optional[dict]:
+    text = question.casefold()
+    if "department" not in text or not has_any(text, TOP_WORDS):
+        return None
+    qualifiers = find_qualifiers(text)
+    if not uses_only(qualifiers, "number") or not has_limit(qualifiers, 10):
+        return None
+
+    return {"function_number": 10, "parameters": {}}
+
+
+def route_top_suppliers(question: str) -> Optional[dict]:
+    text = question.casefold()
+    if "supplier" not in text or not has_any(text, TOP_WORDS):
+        return None
+    qualifiers = find_qualifiers(text)
+    top_n = find_limit(qualifiers)
+    if not uses_only(qualifiers, "number") or top_n == 0:
+        return None
+
+    return {"function_number": 11, "parameters": {} if top_n is None else {"top_n": top_n}}
+
+
+def route_radius(question: str) -> Optional[dict]:
+    text = question.casefold()
+    distances = DISTANCE_PATTERN.findall(text)
+    coordinates = find_coordinates(text)
+    if len(distances) != 1 or len(coordinates) != 1 or not has_any(text, ("within", "around", "near", "radius", "of")):
+        return None
+    if not uses_only(find_qualifiers(text), "coordinates", "distance"):
+        return None
+
+    distance, unit = distances[0]
+    radius_km = float(distance) * (1.609344 if unit.startswith("mi") else 1.0)
+    return {"function_number": 12, "parameters": {"center": list(coordinates[0]), "radius_km": radius_km}}
+
+
+def route_polygon(question: str) -> Optional[dict]:
+    text = question.casefold()
+    coordinates = find_coordinates(text)
+    if "polygon" not in text or len(set(coordinates)) < 3 or not uses_only(find_qualifiers(text), "coordinates"):
+        return None
+
+    return {"function_number": 13, "parameters": {"points": [list(point) for point in coordinates]}}
+
+
+RULES: List[Callable[[str], Optional[dict]]] = [
+    route_geographic_area,
+    route_date_range,
+    route_top_spending_items,
+    route_acquisition_type,
+    route_quantity_by_item,
+    route_items_by_date,
+    route_family_codes,
+    route_top_unspsc,
+    route_top_item_by_fiscal_year,
+    route_top_departments,
+    route_top_suppliers,
+    route_radius,
+    route_polygon,
+]
+
+
+def fast_route(question: str) -> Optional[dict]:
+    """
+    Resolve a question to a function call with keyword and pattern rules.
+
+    Returns:
+        Optional[dict]: The route when exactly one rule matches, None when no rule or
+        several rules match (the question is ambiguous and goes to the LLM).
+    """
+    routes: Dict[int, dict] = {}
+    for rule in RULES:
+        route = rule(question)
+        if route is not None:
+            routes[route["function_number"]] = route
+
+    if len(routes) != 1:
+        return None
+
+    return routes.popitem()[1]
@@ -0,0 +1,92 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# the radius MongoDB uses to convert distances to radians ($centerSphere)
+EARTH_RADIUS_KM = 6378.1
+
+# the 2dsphere box polygon is widened by this many degrees, the exact box is applied on top of it
+BOX_MARGIN = 0.01
+# longitude span of the segments of the box edges, a geodesic this short stays within BOX_MARGIN of its latitude
+BOX_STEP = 1.0
+
+
+def box_polygon(top_left: Tuple[float, float], bottom_right: Tuple[float, float]) -> Optional[dict]:
+    """
+    Build a GeoJSON polygon that covers a latitude/longitude box.
+
+    The edges of a GeoJSON polygon are geodesics, not parallels, so the box is widened by
+    BOX_MARGIN and its horizontal edges are split into BOX_STEP segments: the polygon always
+    contains the box and is only used to narrow the candidates through the 2dsphere index.
+
+    Returns:
+        Optional[dict]: The polygon, or None when the box cannot be covered by one (inverted boxes,
+        boxes that reach a pole or span half the globe).
+    """
+    top, left = top_left
+    bottom, right = bottom_right
+    top, bottom = top + BOX_MARGIN, bottom - BOX_MARGIN
+    left, right = left - BOX_MARGIN, right + BOX_MARGIN
+
+    if top <= bottom or right <= left or top >= 90 or bottom <= -90 or right - left >= 180:
+        return None
+
+    steps = int(np.ceil((right - left) / BOX_STEP))
+    longitudes = np.linspace(left, right, steps + 1).tolist()
+    ring = (
+        [[long, top] for long in longitudes]
+        + [[long, bottom] for long in reversed(longitudes)]
+        + [[left, top]]
+    )
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def closed_ring(points: Sequence[Tuple[float, float]]) -> List[List[float]]:
+    # (latitude, longitude) points to a closed GeoJSON ring of [longitude, latitude]
+    ring = [[float(long), float(lat)] for lat, long in points]
+    if ring and ring[0] != ring[-1]:
+        ring.append(ring[0])
+    return ring
+
+
+def unit_vectors(lat, long) -> np.ndarray:
+    lat, long = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(long, dtype=float))
+    return np.stack([np.cos(lat) * np.cos(long), np.cos(lat) * np.sin(long), np.sin(lat)], axis=-1)
+
+
+def distance_km(lat, long, center: Tuple[float, float]) -> np.ndarray:
+    # great-circle distances from the center, like the spherical distances of MongoDB
+    positions, origin = unit_vectors(lat, long), unit_vectors(*center)
+    angle = np.arctan2(np.linalg.norm(np.cross(positions, origin), axis=-1), positions @ origin)
+    return angle * EARTH_RADIUS_KM
+
+
+def inside_polygon(lat, long, points: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """
+    Test which points lie inside a polygon with geodesic edges, like $geoWithin with a GeoJSON polygon.
+
+    The signed angles the edges subtend at a point add up to a full turn inside the polygon
+    and to zero outside (for polygons smaller than a hemisphere).
+
+    Args:
+        lat: The latitudes of the points.
+        long: The longitudes of the points.
+        points (Sequence[Tuple[float, float]]): The (latitude, longitude) vertices of the polygon.
+
+    Returns:
+        np.ndarray: A boolean mask of the points inside the polygon.
+    """
+    ring = closed_ring(points)
+    vertices = unit_vectors([lat for _, lat in ring], [long for long, _ in ring])
+    positions = unit_vectors(lat, long).reshape(-1, 3)
+
+    winding = np.zeros(len(positions))
+    for start, end in zip(vertices[:-1], vertices[1:]):
+        # the directions from every point towards both ends of the edge, in the tangent plane
+        towards_start = start - (positions @ start)[:, None] * positions
+        towards_end = end - (positions @ end)[:, None] * positions
+        winding += np.arctan2(
+            np.einsum("ij,ij->i", positions, np.cross(towards_start, towards_end)),
+            np.einsum("ij,ij->i", towards_start, towards_end),
+        )
+    return np.abs(winding) > np.pi
@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import copy
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo import ASCENDING, monitoring
+
+from core.database import init_database
+from schemas.documents import Purchase
+from services.mongo_repository import MongoPurchaseRepository
+from services.repository import use_repository
+from services.search import get_item_search
+
+# the commands that read documents, the others (index builds, checkpoints) are not audited
+READ_COMMANDS = ("aggregate", "find", "count", "distinct")
+
+# session and cluster fields the driver adds, explain rejects some of them
+DRIVER_FIELDS = ("lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "apiVersion", "apiStrict", "apiDeprecationErrors")
+
+# the query operators of range predicates, the other fields of a $match are equalities
+RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$exists", "$regex")
+GEO_OPERATORS = ("$geoWithin", "$geoIntersects", "$near", "$nearSphere")
+
+
+class QueryRecorder(monitoring.CommandListener):
+    """
+    Record the read commands sent to some collections, so they can be explained afterwards.
+    """
+
+    def __init__(self, collections: Set[str]):
+        self.collections = collections
+        self.commands: List[dict] = []
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name in READ_COMMANDS and event.command.get(event.command_name) in self.collections:
+            command = {key: value for key, value in event.command.items() if key not in DRIVER_FIELDS}
+            self.commands.append(copy.deepcopy(command))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        pass
+
+
+@dataclass
+class PlanSummary:
+    stages: Set[str] = field(default_factory=set)
+    indexes: Set[str] = field(default_factory=set)
+    docs_examined: int = 0
+    keys_examined: int = 0
+    returned: int = 0
+    milliseconds: int = 0
+
+    @property
+    def collection_scan(self) -> bool:
+        return "COLLSCAN" in self.stages
+
+    @property
+    def covered(self) -> bool:
+        # the index answered the query without reading documents
+        return bool(self.indexes) and not self.collection_scan and "FETCH" not in self.stages
+
+    def describe(self) -> str:
+        if self.collection_scan:
+            return "COLLSCAN"
+        plan = "IXSCAN " + ", ".join(sorted(self.indexes))
+        return plan + (" (covered)" if self.covered else "")
+
+
+def collect_plan(node: Any, summary: PlanSummary, in_plan: bool = False):
+    # walk the winning plans (the rejected ones and the SBE plans are skipped)
+    if isinstance(node, list):
+        for item in node:
+            collect_plan(item, summary, in_plan)
+        return
+    if not isinstance(node, dict):
+        return
+
+    if in_plan:
+        if "stage" in node:
+            summary.stages.add(node["stage"])
+        if "indexName" in node:
+            summary.indexes.add(node["indexName"])
+
+    for key, value in node.items():
+        if key in ("rejectedPlans", "allPlansExecution", "slotBasedPlan"):
+            continue
+        if key == "executionStats" and isinstance(value, dict):
+            summary.docs_examined += value.get("totalDocsExamined", 0)
+            summary.keys_examined += value.get("totalKeysExamined", 0)
+            summary.returned += value.get("nReturned", 0)
+            summary.milliseconds += value.get("executionTimeMillis", 0)
+            continue
+        collect_plan(value, summary, in_plan or key == "winningPlan")
+
+
+def field_references(expression: Any) -> List[str]:
+    # the "$field" paths used by a $group key or accumulator
+    if isinstance(expression, str) and expression.startswith("$") and not expression.startswith("$$"):
+        return [expression[1:]]
+    if isinstance(expression, dict):
+        return [path for value in expression.values() for path in field_references(value)]
+    if isinstance(expression, list):
+        return [path for value in expression for path in field_references(value)]
+    return []
+
+
+def suggest_index(command: dict) -> Optional[List[Tuple[str, int]]]:
+    """
+    Suggest a compound index for a recorded command.
+
+    The $match fields come first (equalities, then sorts, then ranges), followed by the fields
+    the $group reads, so the index can cover the whole pipeline.
+
+    Returns:
+        Optional[List[Tuple[str, int]]]: The index keys, or None for geospatial queries (they
+        need their 2dsphere index) and queries that read no field.
+    """
+    if "pipeline" in command:
+        stages = command["pipeline"]
+    else:
+        stages = [{"$match": command.get("filter") or command.get("query") or {}}]
+        if command.get("sort"):
+            stages.append({"$sort": command["sort"]})
+
+    equalities: List[str] = []
+    ranges: List[str] = []
+    sorts: List[str] = []
+    grouped: List[str] = []
+    for stage in stages:
+        if "$match" in stage and not grouped:
+            for name, condition in stage["$match"].items():
+                if name.startswith("$"):
+                    continue
+                if isinstance(condition, dict) and any(operator in condition for operator in GEO_OPERATORS):
+                    return None
+                if isinstance(condition, dict) and any(operator in condition for operator in RANGE_OPERATORS):
+                    ranges.append(name)
+                else:
+                    equalities.append(name)
+        elif "$sort" in stage and not grouped:
+            sorts.extend(stage["$sort"])
+        elif "$group" in stage:
+            grouped.extend(path for value in stage["$group"].values() for path in field_references(value))
+            break
+
+    keys: List[str] = []
+    for name in equalities + sorts + ranges + grouped:
+        if name != "_id" and name not in keys:
+            keys.append(name)
+    return [(name, ASCENDING) for name in keys] or None
+
+
+def representative_parameters(document: dict) -> Dict[int, dict]:
+    """
+    Build parameters for every function from a sample purchase, so every query matches data.
+    """
+    purchase_date = document.get("purchase_date") or datetime(2013, 1, 1)
+    lat = document.get("location_lat") or 37.0
+    long = document.get("location_long") or -120.0
+
+    return {
+        1: {"top_left": [lat + 0.5, long - 0.5], "bottom_right": [lat - 0.5, long + 0.5]},
+        2: {"start_date": purchase_date.strftime("%Y-%m-%d"), "end_date": (purchase_date + timedelta(days=30)).strftime("%Y-%m-%d")},
+        3: {"year": purchase_date.year},
+        4: {"acquisition_type": document.get("acquisition_type", "IT Goods")},
+        5: {"item_name": document.get("item_name") or ""},
+        6: {"date": purchase_date.strftime("%Y-%m-%d")},
+        7: {"segment_code": document.get("segment") or 0},
+        8: {},
+        9: {"fiscal_year": document.get("fiscal_year", "2013-2014")},
+        10: {},
+        11: {},
+        12: {"center": [lat, long], "radius_km": 50.0},
+        13: {"points": [[lat + 0.5, long - 0.5], [lat + 0.5, long + 0.5], [lat - 0.5, long]]},
+    }
+
+
+@dataclass
+class AuditResult:
+    function_number: int
+    function_name: str
+    seconds: float
+    plans: List[Tuple[dict, PlanSummary]]
+
+    @property
+    def collection_scan(self) -> bool:
+        return any(summary.collection_scan for _, summary in self.plans)
+
+
+async def audit(recorder: QueryRecorder, repository: MongoPurchaseRepository) -> List[AuditResult]:
+    """
+    Run every function of function_map once on a repository and explain the commands it sent with executionStats.
+
+    Args:
+        recorder (QueryRecorder): The command listener of the MongoDB client.
+        repository (MongoPurchaseRepository): The audited repository, it reads the rollups or the live pipelines.
+    """
+    from services.queries import function_map
+
+    collection = Purchase.get_motor_collection()
+    document = await collection.find_one(
+        {"purchase_date": {"$ne": None}, "item_name": {"$ne": None}, "segment": {"$ne": None}, "location": {"$ne": None}}
+    ) or {}
+    parameters = representative_parameters(document)
+
+    results = []
+    # the query functions read the audited repository, the settings are left as they are
+    with use_repository(repository):
+        # the item search index is built at startup, its full read of the item terms is not a query of a function
+        await get_item_search()
+
+        for number, function in function_map.items():
+            recorder.commands.clear()
+            started_at = perf_counter()
+            await function(**parameters.get(number, {}))
+            seconds = perf_counter() - started_at
+
+            plans = []
+            for command in list(recorder.commands):
+                explain = await collection.database.command({"explain": command, "verbosity": "executionStats"})
+                summary = PlanSummary()
+                collect_plan(explain, summary)
+                plans.append((command, summary))
+            results.append(AuditResult(number, function.__name__, seconds, plans))
+
+    return results
+
+
+def collection_scans(results: List[AuditResult]) -> List[str]:
+    # the functions with a query that scans the whole collection, --check fails on them
+    return [result.function_name for result in results if result.collection_scan]
+
+
+def print_report(results: List[AuditResult]) -> List[List[Tuple[str, int]]]:
+    """
+    Print the plan of every function and the suggested indexes.
+
+    Returns:
+        List[List[Tuple[str, int]]]: The suggested indexes, for collection scans and queries that
+        read documents an index could cover.
+    """
+    suggestions: List[List[Tuple[str, int]]] = []
+    print(f"{'#':>2} {'function':<38} {'ms':>8} {'examined':>9} {'keys':>9} {'returned':>9}  plan")
+
+    for result in results:
+        if not result.plans:
+            print(f"{result.function_number:>2} {result.function_name:<38} {result.seconds * 1000:>8.1f}  no query sent (answered by a cache)")
+            continue
+
+        for command, summary in result.plans:
+            print(
+                f"{result.function_number:>2} {result.function_name:<38} {result.seconds * 1000:>8.1f} "
+                f"{summary.docs_examined:>9,} {summary.keys_examined:>9,} {summary.returned:>9,}  {summary.describe()}"
+            )
+            if summary.covered:
+                continue
+
+            keys = suggest_index(command)
+            if keys is None or keys in suggestions:
+                continue
+            if summary.collection_scan or len(keys) > 1:
+                suggestions.append(keys)
+                reason = "avoids the collection scan" if summary.collection_scan else "covers the query"
+                print(f"   suggested index {', '.join(name for name, _ in keys)} ({reason})")
+
+    return suggestions
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Explain the query of every function in function_map and suggest indexes.")
+    parser.add_argument("--create", action="store_true", help="create the suggested indexes")
+    parser.add_argument("--check", action="store_true", help="exit with an error when a query scans the whole collection")
+    parser.add_argument("--rollups", action="store_true", help="audit the rollup reads instead of the live pipelines")
+    args = parser.parse_args(argv)
+
+    collections = {Purchase.Settings.name}
+    if args.rollups:
+        from services.rollups import ROLLUPS
+        collections |= set(ROLLUPS)
+
+    recorder = QueryRecorder(collections)
+    client = await init_database(event_listeners=[recorder])
+    try:
+        results = await audit(recorder, MongoPurchaseRepository(rollups=args.rollups))
+        suggestions = print_report(results)
+
+        if args.create:
+            for keys in suggestions:
+                name = await Purchase.get_motor_collection().create_index(keys)
+                print(f"Created index {name}.")
+    finally:
+        client.close()
+
+    scans = collection_scans(results)
+    if scans:
+        print(f"Collection scans: {', '.join(scans)}")
+    return 1 if args.check and scans else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
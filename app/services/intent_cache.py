@@ -0,0 +1,221 @@
+import inspect
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.config import settings
+from core.ollama import get_ollama_embeddings
+from services.queries import function_map
+
+# characters that do not change the meaning of a question
+PUNCTUATION_PATTERN = re.compile(r"[?!\"'`]+|\.+$")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+# words of a parameter value or question, a hyphen is part of the word ("non-it" is not "it")
+TOKEN_PATTERN = re.compile(r"[\w-]+")
+
+
+def normalize_question(question: str) -> str:
+    question = PUNCTUATION_PATTERN.sub(" ", question.casefold())
+    return WHITESPACE_PATTERN.sub(" ", question).strip()
+
+
+def route_confidence(route: Any) -> float:
+    """
+    Score how safe a stage-1 routing decision is to reuse.
+
+    Returns:
+        float: 1.0 when the function exists and the parameters bind to its signature,
+        0.3 when the parameters do not bind, 0.0 when no function matches.
+    """
+    if not isinstance(route, dict):
+        return 0.0
+
+    function_to_invoke = function_map.get(route.get("function_number"))
+    if function_to_invoke is None:
+        return 0.0
+
+    try:
+        inspect.signature(function_to_invoke).bind(**(route.get("parameters") or {}))
+    except TypeError:
+        return 0.3
+
+    return 1.0
+
+
+def flatten_values(value: Any) -> List[Any]:
+    if isinstance(value, dict):
+        return [item for nested in value.values() for item in flatten_values(nested)]
+    if isinstance(value, (list, tuple)):
+        return [item for nested in value for item in flatten_values(nested)]
+    return [value]
+
+
+def contains_tokens(tokens: List[str], value_tokens: List[str]) -> bool:
+    # the value words appear in a row in the question words
+    if not value_tokens:
+        return False
+    size = len(value_tokens)
+    return any(tokens[index:index + size] == value_tokens for index in range(len(tokens) - size + 1))
+
+
+def parameters_grounded(route: dict, question: str) -> bool:
+    """
+    Check that every parameter value of a route literally appears in a (normalized) question.
+
+    Text values are matched as whole words, so "IT Goods" is not found in "non-IT goods".
+
+    A similar question with other dates, years or names must not reuse the parameters of
+    the cached one, so similarity hits are only accepted when this holds.
+    """
+    numbers = {float(number) for number in NUMBER_PATTERN.findall(question)}
+    tokens = TOKEN_PATTERN.findall(question)
+
+    for value in flatten_values(route.get("parameters") or {}):
+        if isinstance(value, bool) or value is None:
+            return False
+        if isinstance(value, (int, float)):
+            if float(value) not in numbers:
+                return False
+        elif not contains_tokens(tokens, TOKEN_PATTERN.findall(normalize_question(str(value)))):
+            return False
+
+    return True
+
+
+@dataclass
+class IntentEntry:
+    route: dict
+    confidence: float
+    embedding: Optional[np.ndarray] = None
+
+
+class IntentCache:
+    """
+    A bounded LRU cache of stage-1 routing decisions.
+
+    Lookups try the normalized question first, then (when an embedding model is configured)
+    the most similar cached question above the similarity threshold.
+    """
+
+    def __init__(self, maxsize: int, min_confidence: float, similarity: float, embedding_model: str = ""):
+        self.maxsize = maxsize
+        self.min_confidence = min_confidence
+        self.similarity = similarity
+        self.embeddings = get_ollama_embeddings(embedding_model) if embedding_model else None
+
+        self._entries: "OrderedDict[str, IntentEntry]" = OrderedDict()
+        # embeddings computed by missed lookups, reused when the LLM route is stored
+        self._pending: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # the entry key that served each recent similarity hit, discarded when its route fails
+        self._matched: "OrderedDict[str, str]" = OrderedDict()
+        # the embedding matrix of the entries, rebuilt lazily after changes
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    async def _embed(self, key: str) -> np.ndarray:
+        vector = np.asarray(await self.embeddings.aembed_query(key), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _most_similar(self, vector: np.ndarray) -> Optional[str]:
+        if self._matrix is None:
+            self._matrix_keys = [key for key, entry in self._entries.items() if entry.embedding is not None]
+            if not self._matrix_keys:
+                return None
+            self._matrix = np.stack([self._entries[key].embedding for key in self._matrix_keys])
+
+        # the vectors are normalized, so the dot product is the cosine similarity
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+
+        return self._matrix_keys[best]
+
+    async def lookup(self, question: str) -> Optional[dict]:
+        """
+        Get the cached routing decision for a question.
+
+        Returns:
+            Optional[dict]: The stored JSON route, or None when the LLM has to be called.
+        """
+        key = normalize_question(question)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.confidence >= self.min_confidence:
+            self._entries.move_to_end(key)
+            self._matched.pop(key, None)
+            self.exact_hits += 1
+            return entry.route
+
+        if self.embeddings is not None and self._entries:
+            vector = await self._embed(key)
+            self._pending[key] = vector
+            while len(self._pending) > self.maxsize:
+                self._pending.popitem(last=False)
+
+            matched = self._most_similar(vector)
+            entry = self._entries.get(matched) if matched is not None else None
+            if entry is not None and entry.confidence >= self.min_confidence and parameters_grounded(entry.route, key):
+                self._entries.move_to_end(matched)
+                self._matched[key] = matched
+                while len(self._matched) > self.maxsize:
+                    self._matched.popitem(last=False)
+                self.similar_hits += 1
+                return entry.route
+
+        self.misses += 1
+        return None
+
+    async def store(self, question: str, route: Any):
+        # only routes that can be reused safely are kept
+        confidence = route_confidence(route)
+        if self.maxsize <= 0 or confidence < self.min_confidence:
+            return
+
+        key = normalize_question(question)
+        embedding = None
+        if self.embeddings is not None:
+            embedding = self._pending.pop(key, None)
+            if embedding is None:
+                embedding = await self._embed(key)
+
+        self._entries[key] = IntentEntry(route=route, confidence=confidence, embedding=embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        self._matrix = None
+
+    def discard(self, question: str):
+        # called when a cached route failed to run, so it is not served again: the entry of the
+        # question, or the entry of the similar question that answered it
+        key = normalize_question(question)
+        matched = self._matched.pop(key, key)
+        if self._entries.pop(matched, None) is not None:
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "embeddings": self.embeddings is not None,
+        }
+
+
+intent_cache = IntentCache(
+    maxsize=settings.INTENT_CACHE_SIZE,
+    min_confidence=settings.INTENT_CACHE_MIN_CONFIDENCE,
+    similarity=settings.INTENT_CACHE_SIMILARITY,
+    embedding_model=settings.INTENT_CACHE_EMBEDDING_MODEL,
+)
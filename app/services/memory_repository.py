@@ -0,0 +1,176 @@
+import asyncio
+import json
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+
+from seeds.purchases import get_data_path
+from seeds.workers import PurchaseRecord
+from services.dates import year_range
+from services.geo import distance_km, inside_polygon
+from services.repository import After, PurchaseRepository, keyset_page
+
+
+def naive_utc(document: dict) -> dict:
+    # MongoDB stores the dates in UTC and returns them naive, the queries compare naive datetimes
+    for key, value in document.items():
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            document[key] = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return document
+
+
+def load_purchases(data_path: Path) -> List[dict]:
+    """
+    Read the seed file into the documents the seeder would insert (stored field names, enum values).
+    """
+    purchases = []
+    with open(data_path, "rb") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                purchases.append(naive_utc(PurchaseRecord.model_validate(json.loads(line)).model_dump(by_alias=True)))
+            except (ValueError, ValidationError):
+                continue
+    return purchases
+
+
+def null_first(value: Any) -> Tuple:
+    # MongoDB sorts null before any value
+    return (0,) if value is None else (1, value)
+
+
+def top_counts(counts: Dict[Hashable, float], limit: int) -> List[Tuple[Hashable, float]]:
+    """
+    Keep the largest groups, ties ordered by key like the other repositories.
+    """
+    def sort_key(item):
+        key, value = item
+        keys = key if isinstance(key, tuple) else (key,)
+        return (-value, *(null_first(part) for part in keys))
+
+    return sorted(counts.items(), key=sort_key)[:limit]
+
+
+def distinct(values: Iterable[Any]) -> list:
+    return sorted(set(values), key=null_first)
+
+
+class MemoryPurchaseRepository(PurchaseRepository):
+    """
+    The purchases of the seed file, held as a list of dicts and scanned in pure Python.
+
+    It needs no database, so tests and benchmarks can run the query functions against it, and
+    it is the reference the other repositories are compared with.
+    """
+
+    name = "memory"
+
+    def __init__(self, purchases: Optional[List[dict]] = None, data_path: Optional[Path] = None):
+        self.data_path = data_path or get_data_path()
+        self._purchases = purchases
+        # purchases given by the caller do not change with the seed file
+        self._fixed = purchases is not None
+        self._lock = asyncio.Lock()
+
+    async def get_purchases(self) -> List[dict]:
+        if self._purchases is None:
+            async with self._lock:
+                if self._purchases is None:
+                    self._purchases = await asyncio.to_thread(load_purchases, self.data_path)
+                    print(f"In-memory repository loaded: {len(self._purchases)} purchases.")
+        return self._purchases
+
+    async def _scan(self, match: Callable[[dict], bool]) -> List[dict]:
+        return [purchase for purchase in await self.get_purchases() if match(purchase)]
+
+    async def count_in_area(self, top_left: Tuple[float, float], bottom_right: Tuple[float, float]) -> int:
+        left_lat, left_long = top_left
+        right_lat, right_long = bottom_right
+
+        def match(purchase: dict) -> bool:
+            lat, long = purchase["location_lat"], purchase["location_long"]
+            return lat is not None and long is not None and right_lat <= lat <= left_lat and left_long <= long <= right_long
+
+        return len(await self._scan(match))
+
+    async def _coordinates(self) -> Tuple[np.ndarray, np.ndarray]:
+        located = await self._scan(lambda purchase: purchase["location"] is not None)
+        return (
+            np.array([purchase["location_lat"] for purchase in located], dtype=float),
+            np.array([purchase["location_long"] for purchase in located], dtype=float),
+        )
+
+    async def count_within_radius(self, center: Tuple[float, float], radius_km: float) -> int:
+        lat, long = await self._coordinates()
+        return int(np.count_nonzero(distance_km(lat, long, center) <= radius_km))
+
+    async def count_in_polygon(self, points: List[Tuple[float, float]]) -> int:
+        lat, long = await self._coordinates()
+        return int(np.count_nonzero(inside_polygon(lat, long, points)))
+
+    async def count_in_date_range(self, start: datetime, end: datetime) -> int:
+        return len(await self._scan(lambda purchase: purchase["purchase_date"] is not None and start <= purchase["purchase_date"] < end))
+
+    async def top_spending_items(self, year: int, limit: int) -> List[Dict]:
+        start, end = year_range(year)
+        totals: Dict[Optional[str], float] = defaultdict(float)
+        for purchase in await self._scan(lambda purchase: purchase["purchase_date"] is not None and start <= purchase["purchase_date"] < end):
+            totals[purchase["item_name"]] += purchase["total_price"] or 0.0
+        return [{"item_name": item_name, "total_spending": total} for item_name, total in top_counts(totals, limit)]
+
+    async def count_by_acquisition_type(self, acquisition_type: str) -> int:
+        return len(await self._scan(lambda purchase: purchase["acquisition_type"] == acquisition_type))
+
+    async def total_quantity_by_items(self, item_names: List[str]) -> float:
+        names = set(item_names)
+        purchases = await self._scan(lambda purchase: purchase["item_name"] in names)
+        return sum(purchase["quantity"] or 0.0 for purchase in purchases) if purchases else 0.0
+
+    async def item_terms(self) -> Dict[str, List[str]]:
+        terms: Dict[str, set] = defaultdict(set)
+        for purchase in await self._scan(lambda purchase: purchase["item_name"] is not None):
+            terms[purchase["item_name"]].update(value for value in (purchase["item_description"], purchase["commodity_title"]) if value)
+        return {name: sorted(values) for name, values in terms.items()}
+
+    async def items_purchased_between(
+        self, start: datetime, end: datetime, after: Optional[After] = None, limit: Optional[int] = None
+    ) -> List[str]:
+        purchases = await self._scan(lambda purchase: purchase["purchase_date"] is not None and start <= purchase["purchase_date"] < end)
+        return keyset_page(distinct(purchase["item_name"] for purchase in purchases), after, limit)
+
+    async def family_codes_by_segment(self, segment_code: int, after: Optional[After] = None, limit: Optional[int] = None) -> List[int]:
+        purchases = await self._scan(lambda purchase: purchase["segment"] == segment_code)
+        return keyset_page(distinct(purchase["family"] for purchase in purchases), after, limit)
+
+    async def top_unspsc(self, limit: int) -> List[Dict]:
+        counts = Counter(purchase["normalized_UNSPSC"] for purchase in await self.get_purchases())
+        return [{"UNSPSC": code, "Count": count} for code, count in top_counts(counts, limit)]
+
+    async def top_items_by_fiscal_year(self, fiscal_year: str, limit: int) -> List[Dict]:
+        totals: Dict[Optional[str], float] = defaultdict(float)
+        for purchase in await self._scan(lambda purchase: purchase["fiscal_year"] == fiscal_year):
+            totals[purchase["item_name"]] += purchase["total_price"] or 0.0
+        return [{"item_name": item_name, "total_price": total} for item_name, total in top_counts(totals, limit)]
+
+    async def top_departments(self, limit: int) -> List[Dict]:
+        counts = Counter(purchase["department_name"] for purchase in await self.get_purchases())
+        return [{"department_name": name, "order_count": count} for name, count in top_counts(counts, limit)]
+
+    async def top_suppliers(self, limit: int) -> List[Dict]:
+        counts = Counter((purchase["supplier_name"], purchase["supplier_zip_code"]) for purchase in await self.get_purchases())
+        return [
+            {"supplier_name": name, "supplier_zip_code": zip_code, "purchase_count": count}
+            for (name, zip_code), count in top_counts(counts, limit)
+        ]
+
+    async def data_version(self) -> Optional[str]:
+        if self._fixed:
+            return self.name
+        stat = os.stat(self.data_path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
@@ -0,0 +1,379 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, DESCENDING
+
+from core.config import settings
+from schemas.documents import (DEPARTMENT_ID_INDEX, DEPARTMENT_INDEX, FISCAL_YEAR_ITEMS_INDEX,
+                               ITEM_QUANTITY_INDEX, PURCHASE_DATE_ITEMS_INDEX, SEGMENT_FAMILY_INDEX,
+                               SUPPLIER_ID_INDEX, SUPPLIER_INDEX, UNSPSC_INDEX, Purchase)
+from seeds.compact import DEPARTMENTS, SUPPLIERS, is_compact, join_labels
+from seeds.migrations import is_applied
+from services.data_version import current_data_version
+from services.dates import is_midnight, month_start, next_month, year_range
+from services.geo import EARTH_RADIUS_KM, box_polygon, closed_ring
+from services.repository import After, PurchaseRepository
+from services.rollups import ROLLUPS, get_rollup, rollup_pipeline
+
+
+def after_condition(after: After) -> Dict[str, Any]:
+    # null sorts first, so the values after it are the non-null ones
+    return {"$ne": None} if after.value is None else {"$gt": after.value}
+
+
+def limit_stage(pipeline: List[Dict], limit: Optional[int]) -> List[Dict]:
+    return pipeline if limit is None else pipeline + [{"$limit": limit}]
+
+
+async def sum_counts(rollup: AsyncIOMotorCollection, ranges: List[Tuple[datetime, datetime]]) -> int:
+    ranges = [(start, end) for start, end in ranges if start < end]
+    if not ranges:
+        return 0
+
+    pipeline = [
+        {"$match": {"$or": [{"_id": {"$gte": start, "$lt": end}} for start, end in ranges]}},
+        {"$group": {"_id": None, "count": {"$sum": "$count"}}},
+    ]
+    result = await rollup.aggregate(pipeline).to_list(length=1)
+    return result[0]["count"] if result else 0
+
+
+async def count_from_rollups(days: AsyncIOMotorCollection, months: AsyncIOMotorCollection, start: datetime, end: datetime) -> int:
+    """
+    Count the purchases of [start, end) from the day and month buckets.
+
+    The whole months in the middle are read from the month buckets and the days before and
+    after them from the day buckets, so a range of years sums a few dozen buckets.
+    """
+    first_month = start if start.day == 1 else next_month(start)
+    last_month = month_start(end)
+    if first_month >= last_month:
+        return await sum_counts(days, [(start, end)])
+
+    counts = await asyncio.gather(
+        sum_counts(months, [(first_month, last_month)]),
+        sum_counts(days, [(start, first_month), (last_month, end)]),
+    )
+    return sum(counts)
+
+
+class MongoPurchaseRepository(PurchaseRepository):
+    """
+    The purchases collection, with the top-N queries served from the rollups when they are fresh.
+
+    The live pipelines project the fields they read right after their $match and hint an index
+    that holds all of them, so they are answered from the index keys (covered) instead of
+    fetching the documents. The groups can spill to disk on large extracts (allowDiskUse).
+    """
+
+    name = "mongo"
+
+    def __init__(self, rollups: Optional[bool] = None):
+        # read the fresh rollups (default is the ROLLUPS_ENABLED setting), or always the live pipelines
+        self.rollups = settings.ROLLUPS_ENABLED if rollups is None else rollups
+
+    async def get_rollup(self, name: str) -> Optional[AsyncIOMotorCollection]:
+        return await get_rollup(name) if self.rollups else None
+
+    async def count_in_area(self, top_left: Tuple[float, float], bottom_right: Tuple[float, float]) -> int:
+        # Define the rectangular box for querying
+        left_lat, left_long = top_left
+        right_lat, right_long = bottom_right
+
+        query = {
+            "location_lat": {"$lte": left_lat, "$gte": right_lat},
+            "location_long": {"$gte": left_long, "$lte": right_long},
+        }
+
+        # the 2dsphere index bounds both coordinates at once, the range predicates keep the exact box
+        polygon = box_polygon(top_left, bottom_right)
+        if polygon is not None and await is_applied("location"):
+            query["location"] = {"$geoWithin": {"$geometry": polygon}}
+
+        return await Purchase.find(query).count()
+
+    async def count_within_radius(self, center: Tuple[float, float], radius_km: float) -> int:
+        lat, long = center
+        return await Purchase.find(
+            {"location": {"$geoWithin": {"$centerSphere": [[long, lat], radius_km / EARTH_RADIUS_KM]}}}
+        ).count()
+
+    async def count_in_polygon(self, points: List[Tuple[float, float]]) -> int:
+        return await Purchase.find(
+            {"location": {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [closed_ring(points)]}}}}
+        ).count()
+
+    async def count_in_date_range(self, start: datetime, end: datetime) -> int:
+        if is_midnight(start) and is_midnight(end):
+            days = await self.get_rollup("rollup_purchase_days")
+            months = await self.get_rollup("rollup_purchase_months")
+            if days is not None and months is not None:
+                return await count_from_rollups(days, months, start, end)
+
+        return await Purchase.find({"purchase_date": {"$gte": start, "$lt": end}}).count()
+
+    async def top_spending_items(self, year: int, limit: int) -> List[Dict]:
+        rollup = await self.get_rollup("rollup_items")
+        if rollup is not None:
+            # the per item and year totals are pre-computed
+            pipeline = [
+                {"$match": {"year": year}},
+                {"$group": {"_id": "$item_name", "total_spending": {"$sum": "$total_price"}}},
+                {"$sort": {"total_spending": DESCENDING, "_id": ASCENDING}},
+                {"$limit": limit},
+                {"$project": {"_id": 0, "item_name": "$_id", "total_spending": 1}}
+            ]
+            return await rollup.aggregate(pipeline).to_list(length=limit)
+
+        start, end = year_range(year)
+        pipeline = [
+            {
+                "$match": {
+                    "purchase_date": {
+                        "$gte": start,
+                        "$lt": end
+                    }
+                }
+            },
+            {"$project": {"_id": 0, "item_name": 1, "total_price": 1}},
+            {"$group": {"_id": "$item_name", "total_spending": {"$sum": "$total_price"}}},
+            {"$sort": {"total_spending": DESCENDING, "_id": ASCENDING}},
+            {"$limit": limit},
+            {"$project": {"_id": 0, "item_name": "$_id", "total_spending": 1}}
+        ]
+        return await Purchase.aggregate(pipeline, hint=PURCHASE_DATE_ITEMS_INDEX, allowDiskUse=True).to_list(length=limit)
+
+    async def count_by_acquisition_type(self, acquisition_type: str) -> int:
+        return await Purchase.find(Purchase.acquisition_type == acquisition_type).count()
+
+    async def total_quantity_by_items(self, item_names: List[str]) -> float:
+        pipeline = [
+            {"$match": {"item_name": {"$in": item_names}}},  # Filter by the item names
+            {"$project": {"_id": 0, "item_name": 1, "quantity": 1}},  # Read only the indexed fields
+            {"$group": {
+                "_id": None,  # One total over the item names
+                "total_quantities": {"$sum": "$quantity"}  # Sum the quantities
+            }},
+            {"$project": {
+                "_id": 0,  # Exclude _id field
+                "total_quantities": 1  # Include total_quantities
+            }}
+        ]
+        result = await Purchase.aggregate(pipeline, hint=ITEM_QUANTITY_INDEX).to_list(length=1)
+
+        # If no records found, return 0
+        if result:
+            return result[0]['total_quantities']
+        return 0.0
+
+    async def item_terms(self) -> Dict[str, List[str]]:
+        rollup = await self.get_rollup("rollup_item_terms")
+        if rollup is not None:
+            cursor = rollup.find({}, {"descriptions": 1, "commodity_titles": 1})
+        else:
+            pipeline = rollup_pipeline(ROLLUPS["rollup_item_terms"], await is_compact())
+            cursor = Purchase.get_motor_collection().aggregate(pipeline, allowDiskUse=True)
+
+        # a description can also be a commodity title
+        return {
+            document["_id"]: sorted({value for value in document["descriptions"] + document["commodity_titles"] if value})
+            async for document in cursor
+        }
+
+    async def items_purchased_between(
+        self, start: datetime, end: datetime, after: Optional[After] = None, limit: Optional[int] = None
+    ) -> List[str]:
+        query = {"purchase_date": {"$gte": start, "$lt": end}}  # Match the specific date range
+        if after is not None:
+            # the page starts after the cursor
+            query["item_name"] = after_condition(after)
+
+        pipeline = [
+            {"$match": query},
+            {"$project": {
+                "_id": 0,  # Exclude _id field
+                "item_name": 1  # Include item_name field
+            }},
+            {"$group": {
+                "_id": "$item_name"  # Group by item_name to avoid duplicates
+            }},
+            {"$sort": {"_id": ASCENDING}},
+        ]
+        result = await Purchase.aggregate(limit_stage(pipeline, limit), hint=PURCHASE_DATE_ITEMS_INDEX, allowDiskUse=True).to_list(length=limit)
+
+        # Extract item names from the result
+        return [doc['_id'] for doc in result]
+
+    async def family_codes_by_segment(self, segment_code: int, after: Optional[After] = None, limit: Optional[int] = None) -> List[int]:
+        query: Dict[str, Any] = {"segment": segment_code}  # Filter by segment_code
+        if after is not None:
+            # the page starts after the cursor, a range on the second key of the index
+            query["family"] = after_condition(after)
+
+        pipeline = [
+            {"$match": query},
+            {"$project": {"_id": 0, "family": 1}},  # Read only the indexed field
+            {"$group": {
+                "_id": "$family"  # Group by family_code
+            }},
+            {"$sort": {"_id": ASCENDING}},
+        ]
+        result = await Purchase.aggregate(limit_stage(pipeline, limit), hint=SEGMENT_FAMILY_INDEX).to_list(length=limit)
+
+        # Extract family codes from the result
+        return [doc['_id'] for doc in result]
+
+    async def top_unspsc(self, limit: int) -> List[Dict]:
+        rollup = await self.get_rollup("rollup_unspsc")
+        if rollup is not None:
+            # the per UNSPSC counts are pre-computed
+            pipeline = [
+                {"$sort": {"count": DESCENDING, "_id": ASCENDING}},
+                {"$limit": limit},
+                {"$project": {"_id": 0, "UNSPSC": "$_id", "Count": "$count"}}
+            ]
+            return await rollup.aggregate(pipeline).to_list(length=limit)
+
+        pipeline = [
+            {"$sort": {"normalized_UNSPSC": ASCENDING}},  # Read the groups in index order instead of scanning the collection
+            {"$project": {"_id": 0, "normalized_UNSPSC": 1}},
+            {"$group": {
+                "_id": "$normalized_UNSPSC",  # Group by normalized_UNSPSC
+                "count": {"$sum": 1}  # Count the number of occurrences
+            }},
+            {"$sort": {"count": DESCENDING, "_id": ASCENDING}},  # Sort by count in descending order
+            {"$limit": limit},
+            {"$project": {
+                "_id": 0,  # Exclude the _id field
+                "UNSPSC": "$_id",  # Include normalized_UNSPSC as UNSPSC
+                "Count": "$count"  # Include the count of occurrences
+            }}
+        ]
+        return await Purchase.aggregate(pipeline, hint=UNSPSC_INDEX, allowDiskUse=True).to_list(length=limit)
+
+    async def top_items_by_fiscal_year(self, fiscal_year: str, limit: int) -> List[Dict]:
+        rollup = await self.get_rollup("rollup_items")
+        if rollup is not None:
+            # the per item and fiscal year totals are pre-computed
+            pipeline = [
+                {"$match": {"fiscal_year": fiscal_year}},
+                {"$group": {"_id": "$item_name", "total_price": {"$sum": "$total_price"}}},
+                {"$sort": {"total_price": DESCENDING, "_id": ASCENDING}},
+                {"$limit": limit},
+                {"$project": {"_id": 0, "item_name": "$_id", "total_price": 1}}
+            ]
+            return await rollup.aggregate(pipeline).to_list(length=limit)
+
+        pipeline = [
+            {"$match": {"fiscal_year": fiscal_year}},  # Filter by fiscal year
+            {"$project": {"_id": 0, "item_name": 1, "total_price": 1}},  # Read only the indexed fields
+            {"$group": {
+                "_id": "$item_name",  # Group by item_name
+                "total_price": {"$sum": "$total_price"}  # Sum the total price for each item
+            }},
+            {"$sort": {"total_price": DESCENDING, "_id": ASCENDING}},  # Sort by total_price in descending order
+            {"$limit": limit},
+            {"$project": {
+                "_id": 0,  # Exclude the _id field
+                "item_name": "$_id",  # Include the item_name
+                "total_price": 1  # Include the total price
+            }}
+        ]
+        return await Purchase.aggregate(pipeline, hint=FISCAL_YEAR_ITEMS_INDEX, allowDiskUse=True).to_list(length=limit)
+
+    async def top_departments(self, limit: int) -> List[Dict]:
+        rollup = await self.get_rollup("rollup_departments")
+        if rollup is not None:
+            # the per department counts are pre-computed
+            pipeline = [
+                {"$sort": {"order_count": DESCENDING, "_id": ASCENDING}},
+                {"$limit": limit},
+                {"$project": {"_id": 0, "department_name": "$_id", "order_count": 1}}
+            ]
+            return await rollup.aggregate(pipeline).to_list(length=limit)
+
+        if await is_compact():
+            # the codes sort like the names, the names are only joined onto the top rows
+            pipeline = [
+                {"$sort": {"department_id": ASCENDING}},
+                {"$project": {"_id": 0, "department_id": 1}},
+                {"$group": {"_id": "$department_id", "order_count": {"$sum": 1}}},
+                {"$sort": {"order_count": DESCENDING, "_id": ASCENDING}},
+                {"$limit": limit},
+                *join_labels(DEPARTMENTS),
+                {"$project": {"_id": 0, "department_name": 1, "order_count": 1}}
+            ]
+            return await Purchase.aggregate(pipeline, hint=DEPARTMENT_ID_INDEX, allowDiskUse=True).to_list(length=limit)
+
+        pipeline = [
+            {"$sort": {"department_name": ASCENDING}},  # Read the groups in index order instead of scanning the collection
+            {"$project": {"_id": 0, "department_name": 1}},
+            {"$group": {
+                "_id": "$department_name",  # Group by department_name
+                "order_count": {"$sum": 1}  # Count the number of orders per department
+            }},
+            {"$sort": {"order_count": DESCENDING, "_id": ASCENDING}},  # Sort by order_count in descending order
+            {"$limit": limit},
+            {"$project": {
+                "_id": 0,  # Exclude the _id field
+                "department_name": "$_id",  # Include department_name
+                "order_count": 1  # Include order_count
+            }}
+        ]
+        return await Purchase.aggregate(pipeline, hint=DEPARTMENT_INDEX, allowDiskUse=True).to_list(length=limit)
+
+    async def top_suppliers(self, limit: int) -> List[Dict]:
+        rollup = await self.get_rollup("rollup_suppliers")
+        if rollup is not None:
+            # the per supplier and zip code counts are pre-computed
+            pipeline = [
+                {"$sort": {"purchase_count": DESCENDING, "_id.supplier_name": ASCENDING, "_id.supplier_zip": ASCENDING}},
+                {"$limit": limit},
+                {"$project": {
+                    "_id": 0,
+                    "supplier_name": "$_id.supplier_name",
+                    "supplier_zip_code": "$_id.supplier_zip",
+                    "purchase_count": 1
+                }}
+            ]
+            return await rollup.aggregate(pipeline).to_list(length=limit)
+
+        if await is_compact():
+            pipeline = [
+                {"$sort": {"supplier_id": ASCENDING}},
+                {"$project": {"_id": 0, "supplier_id": 1}},
+                {"$group": {"_id": "$supplier_id", "purchase_count": {"$sum": 1}}},
+                {"$sort": {"purchase_count": DESCENDING, "_id": ASCENDING}},
+                {"$limit": limit},
+                *join_labels(SUPPLIERS),
+                {"$project": {"_id": 0, "supplier_name": 1, "supplier_zip_code": 1, "purchase_count": 1}}
+            ]
+            return await Purchase.aggregate(pipeline, hint=SUPPLIER_ID_INDEX, allowDiskUse=True).to_list(length=limit)
+
+        pipeline = [
+            # Read the groups in index order instead of scanning the collection
+            {"$sort": {"supplier_name": ASCENDING, "supplier_zip_code": ASCENDING}},
+            {"$project": {"_id": 0, "supplier_name": 1, "supplier_zip_code": 1}},
+            {"$group": {
+                "_id": {
+                    "supplier_name": "$supplier_name",  # Group by supplier_name
+                    "supplier_zip": "$supplier_zip_code"  # Group by supplier_zip_code
+                },
+                "purchase_count": {"$sum": 1}  # Count the number of purchases for each supplier
+            }},
+            # Sort by purchase_count in descending order
+            {"$sort": {"purchase_count": DESCENDING, "_id.supplier_name": ASCENDING, "_id.supplier_zip": ASCENDING}},
+            {"$limit": limit},
+            {"$project": {
+                "_id": 0,  # Exclude the _id field
+                "supplier_name": "$_id.supplier_name",  # Include supplier_name
+                "supplier_zip_code": "$_id.supplier_zip",  # Include supplier_zip_code
+                "purchase_count": 1  # Include the count of purchases
+            }}
+        ]
+        return await Purchase.aggregate(pipeline, hint=SUPPLIER_INDEX, allowDiskUse=True).to_list(length=limit)
+
+    async def data_version(self) -> Optional[str]:
+        return await current_data_version()
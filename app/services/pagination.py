@@ -0,0 +1,69 @@
+import base64
+import binascii
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core.config import settings
+from services.cache import make_cache_key
+from services.repository import After
+
+# the parameters that select a page, the others select the query
+PAGE_PARAMETERS = ("limit", "cursor")
+
+
+def query_key(function_name: str, parameters: Dict[str, Any]) -> str:
+    return make_cache_key(function_name, {name: value for name, value in parameters.items() if name not in PAGE_PARAMETERS})
+
+
+def encode_cursor(key: str, value: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps([key, value], default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str, key: str) -> After:
+    """
+    Read the continuation token of a page.
+
+    Raises:
+        ValueError: The token is malformed or belongs to another query.
+    """
+    try:
+        cursor_key, value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+        raise ValueError("The cursor is not valid.") from e
+
+    if cursor_key != key:
+        raise ValueError("The cursor belongs to another query.")
+    return After(value)
+
+
+def page_limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return settings.PAGE_SIZE
+    return max(1, min(int(limit), settings.PAGE_SIZE_MAX))
+
+
+async def fetch_page(
+    fetch: Callable[[Optional[After], int], Awaitable[List[Any]]],
+    key: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Read one page of sorted distinct values.
+
+    Args:
+        fetch (Callable): Reads at most n values after a cursor (None: from the first value).
+        key (str): The query the cursor is bound to (query_key).
+        limit (Optional[int]): The page size, PAGE_SIZE by default and at most PAGE_SIZE_MAX.
+        cursor (Optional[str]): The next_cursor of the previous page.
+
+    Returns:
+        Dict[str, Any]: {"items": [...], "next_cursor": str}, next_cursor is None on the last page.
+    """
+    limit = page_limit(limit)
+    after = decode_cursor(cursor, key) if cursor else None
+
+    # one more value tells whether another page follows
+    values = await fetch(after, limit + 1)
+    next_cursor = encode_cursor(key, values[limit - 1]) if len(values) > limit else None
+    return {"items": values[:limit], "next_cursor": next_cursor}
@@ -0,0 +1,132 @@
+import json
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from core.config import settings
+from templates.chatbot import README_TEMPLATE
+
+# words, single digits and single symbols: Gemma's tokenizer splits numbers digit by digit
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d|[^\w\s]|_")
+
+# letters of a word per token, long words are split into several pieces
+CHARS_PER_WORD_TOKEN = 5
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text without loading the model tokenizer.
+
+    The estimate leans high (short words are one token, digits and symbols are one token
+    each), the real counts are logged after every answer to check it.
+    """
+    return sum(
+        math.ceil(len(piece) / CHARS_PER_WORD_TOKEN) if piece[0].isalpha() else 1
+        for piece in TOKEN_PATTERN.findall(text)
+    )
+
+
+# the readme prompt without its question and response
+TEMPLATE_TOKENS = count_tokens(README_TEMPLATE)
+
+# appended to a response cut in the middle of a row
+TRUNCATED = " ... (truncated)"
+TRUNCATED_TOKENS = count_tokens(TRUNCATED)
+
+
+def more_rows(total: int, shown: int) -> str:
+    return f"{total - shown:,} more rows not shown ({total:,} in total)"
+
+
+def compact_result(value: Any, max_rows: int) -> Any:
+    """
+    Rewrite a database result in a compact tabular form.
+
+    Lists of dicts become {"columns": [...], "rows": [[...], ...]} so the keys are written once,
+    lists keep their first max_rows rows with a "more" summary of the others, and a page
+    ({"items", "next_cursor"}) becomes its items since the cursor means nothing to the LLM.
+    """
+    if isinstance(value, dict) and set(value) == {"items", "next_cursor"}:
+        rows = compact_result(value["items"], max_rows)
+        if value["next_cursor"] is None:
+            return rows
+        return {"rows": rows, "more": "more rows on the next pages"} if isinstance(rows, list) else {**rows, "more_pages": True}
+
+    if isinstance(value, dict):
+        return {key: compact_result(item, max_rows) for key, item in value.items()}
+
+    if not isinstance(value, list):
+        return value
+
+    shown = value[:max_rows]
+    if shown and all(isinstance(row, dict) for row in shown):
+        columns: List[str] = []
+        for row in shown:
+            columns.extend(key for key in row if key not in columns)
+        table = {"columns": columns, "rows": [[compact_result(row.get(key), max_rows) for key in columns] for row in shown]}
+        if len(value) > len(shown):
+            table["more"] = more_rows(len(value), len(shown))
+        return table
+
+    rows = [compact_result(row, max_rows) for row in shown]
+    if len(value) > len(shown):
+        return {"rows": rows, "more": more_rows(len(value), len(shown))}
+    return rows
+
+
+@dataclass
+class ReadmePrompt:
+    response: str  # the compact database response placed in the prompt
+    prompt_tokens: int  # estimated tokens of the whole prompt
+    num_ctx: int  # context size of the request: the prompt and the answer
+    max_rows: int  # rows kept in every list
+
+
+def context_sizes() -> List[int]:
+    # Ollama reloads the model when num_ctx changes, so the sizes double from LLM_MODEL_CTX to keep them few
+    sizes = [settings.LLM_MODEL_CTX]
+    while sizes[-1] * 2 <= settings.LLM_MODEL_CTX_MAX:
+        sizes.append(sizes[-1] * 2)
+    return sizes
+
+
+def build_readme_prompt(question: str, database_response: Any, max_rows: Optional[int] = None) -> ReadmePrompt:
+    """
+    Fit a database response in the readme prompt.
+
+    The response is compacted (compact_result) with PROMPT_RESULT_ROWS rows per list, halved
+    until the prompt and PROMPT_ANSWER_TOKENS for the answer fit in LLM_MODEL_CTX_MAX, and
+    num_ctx is the smallest context size that holds them.
+
+    Args:
+        question (str): The user question.
+        database_response (Any): The output of invoke_function.
+        max_rows (Optional[int]): The max rows of every list, PROMPT_RESULT_ROWS by default.
+
+    Returns:
+        ReadmePrompt: The response text, the estimated prompt tokens and the num_ctx of the request.
+    """
+    max_rows = settings.PROMPT_RESULT_ROWS if max_rows is None else max_rows
+    budget = settings.LLM_MODEL_CTX_MAX - settings.PROMPT_ANSWER_TOKENS
+    fixed_tokens = TEMPLATE_TOKENS + count_tokens(question)
+
+    while True:
+        response = json.dumps(compact_result(database_response, max_rows), default=str, ensure_ascii=False, separators=(",", ":"))
+        response_tokens = count_tokens(response)
+        if fixed_tokens + response_tokens <= budget or max_rows <= 1:
+            break
+        max_rows //= 2
+
+    # a single row can still be too long, the text is cut to its share of the budget
+    while fixed_tokens + response_tokens > budget and response:
+        keep = max(budget - fixed_tokens - TRUNCATED_TOKENS, 0) / response_tokens
+        response = response[:int(len(response) * keep * 0.95)]
+        response_tokens = count_tokens(response) + TRUNCATED_TOKENS
+        if fixed_tokens + response_tokens <= budget:
+            response += TRUNCATED
+
+    prompt_tokens = fixed_tokens + response_tokens
+    needed = prompt_tokens + settings.PROMPT_ANSWER_TOKENS
+    num_ctx = next((size for size in context_sizes() if size >= needed), settings.LLM_MODEL_CTX_MAX)
+    return ReadmePrompt(response=response, prompt_tokens=prompt_tokens, num_ctx=num_ctx, max_rows=max_rows)
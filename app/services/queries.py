@@ -1,11 +1,16 @@
-from datetime import datetime
-from typing import Callable, Dict, List, Tuple
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
-from pymongo import DESCENDING
-
-from schemas.documents import AcquisitionTypeEnum, FiscalYearEnum, Purchase
+from core.config import settings
+from core.metrics import database_seconds, timed
+from schemas.documents import AcquisitionTypeEnum, FiscalYearEnum
+from services.cache import AsyncResultCache, make_cache_key
+from services.dates import day_range, days_range
+from services.pagination import fetch_page, query_key
+from services.repository import get_repository
+from services.search import get_item_search
 
 
+# The functions parse their parameters and run on the repository of the QUERY_ENGINE setting
 async def count_purchases_in_geographic_area(
     top_left: Tuple[float, float],
     bottom_right: Tuple[float, float]
@@ -20,19 +25,38 @@ async def count_purchases_in_geographic_area(
     Returns:
         int: Number of records within the specified area.
     """
-    # Define the rectangular box for querying
-    left_lat, left_long = top_left
-    right_lat, right_long = bottom_right
+    return await get_repository().count_in_area(top_left, bottom_right)
 
-    
-    count = await Purchase.find(
-        Purchase.location_lat <= left_lat,
-        Purchase.location_lat >= right_lat,
-        Purchase.location_long >= left_long,
-        Purchase.location_long <= right_long
-    ).count()
-    
-    return count
+
+async def count_purchases_within_radius(center: Tuple[float, float], radius_km: float) -> int:
+    """
+    Count the number of Purchase records within a distance of a point.
+
+    Args:
+        center (Tuple[float, float]): The (latitude, longitude) of the point.
+        radius_km (float): The distance in kilometers.
+
+    Returns:
+        int: Number of records within the distance.
+    """
+    return await get_repository().count_within_radius(tuple(center), float(radius_km))
+
+
+async def count_purchases_in_polygon(points: List[Tuple[float, float]]) -> int:
+    """
+    Count the number of Purchase records inside a polygon.
+
+    Args:
+        points (List[Tuple[float, float]]): The (latitude, longitude) vertices of the polygon, at least three.
+
+    Returns:
+        int: Number of records inside the polygon.
+    """
+    points = [tuple(point) for point in points]
+    if len(set(points)) < 3:
+        raise ValueError("A polygon needs at least three distinct points.")
+
+    return await get_repository().count_in_polygon(points)
 
 
 async def count_purchases_in_purchase_date_range(start_date: str, end_date: str) -> int:
@@ -41,27 +65,12 @@ async def count_purchases_in_purchase_date_range(start_date: str, end_date: str)
 
     Args:
         start_date (str): The start date in 'YYYY-MM-DD' format.
-        end_date (str): The end date in 'YYYY-MM-DD' format.
+        end_date (str): The end date in 'YYYY-MM-DD' format, the whole day is included.
 
     Returns:
         int: Number of Purchase records within the specified date range.
     """
-    # Convert the input strings to datetime objects
-    start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-    end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-
-    # Perform the query to count records within the date range
-    count = await Purchase.find(
-        {
-            "purchase_date": {
-                "$gte": start_dt,
-                "$lte": end_dt
-            }
-        }
-    ).count()
-    
-    return count
-
+    return await get_repository().count_in_date_range(*days_range(start_date, end_date))
 
 
 async def get_top_spending_items_by_year(year: int, limit: int = 10) -> List[dict]:
@@ -75,25 +84,7 @@ async def get_top_spending_items_by_year(year: int, limit: int = 10) -> List[dic
     Returns:
         List[dict]: A list of dictionaries with item names and their total spending, sorted by highest spending.
     """
-    pipeline = [
-        {
-            "$match": {
-                "purchase_date": {
-                    "$gte": datetime(year, 1, 1),
-                    "$lt": datetime(year + 1, 1, 1)
-                }
-            }
-        },
-        {"$group": {"_id": "$item_name", "total_spending": {"$sum": "$total_price"}}},
-        {"$sort": {"total_spending": DESCENDING}},
-        {"$limit": limit},
-        {"$project": {"_id": 0, "item_name": "$_id", "total_spending": 1}}
-    ]
-    
-    # Run the aggregation pipeline
-    results = await Purchase.aggregate(pipeline).to_list(length=limit)
-    
-    return results
+    return await get_repository().top_spending_items(year, limit)
 
 
 async def count_records_by_acquisition_type(acquisition_type: AcquisitionTypeEnum) -> int:
@@ -106,135 +97,71 @@ async def count_records_by_acquisition_type(acquisition_type: AcquisitionTypeEnu
     Returns:
         int: Number of records with the specified acquisition type.
     """
-    count = await Purchase.find(
-      
-        Purchase.acquisition_type == acquisition_type
-       
-    ).count()
-    
-    return count
+    return await get_repository().count_by_acquisition_type(getattr(acquisition_type, "value", acquisition_type))
 
 
-async def get_total_quantity_by_item_name(item_name: str) -> float:
+async def get_total_quantity_by_item_name(item_name: str) -> Dict:
     """
     Get the total quantity sold for a specific item by its name.
 
+    The name does not have to be exact: it is matched case and punctuation insensitively, then
+    by similarity with the item names, descriptions and commodity titles of the purchases.
+
     Args:
         item_name (str): The name of the item.
 
     Returns:
-        float: The total quantity sold for the specified item.
+        Dict: {"item_names": the matched item names, "total_quantity": their total quantity sold (0.0 when nothing matched)}.
     """
-    # MongoDB aggregation pipeline
-    pipeline = [
-        {"$match": {"item_name": item_name}},  # Filter by item_name
-        {"$group": {
-            "_id": "$item_name",  # Group by item_name
-            "total_quantities": {"$sum": "$quantity"}  # Sum the quantities
-        }},
-        {"$project": {
-            "_id": 0,  # Exclude _id field
-            "total_quantities": 1  # Include total_quantities
-        }}
-    ]
-    
-    # Run the aggregation pipeline
-    result = await Purchase.aggregate(pipeline).to_list(length=1)
+    item_names = (await get_item_search()).resolve(item_name)
+    total_quantity = await get_repository().total_quantity_by_items(item_names) if item_names else 0.0
+    return {"item_names": item_names, "total_quantity": total_quantity}
 
-    # If no records found, return 0
-    if result:
-        return result[0]['total_quantities']
-    return 0.0
 
-
-async def get_items_by_purchase_date(date: str) -> List[str]:
+async def get_items_by_purchase_date(date: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict:
     """
-    Get the names of items purchased on a specific date.
+    Get the names of items purchased on a specific date, one page at a time.
 
     Args:
         date (str): The date in 'YYYY-MM-DD' format.
+        limit (Optional[int]): The number of item names per page (default is PAGE_SIZE).
+        cursor (Optional[str]): The next_cursor of the previous page.
 
     Returns:
-        List[str]: A list of item names purchased on the specified date.
+        Dict: {"items": the item names sorted by name, "next_cursor": the token of the next page or None}.
     """
-    # Convert the input string date to a datetime object for comparison
-    purchase_date = datetime.strptime(date, "%Y-%m-%d")
-
-    # MongoDB aggregation pipeline
-    pipeline = [
-        {"$match": {"purchase_date": {"$gte": purchase_date, "$lt": purchase_date.replace(hour=23, minute=59, second=59)}}},  # Match the specific date range
-        {"$project": {
-            "_id": 0,  # Exclude _id field
-            "item_name": 1  # Include item_name field
-        }},
-        {"$group": {
-            "_id": "$item_name"  # Group by item_name to avoid duplicates
-        }},
-        {"$project": {
-            "_id": 0,  # Exclude _id field
-            "item_name": "$_id"  # Include item_name
-        }}
-    ]
-    
-    # Run the aggregation pipeline
-    result = await Purchase.aggregate(pipeline).to_list(length=None)
+    start, end = day_range(date)
 
-    # Extract item names from the result
-    item_names = [doc['item_name'] for doc in result]
-    
-    return item_names
+    return await fetch_page(
+        lambda after, size: get_repository().items_purchased_between(start, end, after, size),
+        query_key(get_items_by_purchase_date.__name__, {"date": date}),
+        limit,
+        cursor,
+    )
 
-async def get_family_codes_by_segment_code(segment_code: int) -> List[int]:
 
+async def get_family_codes_by_segment_code(segment_code: int, limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict:
     """
-    Get all unique family codes for a specific segment code.
+    Get all unique family codes for a specific segment code, one page at a time.
 
     Args:
         segment_code (int): The segment code to filter by.
+        limit (Optional[int]): The number of family codes per page (default is PAGE_SIZE).
+        cursor (Optional[str]): The next_cursor of the previous page.
 
     Returns:
-        List[int]: A list of unique family codes for the specified segment code.
+        Dict: {"items": the family codes sorted ascending, "next_cursor": the token of the next page or None}.
     """
-    # MongoDB aggregation pipeline
-    pipeline = [
-        {"$match": {"segment": segment_code}},  # Filter by segment_code
-        {"$group": {
-            "_id": "$family"  # Group by family_code
-        }},
-        {"$project": {
-            "_id": 0,  # Exclude _id field
-            "family": "$_id"  # Include family_code
-        }}
-    ]
-
-    
-    # Run the aggregation pipeline
-    result = await Purchase.aggregate(pipeline).to_list(length=None)
-
-    # Extract family codes from the result
-    family_codes = [doc['family'] for doc in result]
-    
-    return family_codes
-
+    return await fetch_page(
+        lambda after, size: get_repository().family_codes_by_segment(segment_code, after, size),
+        query_key(get_family_codes_by_segment_code.__name__, {"segment_code": segment_code}),
+        limit,
+        cursor,
+    )
 
 
 async def get_top_normalized_UNSPSC() -> List[Dict]:
-    pipeline = [
-        {"$group": {
-            "_id": "$normalized_UNSPSC",  # Group by normalized_UNSPSC
-            "count": {"$sum": 1}  # Count the number of occurrences
-        }},
-        {"$sort": {"count": DESCENDING}},  # Sort by count in descending order
-        {"$limit": 10},  # Limit to the top 10 results
-        {"$project": {
-            "_id": 0,  # Exclude the _id field
-            "UNSPSC": "$_id",  # Include normalized_UNSPSC as UNSPSC
-            "Count": "$count"  # Include the count of occurrences
-        }}
-    ]
-    
-    result = await Purchase.aggregate(pipeline).to_list(length=10)  # Assuming you're using Beanie
-    return result
+    return await get_repository().top_unspsc(10)
 
 
 async def get_top_item_by_total_price(fiscal_year: FiscalYearEnum) -> Dict:
@@ -247,26 +174,7 @@ async def get_top_item_by_total_price(fiscal_year: FiscalYearEnum) -> Dict:
     Returns:
         Dict: A dictionary containing the item name and the total price.
     """
-    # MongoDB aggregation pipeline
-    pipeline = [
-        {"$match": {"fiscal_year": fiscal_year}},  # Filter by fiscal year
-        {"$group": {
-            "_id": "$item_name",  # Group by item_name
-            "total_price": {"$sum": "$total_price"}  # Sum the total price for each item
-        }},
-        {"$sort": {"total_price": -1}},  # Sort by total_price in descending order
-        {"$limit": 5},  # Limit to the top item
-        {"$project": {
-            "_id": 0,  # Exclude the _id field
-            "item_name": "$_id",  # Include the item_name
-            "total_price": 1  # Include the total price
-        }}
-    ]
-    
-    # Run the aggregation pipeline
-    result = await Purchase.aggregate(pipeline).to_list(length=5)
-
-    return result
+    return await get_repository().top_items_by_fiscal_year(getattr(fiscal_year, "value", fiscal_year), 5)
 
 
 async def get_top_departments() -> List[Dict]:
@@ -276,24 +184,8 @@ async def get_top_departments() -> List[Dict]:
     Returns:
         List[Dict]: A list of dictionaries containing department names and their order counts.
     """
-    # MongoDB aggregation pipeline
-    pipeline = [
-        {"$group": {
-            "_id": "$department_name",  # Group by department_name
-            "order_count": {"$sum": 1}  # Count the number of orders per department
-        }},
-        {"$sort": {"order_count": DESCENDING}},  # Sort by order_count in descending order
-        {"$limit": 10},  # Limit the result to the top 10
-        {"$project": {
-            "_id": 0,  # Exclude the _id field
-            "department_name": "$_id",  # Include department_name
-            "order_count": 1  # Include order_count
-        }}
-    ]
-    
-    # Run the aggregation pipeline
-    result = await Purchase.aggregate(pipeline).to_list(length=10)  # Assuming you're using Beanie
-    return result
+    return await get_repository().top_departments(10)
+
 
 async def get_top_suppliers_by_purchase_count(top_n: int = 5) -> List[Dict]:
     """
@@ -305,31 +197,7 @@ async def get_top_suppliers_by_purchase_count(top_n: int = 5) -> List[Dict]:
     Returns:
         List[Dict]: A list of dictionaries containing supplier name, zip code, and the count of purchases.
     """
-    # MongoDB aggregation pipeline
-    pipeline = [
-        {"$group": {
-            "_id": {
-                "supplier_name": "$supplier_name",  # Group by supplier_name
-                "supplier_zip": "$supplier_zip_code"  # Group by supplier_zip_code
-            },
-            "purchase_count": {"$sum": 1}  # Count the number of purchases for each supplier
-        }},
-        {"$sort": {"purchase_count": -1}},  # Sort by purchase_count in descending order
-        {"$limit": top_n},  # Limit the result to the top 'n' suppliers
-        {"$project": {
-            "_id": 0,  # Exclude the _id field
-            "supplier_name": "$_id.supplier_name",  # Include supplier_name
-            "supplier_zip_code": "$_id.supplier_zip",  # Include supplier_zip_code
-            "purchase_count": 1  # Include the count of purchases
-        }}
-    ]
-    
-    # Run the aggregation pipeline
-    result = await Purchase.aggregate(pipeline).to_list(length=top_n)
-
-    # Return the result
-    return result
-
+    return await get_repository().top_suppliers(top_n)
 
 
 # Create a dictionary to map function numbers to actual functions
@@ -344,21 +212,69 @@ function_map: Dict[int, Callable] = {
     8: get_top_normalized_UNSPSC,
     9: get_top_item_by_total_price,
     10: get_top_departments,
-    11: get_top_suppliers_by_purchase_count
+    11: get_top_suppliers_by_purchase_count,
+    12: count_purchases_within_radius,
+    13: count_purchases_in_polygon
 }
 
+
+# the functions returning pages ({"items", "next_cursor"}) of an unbounded list
+PAGINATED_FUNCTIONS = (6, 7)
+
+
+async def stream_items(function_data: dict, page_size: Optional[int] = None) -> AsyncIterator[Any]:
+    """
+    Yield every item of a paginated function, reading one page at a time.
+
+    Args:
+        function_data (dict): The function number and parameters, a cursor starts after its page.
+        page_size (Optional[int]): The items read per page (default is PAGE_SIZE_MAX).
+
+    Yields:
+        Any: The items, in the order of the pages.
+
+    Raises:
+        ValueError: The function does not return pages, or the cursor is not valid.
+    """
+    function_number = function_data.get("function_number")
+    if function_number not in PAGINATED_FUNCTIONS:
+        raise ValueError(f"The function {function_number} does not return pages.")
+
+    function = function_map[function_number]
+    parameters = dict(function_data.get("parameters") or {})
+    parameters["limit"] = page_size or settings.PAGE_SIZE_MAX
+
+    # the pages are read straight from the repository, a full scan would only evict the cached results
+    while True:
+        page = await function(**parameters)
+        for item in page["items"]:
+            yield item
+        if page["next_cursor"] is None:
+            return
+        parameters["cursor"] = page["next_cursor"]
+
+
+# Cache of the function results, keyed by the normalized function call
+result_cache = AsyncResultCache(maxsize=settings.RESULT_CACHE_SIZE, ttl=settings.RESULT_CACHE_TTL)
+
+
 # Function to invoke a function based on function number and parameters
 async def invoke_function(function_data: dict):
     # Extract function number and parameters
     function_number = function_data.get("function_number")
-    parameters = function_data.get("parameters", {})
+    parameters = function_data.get("parameters") or {}
 
     # Get the function from the mapping
     function_to_invoke = function_map.get(function_number)
 
     if function_to_invoke:
-        # Dynamically call the function with the parameters
-        result = await function_to_invoke(**parameters)
+        # Dynamically call the function with the parameters, identical calls share the cached result
+        with timed("database"), database_seconds.time(function=function_to_invoke.__name__):
+            result = await result_cache.get_or_compute(
+                make_cache_key(function_number, parameters),
+                lambda: function_to_invoke(**parameters),
+                version=await get_repository().data_version(),
+            )
         return {'function_name': function_to_invoke.__name__, 'result': result}
     
     return 'Your query is not clear. Please write vaild question.'
\ No newline at end of file
@@ -0,0 +1,189 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# (result key, column header, value formatter)
+Column = Tuple[str, str, Callable[[Any], str]]
+
+
+def format_text(value: Any) -> str:
+    if value is None:
+        return "N/A"
+    # pipes would split the markdown cell
+    return str(value).replace("|", "\\|").replace("\n", " ")
+
+
+def format_count(value: Any) -> str:
+    return f"{value:,}" if isinstance(value, (int, float)) else format_text(value)
+
+
+def format_money(value: Any) -> str:
+    return f"${value:,.2f}" if isinstance(value, (int, float)) else format_text(value)
+
+
+def format_quantity(value: Any) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int):
+        return f"{value:,}"
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    return format_text(value)
+
+
+def render_table(rows: List[Any], columns: List[Column]) -> str:
+    lines = [
+        "| " + " | ".join(header for _, header, _ in columns) + " |",
+        "| " + " | ".join("---:" if formatter in (format_count, format_money, format_quantity) else "---" for _, _, formatter in columns) + " |",
+    ]
+    for row in rows:
+        if not isinstance(row, dict):
+            row = {columns[0][0]: row}
+        lines.append("| " + " | ".join(formatter(row.get(key)) for key, _, formatter in columns) + " |")
+    return "\n".join(lines)
+
+
+def numbered(rows: List[Any], key: str) -> List[dict]:
+    return [{"rank": index, key: row} for index, row in enumerate(rows, start=1)]
+
+
+# item names listed in an answer, the others are counted
+MATCHED_NAMES_SHOWN = 5
+
+
+# Every renderer maps (result, parameters) to a markdown answer
+def render_geographic_area(result: Any, parameters: Dict) -> str:
+    top_left, bottom_right = parameters.get("top_left"), parameters.get("bottom_right")
+    return f"**{format_count(result)}** purchases were made inside the area from `{top_left}` (top-left) to `{bottom_right}` (bottom-right)."
+
+
+def render_radius(result: Any, parameters: Dict) -> str:
+    return f"**{format_count(result)}** purchases were made within **{format_quantity(parameters.get('radius_km'))} km** of `{parameters.get('center')}`."
+
+
+def render_polygon(result: Any, parameters: Dict) -> str:
+    points = parameters.get("points") or []
+    return f"**{format_count(result)}** purchases were made inside the polygon with {len(points)} corners `{points}`."
+
+
+def render_date_range(result: Any, parameters: Dict) -> str:
+    return f"**{format_count(result)}** purchases were made between **{parameters.get('start_date')}** and **{parameters.get('end_date')}**."
+
+
+def render_top_spending_items(result: Any, parameters: Dict) -> str:
+    if not result:
+        return f"No purchases were found in **{parameters.get('year')}**."
+    table = render_table(result, [("item_name", "Item Name", format_text), ("total_spending", "Total Spending", format_money)])
+    return f"### Top {len(result)} items by total spending in {parameters.get('year')}\n\n{table}\n\n**{format_text(result[0].get('item_name'))}** has the highest spending with **{format_money(result[0].get('total_spending'))}**."
+
+
+def render_acquisition_type(result: Any, parameters: Dict) -> str:
+    return f"**{format_count(result)}** purchases have the acquisition type **{parameters.get('acquisition_type')}**."
+
+
+def render_quantity_by_item(result: Any, parameters: Dict) -> str:
+    item_name = parameters.get("item_name")
+    item_names = result.get("item_names") or []
+    if not item_names:
+        return f"No item matches **{format_text(item_name)}**."
+
+    quantity = format_quantity(result.get("total_quantity"))
+    if item_names == [item_name]:
+        return f"The total quantity purchased of **{format_text(item_name)}** is **{quantity}**."
+
+    matched = ", ".join(f"**{format_text(name)}**" for name in item_names[:MATCHED_NAMES_SHOWN])
+    if len(item_names) > MATCHED_NAMES_SHOWN:
+        matched += f" and {len(item_names) - MATCHED_NAMES_SHOWN:,} more items"
+    return f"The total quantity purchased of {matched} (matching **{format_text(item_name)}**) is **{quantity}**."
+
+
+def more_pages(result: Dict) -> str:
+    if not result.get("next_cursor"):
+        return ""
+    return f"\n\nMore results follow, pass `cursor` = `{result['next_cursor']}` to get the next page."
+
+
+def render_items_by_date(result: Any, parameters: Dict) -> str:
+    items = result.get("items") or []
+    if not items:
+        return f"No items were purchased on **{parameters.get('date')}**."
+    table = render_table(numbered(items, "item_name"), [("rank", "#", format_count), ("item_name", "Item Name", format_text)])
+    heading = f"The first {len(items)}" if result.get("next_cursor") else f"{len(items)}"
+    return f"### {heading} distinct items purchased on {parameters.get('date')}\n\n{table}{more_pages(result)}"
+
+
+def render_family_codes(result: Any, parameters: Dict) -> str:
+    codes = result.get("items") or []
+    if not codes:
+        return f"No family codes were found for the segment code **{parameters.get('segment_code')}**."
+    table = render_table(numbered(codes, "family_code"), [("rank", "#", format_count), ("family_code", "Family Code", format_text)])
+    heading = f"The first {len(codes)}" if result.get("next_cursor") else f"{len(codes)}"
+    return f"### {heading} family codes in the segment {parameters.get('segment_code')}\n\n{table}{more_pages(result)}"
+
+
+def render_top_unspsc(result: Any, parameters: Dict) -> str:
+    table = render_table(result, [("UNSPSC", "Normalized UNSPSC", format_text), ("Count", "Purchases", format_count)])
+    return f"### Top {len(result)} normalized UNSPSC codes by number of purchases\n\n{table}"
+
+
+def render_top_item_by_total_price(result: Any, parameters: Dict) -> str:
+    if not result:
+        return f"No purchases were found in the fiscal year **{parameters.get('fiscal_year')}**."
+    table = render_table(result, [("item_name", "Item Name", format_text), ("total_price", "Total Price", format_money)])
+    return f"### Top items by total price in the fiscal year {parameters.get('fiscal_year')}\n\n{table}\n\n**{format_text(result[0].get('item_name'))}** has the highest total price with **{format_money(result[0].get('total_price'))}**."
+
+
+def render_top_departments(result: Any, parameters: Dict) -> str:
+    table = render_table(result, [("department_name", "Department", format_text), ("order_count", "Orders", format_count)])
+    return f"### Top {len(result)} departments by number of orders\n\n{table}"
+
+
+def render_top_suppliers(result: Any, parameters: Dict) -> str:
+    table = render_table(result, [
+        ("supplier_name", "Supplier", format_text),
+        ("supplier_zip_code", "Zip Code", format_text),
+        ("purchase_count", "Purchases", format_count),
+    ])
+    return f"### Top {len(result)} suppliers by number of purchases\n\n{table}"
+
+
+# Renderers keyed by the function_name returned by invoke_function
+RENDERERS: Dict[str, Callable[[Any, Dict], str]] = {
+    "count_purchases_in_geographic_area": render_geographic_area,
+    "count_purchases_in_purchase_date_range": render_date_range,
+    "get_top_spending_items_by_year": render_top_spending_items,
+    "count_records_by_acquisition_type": render_acquisition_type,
+    "get_total_quantity_by_item_name": render_quantity_by_item,
+    "get_items_by_purchase_date": render_items_by_date,
+    "get_family_codes_by_segment_code": render_family_codes,
+    "get_top_normalized_UNSPSC": render_top_unspsc,
+    "get_top_item_by_total_price": render_top_item_by_total_price,
+    "get_top_departments": render_top_departments,
+    "get_top_suppliers_by_purchase_count": render_top_suppliers,
+    "count_purchases_within_radius": render_radius,
+    "count_purchases_in_polygon": render_polygon,
+}
+
+
+def render_answer(response: Any, database_response: Any) -> Optional[str]:
+    """
+    Render the answer of a question without the LLM.
+
+    Args:
+        response (Any): The stage-1 routing decision (function number and parameters).
+        database_response (Any): The output of invoke_function.
+
+    Returns:
+        Optional[str]: The markdown answer, or None when no renderer applies.
+    """
+    # invoke_function returns a plain message when no function matched the question
+    if isinstance(database_response, str):
+        return database_response
+
+    if not isinstance(database_response, dict):
+        return None
+
+    renderer = RENDERERS.get(database_response.get("function_name"))
+    if renderer is None:
+        return None
+
+    parameters = (response.get("parameters") if isinstance(response, dict) else None) or {}
+    return renderer(database_response.get("result"), parameters)
@@ -0,0 +1,149 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from core.config import settings
+
+
+class After(NamedTuple):
+    # the last value of the previous page, the next page starts with the values sorted after it
+    value: Any
+
+
+def keyset_page(values: list, after: Optional[After], limit: Optional[int]) -> list:
+    """
+    Cut a page out of distinct values sorted ascending with nulls first.
+    """
+    if after is not None:
+        # null sorts first, so the values after it are the non-null ones
+        values = [value for value in values if value is not None and (after.value is None or value > after.value)]
+    return values if limit is None else values[:limit]
+
+
+class PurchaseRepository(ABC):
+    """
+    The read operations the query functions run over the purchases.
+
+    Every implementation returns the same values in the same order: top-N rows are sorted by
+    their aggregate (largest first) then by their group key (nulls first), and lists of
+    distinct values are sorted ascending (nulls first).
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    async def count_in_area(self, top_left: Tuple[float, float], bottom_right: Tuple[float, float]) -> int:
+        ...
+
+    # purchases within radius_km (great-circle distance) of the (latitude, longitude) center
+    @abstractmethod
+    async def count_within_radius(self, center: Tuple[float, float], radius_km: float) -> int:
+        ...
+
+    # purchases inside the polygon of (latitude, longitude) points, its edges are geodesics like in GeoJSON
+    @abstractmethod
+    async def count_in_polygon(self, points: List[Tuple[float, float]]) -> int:
+        ...
+
+    # purchases with start <= purchase_date < end
+    @abstractmethod
+    async def count_in_date_range(self, start: datetime, end: datetime) -> int:
+        ...
+
+    # [{"item_name", "total_spending"}] over the purchases of a calendar year
+    @abstractmethod
+    async def top_spending_items(self, year: int, limit: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    async def count_by_acquisition_type(self, acquisition_type: str) -> int:
+        ...
+
+    # total quantity of the purchases of any of the item names
+    @abstractmethod
+    async def total_quantity_by_items(self, item_names: List[str]) -> float:
+        ...
+
+    # {item_name: the distinct item descriptions and commodity titles of its purchases, sorted}, the search index terms
+    @abstractmethod
+    async def item_terms(self) -> Dict[str, List[str]]:
+        ...
+
+    # distinct item names of the purchases with start <= purchase_date < end, at most limit after the cursor
+    @abstractmethod
+    async def items_purchased_between(
+        self, start: datetime, end: datetime, after: Optional[After] = None, limit: Optional[int] = None
+    ) -> List[str]:
+        ...
+
+    # distinct family codes of a segment, at most limit after the cursor
+    @abstractmethod
+    async def family_codes_by_segment(self, segment_code: int, after: Optional[After] = None, limit: Optional[int] = None) -> List[int]:
+        ...
+
+    # [{"UNSPSC", "Count"}]
+    @abstractmethod
+    async def top_unspsc(self, limit: int) -> List[Dict]:
+        ...
+
+    # [{"item_name", "total_price"}] over the purchases of a fiscal year
+    @abstractmethod
+    async def top_items_by_fiscal_year(self, fiscal_year: str, limit: int) -> List[Dict]:
+        ...
+
+    # [{"department_name", "order_count"}]
+    @abstractmethod
+    async def top_departments(self, limit: int) -> List[Dict]:
+        ...
+
+    # [{"supplier_name", "supplier_zip_code", "purchase_count"}]
+    @abstractmethod
+    async def top_suppliers(self, limit: int) -> List[Dict]:
+        ...
+
+    # changes whenever the data changes, cached results of another version are dropped
+    @abstractmethod
+    async def data_version(self) -> Optional[str]:
+        ...
+
+
+def create_repository(engine: str) -> PurchaseRepository:
+    # the implementations are only imported when selected (pyarrow, seed file)
+    if engine == "columnar":
+        from services.columnar import ColumnarPurchaseRepository
+        return ColumnarPurchaseRepository()
+    if engine == "memory":
+        from services.memory_repository import MemoryPurchaseRepository
+        return MemoryPurchaseRepository()
+
+    from services.mongo_repository import MongoPurchaseRepository
+    return MongoPurchaseRepository()
+
+
+# the repository of the QUERY_ENGINE setting, shared by every request
+@lru_cache
+def get_configured_repository() -> PurchaseRepository:
+    return create_repository(settings.QUERY_ENGINE)
+
+
+# a repository that replaces the configured one in the current context (and the tasks it starts)
+_repository_override: ContextVar[Optional[PurchaseRepository]] = ContextVar("repository_override", default=None)
+
+
+@contextmanager
+def use_repository(repository: PurchaseRepository) -> Iterator[PurchaseRepository]:
+    """
+    Run the query functions on another repository inside the block, without changing the settings.
+    """
+    token = _repository_override.set(repository)
+    try:
+        yield repository
+    finally:
+        _repository_override.reset(token)
+
+
+def get_repository() -> PurchaseRepository:
+    return _repository_override.get() or get_configured_repository()
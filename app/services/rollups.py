@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from time import monotonic
+from typing import Dict, List, Optional, Set
+
+import pymongo
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from core.config import settings
+from core.database import init_database
+from schemas.documents import Purchase
+from seeds.compact import DEPARTMENTS, SUPPLIERS, UNSPSC_TITLES, is_compact, join_labels
+from seeds.purchases import get_data_version
+
+
+@dataclass
+class Rollup:
+    name: str  # the collection the rollup is materialized into
+    pipeline: List[Dict]  # the aggregation over purchases, ending with the grouped rows
+    indexes: List[pymongo.IndexModel] = field(default_factory=list)
+    # the same rows from the purchases of the compact schema (seeds/compact.py), for the rollups reading its strings
+    compact_pipeline: Optional[List[Dict]] = None
+
+
+ROLLUPS: Dict[str, Rollup] = {
+    rollup.name: rollup for rollup in [
+        Rollup(
+            name="rollup_departments",
+            pipeline=[
+                # the sort and projection let the group read the department_name index only
+                {"$sort": {"department_name": 1}},
+                {"$project": {"_id": 0, "department_name": 1}},
+                {"$group": {"_id": "$department_name", "order_count": {"$sum": 1}}},
+            ],
+            compact_pipeline=[
+                {"$sort": {"department_id": 1}},
+                {"$project": {"_id": 0, "department_id": 1}},
+                {"$group": {"_id": "$department_id", "order_count": {"$sum": 1}}},
+                *join_labels(DEPARTMENTS),
+                {"$project": {"_id": "$department_name", "order_count": 1}},
+            ],
+            indexes=[pymongo.IndexModel([("order_count", pymongo.DESCENDING)])],
+        ),
+        Rollup(
+            name="rollup_unspsc",
+            pipeline=[
+                {"$sort": {"normalized_UNSPSC": 1}},
+                {"$project": {"_id": 0, "normalized_UNSPSC": 1}},
+                {"$group": {"_id": "$normalized_UNSPSC", "count": {"$sum": 1}}},
+            ],
+            indexes=[pymongo.IndexModel([("count", pymongo.DESCENDING)])],
+        ),
+        Rollup(
+            name="rollup_suppliers",
+            pipeline=[
+                {"$sort": {"supplier_name": 1, "supplier_zip_code": 1}},
+                {"$project": {"_id": 0, "supplier_name": 1, "supplier_zip_code": 1}},
+                {"$group": {
+                    "_id": {"supplier_name": "$supplier_name", "supplier_zip": "$supplier_zip_code"},
+                    "purchase_count": {"$sum": 1},
+                }},
+            ],
+            compact_pipeline=[
+                {"$sort": {"supplier_id": 1}},
+                {"$project": {"_id": 0, "supplier_id": 1}},
+                {"$group": {"_id": "$supplier_id", "purchase_count": {"$sum": 1}}},
+                *join_labels(SUPPLIERS),
+                {"$project": {"_id": {"supplier_name": "$supplier_name", "supplier_zip": "$supplier_zip_code"}, "purchase_count": 1}},
+            ],
+            indexes=[pymongo.IndexModel([("purchase_count", pymongo.DESCENDING)])],
+        ),
+        Rollup(
+            name="rollup_items",
+            pipeline=[
+                # no index holds all five fields, the documents are read but only these fields are kept
+                {"$project": {"_id": 0, "item_name": 1, "fiscal_year": 1, "purchase_date": 1, "total_price": 1, "quantity": 1}},
+                {"$group": {
+                    "_id": {
+                        "item_name": "$item_name",
+                        "fiscal_year": "$fiscal_year",
+                        "year": {"$year": "$purchase_date"},
+                    },
+                    "total_price": {"$sum": "$total_price"},
+                    "quantity": {"$sum": "$quantity"},
+                    "count": {"$sum": 1},
+                }},
+                # flat fields, so the rollup can be indexed and matched by year
+                {"$set": {
+                    "item_name": "$_id.item_name",
+                    "fiscal_year": "$_id.fiscal_year",
+                    "year": "$_id.year",
+                }},
+            ],
+            indexes=[
+                pymongo.IndexModel([("fiscal_year", pymongo.ASCENDING), ("item_name", pymongo.ASCENDING)]),
+                pymongo.IndexModel([("year", pymongo.ASCENDING), ("item_name", pymongo.ASCENDING)]),
+            ],
+        ),
+        # the distinct descriptions and commodity titles of every item name, the terms of the item search index
+        Rollup(
+            name="rollup_item_terms",
+            pipeline=[
+                {"$match": {"item_name": {"$ne": None}}},
+                {"$project": {"_id": 0, "item_name": 1, "item_description": 1, "commodity_title": 1}},
+                {"$group": {
+                    "_id": "$item_name",
+                    "descriptions": {"$addToSet": "$item_description"},
+                    "commodity_titles": {"$addToSet": "$commodity_title"},
+                }},
+            ],
+            compact_pipeline=[
+                {"$match": {"item_name": {"$ne": None}}},
+                {"$project": {"_id": 0, "item_name": 1, "item_description": 1, "unspsc_id": 1}},
+                {"$group": {
+                    "_id": "$item_name",
+                    "descriptions": {"$addToSet": "$item_description"},
+                    "unspsc_ids": {"$addToSet": "$unspsc_id"},
+                }},
+                # the titles of the item's distinct codes
+                {"$lookup": {"from": UNSPSC_TITLES.name, "localField": "unspsc_ids", "foreignField": "_id", "as": "labels"}},
+                {"$project": {"descriptions": 1, "commodity_titles": "$labels.commodity_title"}},
+            ],
+        ),
+        # purchases and spend per day and per month, keyed by the midnight the bucket starts at
+        Rollup(
+            name="rollup_purchase_days",
+            pipeline=[
+                # the purchase_date index holds both fields, the purchases without a date are left out
+                {"$match": {"purchase_date": {"$ne": None}}},
+                {"$project": {"_id": 0, "purchase_date": 1, "total_price": 1}},
+                {"$group": {
+                    "_id": {"$dateFromParts": {
+                        "year": {"$year": "$purchase_date"},
+                        "month": {"$month": "$purchase_date"},
+                        "day": {"$dayOfMonth": "$purchase_date"},
+                    }},
+                    "count": {"$sum": 1},
+                    "total_price": {"$sum": "$total_price"},
+                }},
+            ],
+        ),
+        Rollup(
+            name="rollup_purchase_months",
+            pipeline=[
+                {"$match": {"purchase_date": {"$ne": None}}},
+                {"$project": {"_id": 0, "purchase_date": 1, "total_price": 1}},
+                {"$group": {
+                    "_id": {"$dateFromParts": {"year": {"$year": "$purchase_date"}, "month": {"$month": "$purchase_date"}}},
+                    "count": {"$sum": 1},
+                    "total_price": {"$sum": "$total_price"},
+                }},
+            ],
+        ),
+    ]
+}
+
+# collection that keeps the data version each rollup was built from
+META_COLLECTION = "rollups"
+
+
+@dataclass
+class RollupState:
+    checked_at: float = float("-inf")
+    fresh: Set[str] = field(default_factory=set)
+
+
+# in-process view of which rollups are up to date, refreshed every ROLLUP_CHECK_INTERVAL seconds
+_state = RollupState()
+
+
+def rollup_pipeline(rollup: Rollup, compact: bool) -> List[Dict]:
+    return rollup.compact_pipeline if compact and rollup.compact_pipeline else rollup.pipeline
+
+
+def get_database():
+    return Purchase.get_motor_collection().database
+
+
+async def build_rollup(rollup: Rollup, data_version: str):
+    """
+    Materialize a rollup with $merge, then drop the rows left over from older data versions.
+    """
+    database = get_database()
+
+    pipeline = rollup_pipeline(rollup, await is_compact()) + [
+        {"$set": {"data_version": data_version}},
+        {"$merge": {"into": rollup.name, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    # $merge returns no documents, the cursor only has to be drained
+    await Purchase.get_motor_collection().aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+    collection = database[rollup.name]
+    await collection.delete_many({"data_version": {"$ne": data_version}})
+    if rollup.indexes:
+        await collection.create_indexes(rollup.indexes)
+
+    await database[META_COLLECTION].update_one(
+        {"_id": rollup.name},
+        {"$set": {"data_version": data_version, "built_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+async def get_stale_rollups() -> List[str]:
+    data_version = await get_data_version()
+    if data_version is None:
+        # nothing is seeded yet, so nothing can be fresh
+        return list(ROLLUPS)
+
+    built = {
+        meta["_id"]: meta.get("data_version")
+        async for meta in get_database()[META_COLLECTION].find({"_id": {"$in": list(ROLLUPS)}})
+    }
+    return [name for name in ROLLUPS if built.get(name) != data_version]
+
+
+async def build_rollups(force: bool = False) -> List[str]:
+    """
+    Build the rollups that are stale (or all of them with force).
+
+    Returns:
+        List[str]: The names of the rebuilt rollups.
+    """
+    data_version = await get_data_version()
+    if data_version is None:
+        print("Rollups skipped: the purchases collection is not seeded.")
+        return []
+
+    names = list(ROLLUPS) if force else await get_stale_rollups()
+    for name in names:
+        started_at = monotonic()
+        await build_rollup(ROLLUPS[name], data_version)
+        print(f"Rollup {name} built in {monotonic() - started_at:.1f}s.")
+
+    # the next read re-checks the versions
+    _state.checked_at = float("-inf")
+    return names
+
+
+async def get_rollup(name: str) -> Optional[AsyncIOMotorCollection]:
+    """
+    Get a rollup collection if it was built from the current data version.
+
+    The versions are only re-read every ROLLUP_CHECK_INTERVAL seconds, so the check is
+    in-memory on the request path.
+
+    Returns:
+        Optional[AsyncIOMotorCollection]: The rollup collection, or None when it is stale.
+    """
+    if monotonic() - _state.checked_at > settings.ROLLUP_CHECK_INTERVAL:
+        stale = await get_stale_rollups()
+        _state.fresh = {name for name in ROLLUPS if name not in stale}
+        _state.checked_at = monotonic()
+
+    if name not in _state.fresh:
+        return None
+
+    return get_database()[name]
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build the rollup collections used by the top-N queries.")
+    parser.add_argument("--force", action="store_true", help="rebuild every rollup, even the fresh ones")
+    args = parser.parse_args(argv)
+
+    client = await init_database()
+    try:
+        names = await build_rollups(force=args.force)
+        print(f"Rebuilt rollups: {', '.join(names) or 'none (all fresh)'}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
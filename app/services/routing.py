@@ -0,0 +1,96 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.chains import ChainRegistry
+from core.config import settings
+from services.fast_router import fast_route
+from services.intent_cache import intent_cache
+
+
+class Router(ABC):
+    """
+    A routing stage that tries to resolve a question before the LLM is called.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    async def route(self, question: str) -> Optional[dict]:
+        ...
+
+    # called with the LLM route of a question no stage could resolve
+    async def learn(self, question: str, route: Any):
+        pass
+
+    # called when the route of a question failed to run
+    def reject(self, question: str):
+        pass
+
+
+class FastPathRouter(Router):
+    name = "fast_path"
+
+    async def route(self, question: str) -> Optional[dict]:
+        return fast_route(question)
+
+
+class IntentCacheRouter(Router):
+    name = "intent_cache"
+
+    async def route(self, question: str) -> Optional[dict]:
+        return await intent_cache.lookup(question)
+
+    async def learn(self, question: str, route: Any):
+        await intent_cache.store(question, route)
+
+    def reject(self, question: str):
+        intent_cache.discard(question)
+
+
+AVAILABLE_ROUTERS: Dict[str, Router] = {
+    router.name: router for router in [FastPathRouter(), IntentCacheRouter()]
+}
+
+# the stages tried in order before the LLM, from the ROUTE_STAGES setting
+routers: List[Router] = [AVAILABLE_ROUTERS[name] for name in settings.ROUTE_STAGES]
+
+# how many questions each path served
+route_counts: Counter = Counter()
+
+LLM_ROUTE = "llm"
+
+
+# Stage 1: map a question to a function call, with the LLM only when no routing stage resolves it
+async def classify_question(chains: ChainRegistry, question: str, client: str = "anonymous") -> Tuple[Any, str]:
+    """
+    Get the function number and parameters for a question.
+
+    Args:
+        chains (ChainRegistry): The shared chains, its database chain is the stage-1 LLM call.
+        question (str): The user question.
+        client (str): The client key of the LLM scheduler.
+
+    Returns:
+        Tuple[Any, str]: The routing decision, usually {"function_number": int, "parameters": dict},
+        and the name of the path that served it ("fast_path", "intent_cache" or "llm").
+    """
+    for router in routers:
+        response = await router.route(question)
+        if response is not None:
+            route_counts[router.name] += 1
+            return response, router.name
+
+    response = await chains.invoke_database(question, client)
+    route_counts[LLM_ROUTE] += 1
+
+    for router in routers:
+        await router.learn(question, response)
+
+    return response, LLM_ROUTE
+
+
+# a route that failed to run must not be served again
+def reject_route(question: str):
+    for router in routers:
+        router.reject(question)
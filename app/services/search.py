@@ -0,0 +1,189 @@
+import asyncio
+import re
+import sys
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from core.config import settings
+from services.repository import get_repository
+
+# punctuation is replaced by spaces, letters and digits of any script are kept
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]+|_")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# term ids read from the rarest postings of a fuzzy lookup to pick its candidates
+CANDIDATE_POSTINGS = 1_000
+
+# the similarity of a description or commodity title is lowered, so an item name wins a tie
+OTHER_TERM_WEIGHT = 0.9
+
+
+def normalize_name(value: str) -> str:
+    value = PUNCTUATION_PATTERN.sub(" ", value.casefold())
+    return WHITESPACE_PATTERN.sub(" ", value).strip()
+
+
+def name_trigrams(normalized: str) -> Set[str]:
+    # every word is padded like in pg_trgm, so the word starts count twice
+    trigrams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        trigrams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return trigrams
+
+
+def find_sorted(values: List[str], value: str) -> Optional[int]:
+    index = bisect_left(values, value)
+    return index if index < len(values) and values[index] == value else None
+
+
+class ItemSearchIndex:
+    """
+    The distinct item names of the purchases, searchable by name, description and commodity title.
+
+    Every normalized term (case-folded, punctuation stripped) points to the item names it was
+    read from, and an inverted index maps the trigrams to the terms. The names and terms are
+    sorted lists searched by bisection and the links between them are flat arrays, so the
+    footprint is mostly the strings themselves.
+    """
+
+    def __init__(self, item_terms: Dict[str, List[str]]):
+        self.names: List[str] = sorted(item_terms)
+
+        by_name: Dict[str, Set[int]] = defaultdict(set)
+        by_other: Dict[str, Set[int]] = defaultdict(set)
+        for name_id, name in enumerate(self.names):
+            by_name[normalize_name(name)].add(name_id)
+            for other in item_terms[name]:
+                by_other[normalize_name(other)].add(name_id)
+
+        # a term that normalizes an item name only resolves to the item names
+        self.terms: List[str] = sorted(term for term in by_name.keys() | by_other.keys() if term)
+        self.weights = np.array([1.0 if term in by_name else OTHER_TERM_WEIGHT for term in self.terms], dtype=np.float32)
+
+        # the name ids of term i are term_name_ids[term_name_offsets[i]:term_name_offsets[i + 1]]
+        name_ids = [sorted(by_name.get(term) or by_other[term]) for term in self.terms]
+        self.term_name_offsets = np.cumsum([0] + [len(ids) for ids in name_ids], dtype=np.int64)
+        self.term_name_ids = np.fromiter((name_id for ids in name_ids for name_id in ids), dtype=np.int32, count=int(self.term_name_offsets[-1]))
+
+        postings: Dict[str, List[int]] = defaultdict(list)
+        sizes = []
+        for term_id, term in enumerate(self.terms):
+            trigrams = name_trigrams(term)
+            sizes.append(len(trigrams))
+            for trigram in trigrams:
+                postings[trigram].append(term_id)
+        self.term_sizes = np.array(sizes, dtype=np.int32)
+        # the term ids are appended in order, so every posting is sorted
+        self.postings: Dict[str, np.ndarray] = {trigram: np.array(ids, dtype=np.int32) for trigram, ids in postings.items()}
+
+    def most_similar(self, normalized: str) -> Optional[int]:
+        """
+        Find the term with the highest trigram similarity (Dice coefficient) to a normalized query.
+
+        The candidates are the terms of the rarest postings (up to CANDIDATE_POSTINGS ids), a
+        similar term shares most trigrams of the query and so the rare ones too. Their shared
+        trigrams are then counted in every posting by binary search, the common postings are
+        never read whole.
+
+        Returns:
+            Optional[int]: The term id, or None below SEARCH_MIN_SIMILARITY.
+        """
+        trigrams = name_trigrams(normalized)
+        postings = sorted((self.postings[trigram] for trigram in trigrams if trigram in self.postings), key=len)
+        if not postings:
+            return None
+
+        used, total = 1, len(postings[0])
+        while used < len(postings) and total + len(postings[used]) <= CANDIDATE_POSTINGS:
+            total += len(postings[used])
+            used += 1
+
+        term_ids, shared = np.unique(np.concatenate(postings[:used]), return_counts=True)
+        for posting in postings[used:]:
+            positions = np.minimum(np.searchsorted(posting, term_ids), len(posting) - 1)
+            shared += posting[positions] == term_ids
+
+        scores = 2 * shared * self.weights[term_ids] / (len(trigrams) + self.term_sizes[term_ids])
+        best = int(np.argmax(scores))
+        return int(term_ids[best]) if scores[best] >= settings.SEARCH_MIN_SIMILARITY else None
+
+    def resolve(self, query: str) -> List[str]:
+        """
+        Match a name to the item names of the purchases.
+
+        The exact name wins, then the names with the same normalized form, then the names of
+        the most similar name, description or commodity title.
+
+        Returns:
+            List[str]: The matched item names, sorted, or an empty list when nothing is similar enough.
+        """
+        if find_sorted(self.names, query) is not None:
+            return [query]
+
+        normalized = normalize_name(query)
+        term_id = find_sorted(self.terms, normalized)
+        if term_id is None:
+            term_id = self.most_similar(normalized)
+        if term_id is None:
+            return []
+
+        start, end = self.term_name_offsets[term_id], self.term_name_offsets[term_id + 1]
+        return [self.names[name_id] for name_id in self.term_name_ids[start:end]]
+
+    def memory_bytes(self) -> int:
+        # the lists and their strings, the postings and the arrays
+        size = sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names)
+        size += sys.getsizeof(self.terms) + sum(sys.getsizeof(term) for term in self.terms)
+        size += sys.getsizeof(self.postings) + sum(sys.getsizeof(trigram) + sys.getsizeof(ids) for trigram, ids in self.postings.items())
+        arrays = (self.weights, self.term_sizes, self.term_name_offsets, self.term_name_ids)
+        return size + sum(array.nbytes for array in arrays)
+
+    def stats(self) -> dict:
+        return {
+            "names": len(self.names),
+            "terms": len(self.terms),
+            "trigrams": len(self.postings),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+@dataclass
+class SearchState:
+    index: Optional[ItemSearchIndex] = None
+    version: Optional[str] = None
+    built_seconds: float = 0.0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+# the index of the current data version, rebuilt when the data changes
+_state = SearchState()
+
+
+async def get_item_search() -> ItemSearchIndex:
+    repository = get_repository()
+    version = await repository.data_version()
+    if _state.index is None or _state.version != version:
+        async with _state.lock:
+            if _state.index is None or _state.version != version:
+                started_at = perf_counter()
+                item_terms = await repository.item_terms()
+                _state.index = await asyncio.to_thread(ItemSearchIndex, item_terms)
+                _state.version = version
+                _state.built_seconds = perf_counter() - started_at
+                print(
+                    f"Item search index built: {len(_state.index.names):,} names, {len(_state.index.terms):,} terms, "
+                    f"{_state.index.memory_bytes() / 2**20:.1f} MiB in {_state.built_seconds:.1f}s."
+                )
+    return _state.index
+
+
+def item_search_stats() -> dict:
+    if _state.index is None:
+        return {"built": False}
+    return {"built": True, "version": _state.version, "built_seconds": round(_state.built_seconds, 3), **_state.index.stats()}
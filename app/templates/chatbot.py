@@ -99,6 +99,23 @@ Examples of questions you should answer to the user:
 
 ---
 
+12. **Count Purchases Within Radius**  
+    - **Function Number**: `12`
+    - **Function Description**: Count the number of purchases within a distance (in kilometers) of a point.
+    - **Parameters**:
+      - `center` (Tuple[float, float]): Latitude and longitude of the point.
+      - `radius_km` (float): The distance in kilometers.
+
+---
+
+13. **Count Purchases in Polygon**  
+    - **Function Number**: `13`
+    - **Function Description**: Count the number of purchases inside a polygon defined by three or more coordinates.
+    - **Parameters**:
+      - `points` (List[Tuple[float, float]]): Latitude and longitude of every corner of the polygon, in order.
+
+---
+
 
 
 
@@ -0,0 +1,16 @@
+import os
+import sys
+from pathlib import Path
+
+# the app imports its packages from the app directory (python -m pytest tests, run from app/)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# the settings without a default, the tests never connect to MongoDB or Ollama
+for name, value in {
+    "MONGODB_USER": "test",
+    "MONGODB_PASSWORD": "test",
+    "MONGODB_DATABASE": "test",
+    "OLLAMA_HOST": "localhost",
+    "OLLAMA_PORT": "11434",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,34 @@
+import os
+from typing import List
+
+
+async def seed_mongo(purchases: List[dict], **client_kwargs):
+    """
+    Create the purchases collection of a Beanie database and record a completed seed.
+
+    The database is a real server at TEST_MONGODB_URI when it is set (client_kwargs are passed
+    to its client), mongomock otherwise.
+    """
+    from beanie import init_beanie
+
+    from schemas.documents import LABEL_INDEXES, Purchase
+    from seeds.purchases import save_checkpoint
+    from services.data_version import refresh_data_version
+
+    uri = os.environ.get("TEST_MONGODB_URI")
+    if uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(uri, **client_kwargs)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+
+    database = client.get_database(f"test_{os.getpid()}")
+    await client.drop_database(database.name)
+    await init_beanie(database=database, document_models=[Purchase])
+
+    await Purchase.get_motor_collection().insert_many([dict(purchase) for purchase in purchases])
+    await Purchase.get_motor_collection().create_indexes(LABEL_INDEXES)
+    await save_checkpoint(0, len(purchases), completed=True)
+    await refresh_data_version()
+    return client, database
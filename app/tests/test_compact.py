@@ -0,0 +1,50 @@
+import asyncio
+
+from benchmarks.generator import SMALL, write_purchases
+from schemas.documents import LABEL_INDEXES, Purchase
+from seeds import compact
+from services.memory_repository import load_purchases
+from tests.purchases import seed_mongo
+
+
+def index_names(indexes) -> set:
+    return {index.document["name"] for index in indexes}
+
+
+def test_compact_and_expand(tmp_path):
+    data_path = tmp_path / "purchases.json"
+    write_purchases(data_path, 200, SMALL)
+    purchases = load_purchases(data_path)
+
+    async def run():
+        client, database = await seed_mongo(purchases)
+        collection = Purchase.get_motor_collection()
+        try:
+            await compact.compact_purchases(wait=False)
+            compacted = await Purchase.find_all().to_list()
+            compacted_indexes = set(await collection.index_information())
+            is_compact = await compact.is_compact()
+
+            await compact.expand_purchases(wait=False)
+            expanded = await collection.find({}, {"_id": 0, "department_name": 1, "supplier_name": 1}).to_list(length=None)
+            expanded_indexes = set(await collection.index_information())
+            return compacted, compacted_indexes, is_compact, expanded, expanded_indexes
+        finally:
+            await client.drop_database(database.name)
+            client.close()
+
+    compacted, compacted_indexes, is_compact, expanded, expanded_indexes = asyncio.run(run())
+
+    # the compact documents still load as Purchase, without the strings
+    assert is_compact
+    assert len(compacted) == len(purchases)
+    assert all(purchase.department_name is None and purchase.acquisition_method is None for purchase in compacted)
+    assert not index_names(LABEL_INDEXES) & compacted_indexes
+    assert index_names(compact.CODE_INDEXES) <= compacted_indexes
+
+    assert sorted(expanded, key=str) == sorted(
+        ({"department_name": purchase.get("department_name"), "supplier_name": purchase.get("supplier_name")} for purchase in purchases),
+        key=str,
+    )
+    assert index_names(LABEL_INDEXES) <= expanded_indexes
+    assert not index_names(compact.CODE_INDEXES) & expanded_indexes
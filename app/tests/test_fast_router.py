@@ -0,0 +1,40 @@
+import pytest
+
+from services.fast_router import fast_route
+
+ROUTED = [
+    ("How many purchases were made between 2013-01-10 and 2013-02-20?", 2, {"start_date": "2013-01-10", "end_date": "2013-02-20"}),
+    ("What were the top spending items in 2014?", 3, {"year": 2014}),
+    ("top 5 items by spending in 2014", 3, {"year": 2014, "limit": 5}),
+    ("How many IT Goods purchases were made?", 4, {"acquisition_type": "IT Goods"}),
+    ("What's the total quantity of 'Copy Paper' bought?", 5, {"item_name": "Copy Paper"}),
+    ("Which items were purchased on 2013-03-04?", 6, {"date": "2013-03-04"}),
+    ("What are the family codes of segment 44?", 7, {"segment_code": 44}),
+    ("What are the top 10 most common UNSPSC codes?", 8, {}),
+    ("Which item had the highest total price in fiscal year 2013-2014?", 9, {"fiscal_year": "2013-2014"}),
+    ("Which departments made the most purchases?", 10, {}),
+    ("What are the top 3 suppliers?", 11, {"top_n": 3}),
+    ("Who are the top suppliers?", 11, {}),
+    ("How many purchases within 250 km of 37.0, -120.0?", 12, {"center": [37.0, -120.0], "radius_km": 250.0}),
+]
+
+# questions with a filter or a limit the matching rule cannot pass on, left to the LLM
+NOT_ROUTED = [
+    "Which supplier had the most purchases in fiscal year 2013-2014?",
+    "How many IT Goods purchases were made in 2014?",
+    "quantity of 'Copy Paper' bought by the Department of Justice",
+    "What are the top 3 UNSPSC codes?",
+    "Which departments made the most purchases in 2013?",
+    "What were the top spending items in fiscal year 2013?",
+    "Which items were purchased on 2013-03-04 from supplier 'Dell'?",
+]
+
+
+@pytest.mark.parametrize("question, function_number, parameters", ROUTED)
+def test_routed(question, function_number, parameters):
+    assert fast_route(question) == {"function_number": function_number, "parameters": parameters}
+
+
+@pytest.mark.parametrize("question", NOT_ROUTED)
+def test_unused_qualifier_is_not_routed(question):
+    assert fast_route(question) is None
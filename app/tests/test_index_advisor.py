@@ -0,0 +1,176 @@
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.generator import SMALL, write_purchases
+from services.index_advisor import AuditResult, PlanSummary, QueryRecorder, audit, collect_plan, collection_scans
+from services.memory_repository import load_purchases
+from services.mongo_repository import MongoPurchaseRepository
+from tests.purchases import seed_mongo
+
+# explain outputs (executionStats verbosity) in the format of MongoDB 7, trimmed to the plans and the counters
+
+# an aggregate answered from an index, the pipeline stages after $cursor run on the index keys
+COVERED_AGGREGATE = {
+    "explainVersion": "1",
+    "stages": [
+        {
+            "$cursor": {
+                "queryPlanner": {
+                    "namespace": "purchases.purchases",
+                    "winningPlan": {
+                        "stage": "PROJECTION_COVERED",
+                        "transformBy": {"item_name": True, "total_price": True, "_id": False},
+                        "inputStage": {
+                            "stage": "IXSCAN",
+                            "keyPattern": {"fiscal_year": 1, "item_name": 1, "total_price": 1},
+                            "indexName": "fiscal_year_item_name_total_price_index",
+                            "direction": "forward",
+                        },
+                    },
+                    "rejectedPlans": [{"stage": "COLLSCAN", "direction": "forward"}],
+                },
+                "executionStats": {
+                    "executionSuccess": True,
+                    "nReturned": 120,
+                    "executionTimeMillis": 2,
+                    "totalKeysExamined": 120,
+                    "totalDocsExamined": 0,
+                    "executionStages": {"stage": "PROJECTION_COVERED", "nReturned": 120},
+                },
+            },
+        },
+        {"$group": {"_id": "$item_name", "total_price": {"$sum": "$total_price"}}},
+        {"$sort": {"sortKey": {"total_price": -1, "_id": 1}, "limit": 5}},
+    ],
+}
+
+# a count that reads the documents of an index range
+FETCH_COUNT = {
+    "explainVersion": "1",
+    "queryPlanner": {
+        "namespace": "purchases.purchases",
+        "winningPlan": {
+            "stage": "COUNT",
+            "inputStage": {
+                "stage": "FETCH",
+                "inputStage": {"stage": "IXSCAN", "keyPattern": {"location_lat": 1, "location_long": 1}, "indexName": "location_lat_location_long_index"},
+            },
+        },
+        "rejectedPlans": [],
+    },
+    "executionStats": {"nReturned": 0, "executionTimeMillis": 3, "totalKeysExamined": 210, "totalDocsExamined": 50},
+}
+
+# a count without a usable index
+COLLSCAN_COUNT = {
+    "explainVersion": "1",
+    "queryPlanner": {
+        "namespace": "purchases.purchases",
+        "winningPlan": {
+            "stage": "COUNT",
+            "inputStage": {"stage": "COLLSCAN", "filter": {"acquisition_type": {"$eq": "IT Goods"}}, "direction": "forward"},
+        },
+        "rejectedPlans": [],
+    },
+    "executionStats": {
+        "nReturned": 0,
+        "executionTimeMillis": 41,
+        "totalKeysExamined": 0,
+        "totalDocsExamined": 600,
+        "executionStages": {"stage": "COUNT", "inputStage": {"stage": "COLLSCAN", "docsExamined": 600}},
+    },
+}
+
+# a pipeline run by the slot based engine, the plan is under queryPlan
+SBE_AGGREGATE = {
+    "explainVersion": "2",
+    "queryPlanner": {
+        "namespace": "purchases.purchases",
+        "winningPlan": {
+            "queryPlan": {
+                "stage": "GROUP",
+                "inputStage": {
+                    "stage": "PROJECTION_COVERED",
+                    "inputStage": {"stage": "IXSCAN", "keyPattern": {"segment": 1, "family": 1}, "indexName": "segment_family_index"},
+                },
+            },
+            "slotBasedPlan": {"slots": "$$RESULT=s9 env: { }", "stages": "[2] group [s7] [] ... [1] ixseek ..."},
+        },
+        "rejectedPlans": [{"queryPlan": {"stage": "COLLSCAN"}}],
+    },
+    "executionStats": {"nReturned": 2, "executionTimeMillis": 1, "totalKeysExamined": 61, "totalDocsExamined": 0},
+}
+
+
+def summarize(explain: dict) -> PlanSummary:
+    summary = PlanSummary()
+    collect_plan(explain, summary)
+    return summary
+
+
+def test_covered_aggregate():
+    summary = summarize(COVERED_AGGREGATE)
+
+    assert summary.stages == {"PROJECTION_COVERED", "IXSCAN"}
+    assert summary.indexes == {"fiscal_year_item_name_total_price_index"}
+    assert (summary.keys_examined, summary.docs_examined, summary.returned, summary.milliseconds) == (120, 0, 120, 2)
+    assert summary.covered and not summary.collection_scan
+    assert summary.describe() == "IXSCAN fiscal_year_item_name_total_price_index (covered)"
+
+
+def test_fetch_is_not_covered():
+    summary = summarize(FETCH_COUNT)
+
+    assert not summary.covered and not summary.collection_scan
+    assert summary.describe() == "IXSCAN location_lat_location_long_index"
+
+
+def test_collection_scan():
+    summary = summarize(COLLSCAN_COUNT)
+
+    assert summary.collection_scan
+    assert summary.docs_examined == 600
+    assert summary.describe() == "COLLSCAN"
+
+
+def test_slot_based_plan():
+    summary = summarize(SBE_AGGREGATE)
+
+    assert summary.stages == {"GROUP", "PROJECTION_COVERED", "IXSCAN"}
+    assert summary.covered
+
+
+def test_check_fails_on_a_collection_scan():
+    results = [
+        AuditResult(4, "count_records_by_acquisition_type", 0.04, [({"aggregate": "purchases"}, summarize(COLLSCAN_COUNT))]),
+        AuditResult(7, "get_family_codes_by_segment_code", 0.01, [({"aggregate": "purchases"}, summarize(SBE_AGGREGATE))]),
+        AuditResult(9, "get_top_item_by_total_price", 0.01, [({"aggregate": "purchases"}, summarize(COVERED_AGGREGATE))]),
+        # answered by a cache, no query was sent
+        AuditResult(10, "get_top_departments", 0.0, []),
+    ]
+
+    assert collection_scans(results) == ["count_records_by_acquisition_type"]
+    assert collection_scans(results[1:]) == []
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_MONGODB_URI"), reason="explain needs a MongoDB server, set TEST_MONGODB_URI")
+def test_no_function_scans_the_collection(tmp_path):
+    data_path = tmp_path / "purchases.json"
+    write_purchases(data_path, 600, SMALL)
+    purchases = load_purchases(data_path)
+
+    async def run():
+        recorder = QueryRecorder({"purchases"})
+        client, database = await seed_mongo(purchases, event_listeners=[recorder])
+        try:
+            return await audit(recorder, MongoPurchaseRepository(rollups=False))
+        finally:
+            await client.drop_database(database.name)
+            client.close()
+
+    results = asyncio.run(run())
+
+    scans = {result.function_name: [summary.describe() for _, summary in result.plans] for result in results if result.collection_scan}
+    assert not scans, f"collection scans: {scans}"
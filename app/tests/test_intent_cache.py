@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from services.intent_cache import IntentCache, normalize_question, parameters_grounded
+
+
+def grounded(parameters: dict, question: str) -> bool:
+    return parameters_grounded({"function_number": 4, "parameters": parameters}, normalize_question(question))
+
+
+@pytest.mark.parametrize("value, question", [
+    ("IT Goods", "How many IT Goods purchases were made?"),
+    ("NON-IT Goods", "How many NON-IT Goods purchases were made?"),
+    ("IT Services", "how many it services orders"),
+    ("2013-01-01", "Purchases between 2013-01-01 and 2013-12-31"),
+])
+def test_value_in_question_is_grounded(value, question):
+    assert grounded({"acquisition_type": value}, question)
+
+
+@pytest.mark.parametrize("value, question", [
+    # a value that is only part of a longer label
+    ("IT Goods", "How many NON-IT Goods purchases were made?"),
+    ("IT Services", "How many NON-IT Services purchases were made?"),
+    ("Paper", "Total quantity of papers"),
+    ("IT Goods", "How many IT Services purchases were made?"),
+])
+def test_value_not_in_question_is_not_grounded(value, question):
+    assert not grounded({"acquisition_type": value}, question)
+
+
+def test_numbers_are_compared_as_numbers():
+    assert grounded({"year": 2013, "limit": 10}, "Top 10 items of 2013")
+    assert not grounded({"year": 2014}, "Top items of 2013")
+
+
+class FakeEmbeddings:
+    # the questions about IT Goods point one way, the others another
+    async def aembed_query(self, text: str):
+        return [1.0, 0.1] if "it goods" in text else [0.0, 1.0]
+
+
+def test_discard_removes_the_similar_entry_that_answered():
+    route = {"function_number": 4, "parameters": {"acquisition_type": "IT Goods"}}
+    cache = IntentCache(maxsize=10, min_confidence=0.9, similarity=0.9)
+    cache.embeddings = FakeEmbeddings()
+
+    async def run():
+        await cache.store("How many IT Goods purchases were made?", route)
+        hit = await cache.lookup("Count the IT Goods purchases")
+        cache.discard("Count the IT Goods purchases")
+        return hit, await cache.lookup("How many IT Goods purchases were made?")
+
+    hit, after_discard = asyncio.run(run())
+
+    assert hit == route
+    assert cache.similar_hits == 1
+    assert after_discard is None
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,118 @@
+import asyncio
+import os
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from benchmarks.generator import SMALL, write_purchases
+from benchmarks.repositories import same_result
+from core.config import settings
+from etl.pipeline import PARQUET_SCHEMA
+from services import queries, search
+from services.memory_repository import MemoryPurchaseRepository, load_purchases
+from services.mongo_repository import MongoPurchaseRepository
+from services.repository import PurchaseRepository, create_repository, use_repository
+from tests.purchases import seed_mongo
+
+ROWS = 600
+
+# (function number, parameters): every query function, with parameters that match the fixture
+FUNCTION_CALLS: List[Tuple[int, Dict[str, Any]]] = [
+    (1, {"top_left": (38.0, -123.0), "bottom_right": (34.0, -118.0)}),
+    (2, {"start_date": "2013-01-10", "end_date": "2013-02-20"}),
+    # whole months in the middle of the range
+    (2, {"start_date": "2012-08-15", "end_date": "2014-03-31"}),
+    (3, {"year": 2013, "limit": 5}),
+    (4, {"acquisition_type": "IT Goods"}),
+    (4, {"acquisition_type": "NON-IT Services"}),
+    (5, {"item_name": "Copy Paper"}),
+    (5, {"item_name": "copy papr"}),
+    (5, {"item_name": "usb c cable"}),
+    (6, {"date": "2013-10-21"}),
+    (7, {"segment_code": 44}),
+    (7, {"segment_code": 43}),
+    (8, {}),
+    (9, {"fiscal_year": "2013-2014"}),
+    (10, {}),
+    (11, {"top_n": 3}),
+    (12, {"center": (37.0, -120.0), "radius_km": 250.0}),
+    (13, {"points": [(38.0, -123.0), (39.0, -118.0), (34.0, -116.0), (33.0, -121.0)]}),
+]
+
+# the functions whose MongoDB queries use the geospatial operators mongomock does not implement
+GEO_FUNCTIONS = (12, 13)
+
+# pages read by the paginated functions, small so every call reads several pages
+PAGE_SIZE = 2
+
+
+@pytest.fixture(scope="module")
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    # the Motor client is bound to the loop it first ran on, every test of the module shares it
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="module")
+def repositories(loop, tmp_path_factory) -> Iterator[Dict[str, PurchaseRepository]]:
+    directory = tmp_path_factory.mktemp("parity")
+    data_path = directory / "purchases.json"
+    write_purchases(data_path, ROWS, SMALL)
+    purchases = load_purchases(data_path)
+
+    snapshot_path = directory / "purchases.parquet"
+    pq.write_table(pa.Table.from_pylist(purchases, schema=PARQUET_SCHEMA), snapshot_path)
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(settings, "COLUMNAR_SNAPSHOT_PATH", str(snapshot_path))
+        client, database = loop.run_until_complete(seed_mongo(purchases))
+        try:
+            yield {
+                "memory": MemoryPurchaseRepository(purchases),
+                "columnar": create_repository("columnar"),
+                # the live pipelines, the rollups are built with $merge (not implemented by mongomock)
+                "mongo": MongoPurchaseRepository(rollups=False),
+            }
+        finally:
+            loop.run_until_complete(client.drop_database(database.name))
+            client.close()
+
+
+async def call_function(repository: PurchaseRepository, monkeypatch: pytest.MonkeyPatch, function_number: int, parameters: dict) -> Any:
+    """
+    Run a query function on a repository, a paginated one page by page until the last.
+    """
+    # the item search index of another repository is not reused
+    monkeypatch.setattr(search, "_state", search.SearchState())
+
+    function = queries.function_map[function_number]
+    with use_repository(repository):
+        if function_number not in queries.PAGINATED_FUNCTIONS:
+            return await function(**parameters)
+
+        items, cursor = [], None
+        while True:
+            page = await function(**parameters, limit=PAGE_SIZE, cursor=cursor)
+            items += page["items"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return items
+
+
+def test_every_function_is_covered():
+    assert {function_number for function_number, _ in FUNCTION_CALLS} == set(queries.function_map)
+
+
+@pytest.mark.parametrize("engine", ["columnar", "mongo"])
+@pytest.mark.parametrize("function_number, parameters", FUNCTION_CALLS, ids=lambda value: str(value) if isinstance(value, int) else None)
+def test_same_results_as_memory(loop, repositories, monkeypatch, engine, function_number, parameters):
+    if engine == "mongo" and function_number in GEO_FUNCTIONS and not os.environ.get("TEST_MONGODB_URI"):
+        pytest.skip("mongomock does not implement $geoWithin, set TEST_MONGODB_URI to run it on a MongoDB server")
+
+    expected = loop.run_until_complete(call_function(repositories["memory"], monkeypatch, function_number, parameters))
+    actual = loop.run_until_complete(call_function(repositories[engine], monkeypatch, function_number, parameters))
+
+    assert same_result(expected, actual), f"memory: {expected}\n{engine}: {actual}"
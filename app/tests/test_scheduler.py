@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from core.metrics import llm_queue_wait_seconds, llm_scheduled_calls, render_metrics
+from core.scheduler import STAGE1_PRIORITY, LLMQueueFull, LLMScheduler
+
+
+def test_queue_is_exported_on_metrics():
+    rejected = llm_scheduled_calls.values.get(("rejected",), 0)
+    waits = llm_queue_wait_seconds.series[("0",)].count if ("0",) in llm_queue_wait_seconds.series else 0
+
+    async def run():
+        scheduler = LLMScheduler(workers=1, max_queue=1)
+        await scheduler.acquire(STAGE1_PRIORITY, "a")
+        waiting = asyncio.create_task(scheduler.acquire(STAGE1_PRIORITY, "b"))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMQueueFull):
+            await scheduler.acquire(STAGE1_PRIORITY, "c")
+        busy = render_metrics()
+
+        scheduler.release()
+        await waiting
+        scheduler.release()
+        return busy, render_metrics()
+
+    busy, idle = asyncio.run(run())
+
+    assert 'escprs_llm_queue_depth{priority="0"} 1' in busy
+    assert "escprs_llm_active_calls 1" in busy
+    assert "escprs_llm_workers 1" in busy
+    assert 'escprs_llm_queue_depth{priority="0"} 0' in idle
+    assert "escprs_llm_active_calls 0" in idle
+    assert llm_scheduled_calls.values[("rejected",)] == rejected + 1
+    assert llm_queue_wait_seconds.series[("0",)].count == waits + 2
+    assert "# TYPE escprs_llm_scheduled_calls_total counter" in idle
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from core.config import settings
+from core.readiness import readiness
+from seeds import startup
+from seeds.purchases import SeedProgress
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "SEED_RETRY_DELAY", 0.0)
+    monkeypatch.setattr(settings, "SEED_MAX_ATTEMPTS", 3)
+    for name, value in {"status": "starting", "rows": 0, "error": None, "attempts": 0, "retry_at": None}.items():
+        monkeypatch.setattr(readiness, name, value)
+
+
+def test_failed_seed_is_retried(monkeypatch):
+    calls = []
+
+    async def follow_seed():
+        calls.append(readiness.to_dict())
+        if len(calls) < 3:
+            raise ConnectionError("MongoDB is not reachable")
+        return {"rows": 10}
+
+    monkeypatch.setattr(startup, "follow_seed", follow_seed)
+    checkpoint = asyncio.run(startup.wait_for_seed())
+
+    assert checkpoint == {"rows": 10}
+    assert calls[1]["status"] == "retrying" and calls[1]["retry_at"] is not None
+    assert not calls[1]["restart_required"]
+    startup.mark_ready(checkpoint)
+    assert readiness.to_dict() == {
+        "status": "ready", "rows": 10, "rows_per_second": 0.0, "error": None,
+        "attempts": 2, "retry_at": None, "restart_required": False,
+    }
+
+
+def test_seed_gives_up_after_max_attempts(monkeypatch):
+    async def follow_seed():
+        raise ValueError("the seed file is not valid")
+
+    monkeypatch.setattr(startup, "follow_seed", follow_seed)
+    with pytest.raises(ValueError):
+        asyncio.run(startup.wait_for_seed())
+
+    assert readiness.status == "failed" and readiness.restart_required
+    assert readiness.attempts == settings.SEED_MAX_ATTEMPTS
+    assert readiness.error == "the seed file is not valid"
+
+
+def test_retry_delay_doubles_up_to_the_maximum(monkeypatch):
+    monkeypatch.setattr(settings, "SEED_RETRY_DELAY", 5.0)
+    monkeypatch.setattr(settings, "SEED_RETRY_MAX_DELAY", 30.0)
+    assert [startup.retry_delay(attempts) for attempts in range(1, 6)] == [5.0, 10.0, 20.0, 30.0, 30.0]
+
+
+def test_ready_after_migrations_compaction_and_rollups(monkeypatch):
+    statuses = {}
+
+    async def wait_for_seed():
+        return {"rows": 10}
+
+    def record(name):
+        async def step():
+            statuses[name] = readiness.status
+        return step
+
+    monkeypatch.setattr(startup, "wait_for_seed", wait_for_seed)
+    for name in ("refresh_data_version", "run_migrations", "run_compaction", "refresh_rollups", "get_item_search"):
+        monkeypatch.setattr(startup, name, record(name))
+    asyncio.run(startup.ensure_seeded())
+
+    assert statuses == {
+        "refresh_data_version": "preparing", "run_migrations": "preparing", "run_compaction": "preparing",
+        "refresh_rollups": "preparing", "get_item_search": "ready",
+    }
+    assert readiness.status == "ready" and readiness.rows == 10
+
+
+def test_lost_lease_stops_the_seed(monkeypatch):
+    async def acquire_seed_lock():
+        return False
+
+    monkeypatch.setattr(startup, "acquire_seed_lock", acquire_seed_lock)
+    with pytest.raises(startup.SeedLeaseLost):
+        asyncio.run(startup.report_progress(SeedProgress(rows=100)))
@@ -55,21 +55,43 @@ const AppContext = ({ children }) => {
   useEffect(() => {
     if (socket) {
       socket.onmessage = (event) => {
-        // Process the response from the WebSocket server
+        // Process the streamed frames from the WebSocket server
         const data = JSON.parse(event.data);
-        setMessage([
-          ...message,
-          { text: data?.answer, isBot: true }, // Assuming response has 'data'
-        ]);
-        setIsLoading(false); // Stop loading after receiving the response
+        switch (data?.type) {
+          case "start":
+            // Add an empty bot message that the deltas are appended to
+            setMessage((messages) => [...messages, { text: "", isBot: true }]);
+            break;
+          case "delta":
+            setMessage((messages) => {
+              const last = messages[messages.length - 1];
+              return [
+                ...messages.slice(0, -1),
+                { ...last, text: last.text + data.content },
+              ];
+            });
+            break;
+          case "end":
+            setIsLoading(false); // Stop loading after receiving the whole answer
+            break;
+          case "error":
+            setMessage((messages) => [
+              ...messages,
+              { text: data.error, isBot: true },
+            ]);
+            setIsLoading(false);
+            break;
+          default:
+            break;
+        }
       };
     }
-  }, [socket, message]);
+  }, [socket]);
 
   // Send message to WebSocket server
   const sendMsgToSocket = (msg) => {
     if (socket && socket.readyState === WebSocket.OPEN) {
-      socket.send(JSON.stringify({ question: msg }));
+      socket.send(JSON.stringify({ question: msg, stream: true }));
       setIsLoading(true); // Set loading while waiting for response
     }
   };